@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Recherche pondérée approchée (index par clusters) avec un rappel cible réglable.
+
+Usage
+-----
+python approx_search.py <points.csv> <queries.csv> [output.csv] [--recall-target 0.95] [--clusters C]
+                        [--calibration-queries 32]
+
+Index
+-----
+Les noeuds sont regroupés en C clusters (k-means sur un échantillon), puis réordonnés pour que chaque cluster
+soit contigu. Pour chaque cluster c on garde son centre et l'écart absolu maximal par dimension de ses membres.
+
+Requête (A, Y, D)
+-----------------
+- d_c = dist_Y(A, c) et R_c = sqrt( sum_j Y_j * ecart_max_{c,j}^2 ) majore dist_Y(P, c) pour tout P du cluster ;
+- on visite les clusters tels que d_c - alpha * R_c <= D, puis on calcule les distances exactes de leurs membres.
+
+alpha = 1 est un élagage exact (inégalité triangulaire) : résultat identique à la force brute. Plus alpha est
+petit, moins on visite de clusters (plus rapide) et plus le rappel baisse. Les noeuds retournés ont toujours
+leur distance exacte (pas de faux positifs) : seul le rappel varie.
+
+--recall-target
+---------------
+alpha est calibré sur un échantillon de requêtes : on calcule leur réponse exacte, puis on choisit le plus
+petit alpha de la grille dont le rappel global sur l'échantillon atteint la cible. --recall-target 1.0 force
+alpha = 1 (exact).
+"""
+from __future__ import annotations
+import argparse
+import sys
+import time
+from typing import TYPE_CHECKING, List, NamedTuple, Tuple
+
+import numpy as np
+
+from brute_force_search import (FEATURE_COLS, QueryBatch, build_query_batch, load_points_csv,
+                                read_queries_csv, write_response_csv)
+from pq_search import kmeans, nearest_center
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SearchResults = List[Tuple[str, float, List[Tuple[str, float]]]]
+
+ALPHA_GRID = [1.0 - 0.125 * i for i in range(17)]  # 1.0 .. -1.0
+TRAIN_SAMPLE = 65_536
+KMEANS_ITERS = 10
+ASSIGN_CHUNK = 16_384
+DEFAULT_CALIBRATION_QUERIES = 32
+
+
+class ClusterIndex(NamedTuple):
+    node_ids: List[str]         # dans l'ordre des clusters
+    points: np.ndarray          # (N,50) réordonnée, clusters contigus
+    centers: np.ndarray         # (C,50)
+    max_dev: np.ndarray         # (C,50) max |P_j - c_j| sur les membres
+    starts: np.ndarray          # (C+1,) bornes des clusters dans `points`
+
+
+def default_n_clusters(n_nodes: int) -> int:
+    return int(max(1, min(4096, round(np.sqrt(n_nodes)))))
+
+
+def build_cluster_index(node_ids: List[str], points_mat: np.ndarray, n_clusters: int = 0,
+                        seed: int = 0) -> ClusterIndex:
+    if not len(points_mat):  # fichier de points vide : index sans cluster, toutes les réponses sont vides
+        empty = np.zeros((0, points_mat.shape[1]))
+        return ClusterIndex([], empty, empty, empty.copy(), np.zeros(1, dtype=np.int64))
+    n_clusters = n_clusters or default_n_clusters(len(node_ids))
+    rng = np.random.default_rng(seed)
+    sample = points_mat[rng.choice(len(points_mat), size=min(TRAIN_SAMPLE, len(points_mat)), replace=False)]
+    centers = kmeans(sample, n_clusters, KMEANS_ITERS, rng)
+
+    assign = np.concatenate([nearest_center(points_mat[s:s + ASSIGN_CHUNK], centers)
+                             for s in range(0, len(points_mat), ASSIGN_CHUNK)])
+    order = np.argsort(assign, kind='stable')
+    points = points_mat[order]
+    counts = np.bincount(assign, minlength=len(centers))
+    starts = np.concatenate([[0], np.cumsum(counts)])
+
+    max_dev = np.zeros_like(centers)
+    for c in np.flatnonzero(counts):
+        max_dev[c] = np.abs(points[starts[c]:starts[c + 1]] - centers[c]).max(axis=0)
+    return ClusterIndex([node_ids[i] for i in order.tolist()], points, centers, max_dev, starts)
+
+
+def _visited_rows(index: ClusterIndex, A: np.ndarray, Y: np.ndarray, D: float, alpha: float) -> np.ndarray:
+    diff = index.centers - A
+    d_c = np.sqrt(np.sum(Y * diff * diff, axis=1))
+    R_c = np.sqrt(index.max_dev * index.max_dev @ np.maximum(Y, 0.0))
+    visit = np.flatnonzero(d_c - alpha * R_c <= D * (1.0 + 1e-9) + 1e-9)  # marge pour les arrondis
+    if not len(visit):
+        return np.zeros(0, dtype=np.intp)
+    lo, hi = index.starts[visit], index.starts[visit + 1]
+    sizes = hi - lo
+    # concaténation vectorisée des plages [lo, hi) des clusters visités
+    return np.repeat(lo - np.concatenate([[0], np.cumsum(sizes)[:-1]]), sizes) + np.arange(sizes.sum())
+
+
+def approx_search(index: ClusterIndex, queries: QueryBatch, alpha: float) -> Tuple[SearchResults, float]:
+    """Retourne (résultats, fraction moyenne de noeuds visités)."""
+    results: SearchResults = []
+    visited = 0
+    for q_idx, q_id in enumerate(queries.q_ids):
+        D = float(queries.D[q_idx])
+        A, Y = queries.A[q_idx], queries.Y[q_idx]
+        rows = _visited_rows(index, A, Y, D, alpha)
+        visited += len(rows)
+
+        # Distances exactes (même formule que radius_search)
+        diff = index.points[rows] - A
+        dists = np.sqrt(np.sum(Y * diff * diff, axis=1))
+        keep = dists <= D
+        matches = [(index.node_ids[i], float(d)) for i, d in zip(rows[keep].tolist(), dists[keep].tolist())]
+        matches.sort(key=lambda x: (x[1], x[0]))
+        results.append((q_id, D, matches))
+    denom = max(len(index.node_ids), 1) * max(len(queries.q_ids), 1)
+    return results, visited / denom
+
+
+def calibrate_alpha(index: ClusterIndex, queries: QueryBatch, recall_target: float,
+                    n_sample: int = DEFAULT_CALIBRATION_QUERIES, seed: int = 0) -> Tuple[float, float]:
+    """Plus petit alpha de ALPHA_GRID dont le rappel sur un échantillon de requêtes atteint la cible.
+    Retourne (alpha, rappel mesuré sur l'échantillon)."""
+    if recall_target >= 1.0 or not queries.q_ids:
+        return 1.0, 1.0
+    rng = np.random.default_rng(seed)
+    pick = np.sort(rng.choice(len(queries.q_ids), size=min(n_sample, len(queries.q_ids)), replace=False))
+    sample = QueryBatch([queries.q_ids[i] for i in pick], queries.D[pick], queries.A[pick], queries.Y[pick])
+
+    # Une seule passe exacte par requête : on compte les matches de chaque cluster, puis le rappel de
+    # chaque alpha se déduit des clusters qu'il visiterait (pas de faux positifs possibles).
+    found = np.zeros(len(ALPHA_GRID))
+    n_exact = 0
+    for q_idx in range(len(sample.q_ids)):
+        D, A, Y = float(sample.D[q_idx]), sample.A[q_idx], sample.Y[q_idx]
+        diff = index.centers - A
+        d_c = np.sqrt(np.sum(Y * diff * diff, axis=1))
+        R_c = np.sqrt(index.max_dev * index.max_dev @ np.maximum(Y, 0.0))
+        diff = index.points - A
+        hits = np.sqrt(np.sum(Y * diff * diff, axis=1)) <= D
+        per_cluster = np.add.reduceat(hits, index.starts[:-1]) if len(hits) else np.zeros(len(d_c))
+        per_cluster[index.starts[:-1] == index.starts[1:]] = 0  # reduceat sur un cluster vide
+        n_exact += int(per_cluster.sum())
+        for a_idx, alpha in enumerate(ALPHA_GRID):
+            found[a_idx] += per_cluster[d_c - alpha * R_c <= D * (1.0 + 1e-9) + 1e-9].sum()
+
+    best = (1.0, 1.0)
+    for alpha, n_found in zip(ALPHA_GRID[1:], found[1:]):
+        recall = n_found / n_exact if n_exact else 1.0
+        if recall < recall_target:
+            break
+        best = (alpha, float(recall))
+    return best
+
+
+def approx_engine(points_df: pd.DataFrame, queries_df: pd.DataFrame, recall_target: float = 0.95) -> SearchResults:
+    """Adaptateur (points_df, queries_df) pour benchmark_scaling (construction de l'index incluse)."""
+    index = build_cluster_index(points_df['node_id'].astype(str).to_list(),
+                                points_df[FEATURE_COLS].to_numpy(dtype=float))
+    queries = build_query_batch(queries_df['point_A'].astype(str).to_list(), queries_df['D'].to_list(),
+                                queries_df['Y_vector'].to_list(),
+                                queries_df['A_vector'].to_list() if 'A_vector' in queries_df.columns else None)
+    alpha, _ = calibrate_alpha(index, queries, recall_target)
+    return approx_search(index, queries, alpha)[0]
+
+
+def main(argv: List[str]) -> None:
+    ap = argparse.ArgumentParser(description="Recherche pondérée approchée avec rappel cible réglable.")
+    ap.add_argument("points_csv")
+    ap.add_argument("queries_csv")
+    ap.add_argument("output_csv", nargs="?", default="responses.csv")
+    ap.add_argument("--recall-target", type=float, default=0.95, help="Rappel visé (1.0 = exact)")
+    ap.add_argument("--clusters", type=int, default=0, help="Nombre de clusters (défaut: ~sqrt(N))")
+    ap.add_argument("--calibration-queries", type=int, default=DEFAULT_CALIBRATION_QUERIES)
+    args = ap.parse_args(argv[1:])
+
+    node_ids, points_mat = load_points_csv(args.points_csv)
+    cols = read_queries_csv(args.queries_csv)
+    queries = build_query_batch(cols['point_A'], cols['D'], cols['Y_vector'], cols.get('A_vector'))
+
+    t0 = time.perf_counter()
+    index = build_cluster_index(node_ids, points_mat, args.clusters)
+    alpha, sample_recall = calibrate_alpha(index, queries, args.recall_target, args.calibration_queries)
+    t1 = time.perf_counter()
+    results, visited = approx_search(index, queries, alpha)
+    t2 = time.perf_counter()
+
+    write_response_csv(results, args.output_csv)
+    print(f"Index : {len(index.centers)} clusters, alpha={alpha} (rappel échantillon {sample_recall:.4f}), "
+          f"construction+calibration {t1 - t0:.3f}s")
+    print(f"Recherche : {t2 - t1:.3f}s, {visited * 100:.2f}% des noeuds visités")
+    print(f"✅ Fichier de réponse généré : {args.output_csv}")
+
+
+if __name__ == '__main__':
+    main(sys.argv)
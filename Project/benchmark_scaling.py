@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de passage à l'échelle pour la recherche pondérée par rayon.
+
+Usage
+-----
+python benchmark_scaling.py [--nodes 1000 10000 ...] [--queries 100 1000 ...]
+                            [--selectivity 0.001 0.01 0.1] [--sparsity 0.0 0.5 0.9]
+                            [--engines brute_force ...] [--max-work 2e8] [--json benchmark_scaling.json]
+
+Pour chaque combinaison (N noeuds, Q requêtes, sélectivité, sparsité des poids) :
+- on génère des noeuds synthétiques (features uniformes dans [0,100], comme adsSim_data_nodes.csv) ;
+- on génère des requêtes (A uniforme, Y normalisé à somme 1 avec une fraction `sparsity` de poids nuls)
+  dont le rayon D est choisi pour qu'environ `selectivity` des noeuds soient retournés ;
+- on exécute chaque moteur de ENGINES et on vérifie ses résultats contre la force brute.
+
+Les cellules dont le coût N*Q dépasse --max-work sont marquées 'skipped' (la force brute à 10^7 x 10^5
+n'est pas réaliste sur une seule machine). Le résultat est un tableau affiché et un fichier JSON.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import time
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from brute_force_search import NUM_FEATURES, brute_force_search
+from pq_search import pq_engine
+from approx_search import approx_engine
+
+SearchResults = List[Tuple[str, float, List[Tuple[str, float]]]]
+
+# Moteurs comparés : nom -> fonction(points_df, queries_df) -> résultats au format de brute_force_search
+ENGINES: Dict[str, Callable[[pd.DataFrame, pd.DataFrame], SearchResults]] = {
+    "brute_force": brute_force_search,
+    "brute_force_threads": partial(brute_force_search, threads=max(2, os.cpu_count() or 1)),
+    "pq_exact": pq_engine,
+    "approx_r95": approx_engine,
+}
+
+REFERENCE_ENGINE = "brute_force"
+D_SAMPLE_SIZE = 2_000
+
+
+# --- Génération des données synthétiques ---
+
+def generate_nodes(n_nodes: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Noeuds synthétiques au format du fichier de points (node_id, feature_1..feature_50)."""
+    feats = rng.uniform(0.0, 100.0, size=(n_nodes, NUM_FEATURES))
+    df = pd.DataFrame(feats, columns=[f"feature_{i + 1}" for i in range(NUM_FEATURES)])
+    df.insert(0, "node_id", [f"node_{i + 1}" for i in range(n_nodes)])
+    return df
+
+
+def generate_weights(n_queries: int, sparsity: float, rng: np.random.Generator) -> np.ndarray:
+    """Poids Y >= 0, normalisés à somme 1, avec une fraction `sparsity` de dimensions à 0."""
+    Y = rng.exponential(1.0, size=(n_queries, NUM_FEATURES))
+    n_zero = min(int(round(sparsity * NUM_FEATURES)), NUM_FEATURES - 1)
+    if n_zero:
+        zero_idx = np.argsort(rng.random((n_queries, NUM_FEATURES)), axis=1)[:, :n_zero]
+        np.put_along_axis(Y, zero_idx, 0.0, axis=1)
+    return Y / Y.sum(axis=1, keepdims=True)
+
+
+def radius_for_selectivity(points_mat: np.ndarray, A: np.ndarray, Y: np.ndarray, selectivity: float,
+                           rng: np.random.Generator, chunk: int = 4096) -> np.ndarray:
+    """Choisit D par requête comme quantile des distances vers un échantillon de noeuds."""
+    n_sample = min(D_SAMPLE_SIZE, points_mat.shape[0])
+    sample = points_mat[rng.choice(points_mat.shape[0], size=n_sample, replace=False)]
+    sample_sq = sample * sample
+    D = np.empty(A.shape[0])
+    for start in range(0, A.shape[0], chunk):
+        a, y = A[start:start + chunk], Y[start:start + chunk]
+        # sum_i Y_i (A_i - P_i)^2 = Y.A^2 - 2 (Y*A).P + Y.P^2
+        d2 = (y * a * a).sum(axis=1)[:, None] - 2.0 * (y * a) @ sample.T + y @ sample_sq.T
+        D[start:start + chunk] = np.quantile(np.sqrt(np.maximum(d2, 0.0)), selectivity, axis=1)
+    return D
+
+
+def _format_vectors(mat: np.ndarray) -> List[str]:
+    return [";".join(f"{x:.6f}" for x in row) for row in mat]
+
+
+def generate_queries(points_mat: np.ndarray, n_queries: int, selectivity: float, sparsity: float,
+                     rng: np.random.Generator) -> pd.DataFrame:
+    """Requêtes synthétiques au format de queries_structured.csv."""
+    A = rng.uniform(0.0, 100.0, size=(n_queries, NUM_FEATURES))
+    Y = generate_weights(n_queries, sparsity, rng)
+    D = radius_for_selectivity(points_mat, A, Y, selectivity, rng)
+    return pd.DataFrame({
+        "point_A": [f"q_{i + 1}" for i in range(n_queries)],
+        "A_vector": _format_vectors(A),
+        "Y_vector": _format_vectors(Y),
+        "D": np.round(D, 6),
+    })
+
+
+# --- Vérification ---
+
+def compare_to_reference(results: SearchResults, reference: SearchResults) -> Dict[str, Any]:
+    """Rappel/précision par requête sur les ensembles de noeuds, et nombre de requêtes identiques."""
+    ref_sets = {q_id: {n for n, _ in matches} for q_id, _, matches in reference}
+    pred_sets = {q_id: {n for n, _ in matches} for q_id, _, matches in results}
+    recalls, precisions, exact = [], [], 0
+    for q_id, ref in ref_sets.items():
+        pred = pred_sets.get(q_id, set())
+        inter = len(ref & pred)
+        recalls.append(inter / len(ref) if ref else float(not pred))
+        precisions.append(inter / len(pred) if pred else 1.0)
+        exact += ref == pred
+    return {
+        "recall": float(np.mean(recalls)) if recalls else 1.0,
+        "precision": float(np.mean(precisions)) if precisions else 1.0,
+        "exact_queries": exact,
+        "identical": exact == len(ref_sets),
+    }
+
+
+# --- Exécution du benchmark ---
+
+def run_cell(points_df: pd.DataFrame, queries_df: pd.DataFrame, engines: Dict[str, Callable]) -> Dict[str, Any]:
+    """Exécute tous les moteurs sur une cellule et compare chacun à la force brute."""
+    timings: Dict[str, Any] = {}
+    reference: Optional[SearchResults] = None
+
+    ordered = sorted(engines, key=lambda name: name != REFERENCE_ENGINE)  # référence en premier
+    for name in ordered:
+        t0 = time.perf_counter()
+        try:
+            results = engines[name](points_df, queries_df)
+        except Exception as e:
+            timings[name] = {"error": str(e)}
+            continue
+        elapsed = time.perf_counter() - t0
+
+        entry: Dict[str, Any] = {
+            "seconds": elapsed,
+            "queries_per_s": len(queries_df) / elapsed if elapsed > 0 else float("inf"),
+            "mean_matches": float(np.mean([len(m) for _, _, m in results])) if results else 0.0,
+        }
+        if name == REFERENCE_ENGINE:
+            reference = results
+        elif reference is None:
+            reference = ENGINES[REFERENCE_ENGINE](points_df, queries_df)
+        entry.update(compare_to_reference(results, reference))
+        timings[name] = entry
+    return timings
+
+
+def run_benchmark(nodes_list: List[int], queries_list: List[int], selectivities: List[float],
+                  sparsities: List[float], engine_names: List[str], max_work: float, seed: int) -> List[Dict[str, Any]]:
+    engines = {name: ENGINES[name] for name in engine_names}
+    rows: List[Dict[str, Any]] = []
+    for n_nodes in nodes_list:
+        points_df: Optional[pd.DataFrame] = None
+        rng = np.random.default_rng(seed + n_nodes)
+        for n_queries in queries_list:
+            skipped = n_nodes * n_queries > max_work
+            if not skipped and points_df is None:
+                print(f"Génération de {n_nodes} noeuds...")
+                points_df = generate_nodes(n_nodes, rng)
+                points_mat = points_df.iloc[:, 1:].to_numpy(dtype=float)
+
+            for sel in selectivities:
+                for sp in sparsities:
+                    row: Dict[str, Any] = {"nodes": n_nodes, "queries": n_queries, "selectivity": sel,
+                                           "sparsity": sp, "skipped": skipped}
+                    rows.append(row)
+                    if skipped:
+                        continue
+                    queries_df = generate_queries(points_mat, n_queries, sel, sp, rng)
+                    print(f"  N={n_nodes:>9} Q={n_queries:>7} sélectivité={sel:<6} sparsité={sp:<4}", end=" ", flush=True)
+                    row["engines"] = run_cell(points_df, queries_df, engines)
+                    print(" | ".join(
+                        f"{name}: {t['seconds']:.3f}s" if "seconds" in t else f"{name}: ERREUR"
+                        for name, t in row["engines"].items()))
+    return rows
+
+
+def print_table(rows: List[Dict[str, Any]], engine_names: List[str]) -> None:
+    header = f"{'N':>10} {'Q':>8} {'sel':>7} {'sparse':>6} " + " ".join(f"{name:>24}" for name in engine_names)
+    print("\n===== Tableau de passage à l'échelle (secondes | rappel) =====")
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        cells = []
+        for name in engine_names:
+            t = row.get("engines", {}).get(name)
+            if row["skipped"]:
+                cells.append(f"{'skipped':>24}")
+            elif t is None or "seconds" not in t:
+                cells.append(f"{'ERREUR':>24}")
+            else:
+                flag = "" if t["identical"] else " ≠"
+                cells.append(f"{t['seconds']:>12.4f}s | {t['recall']:>6.4f}{flag:>2}")
+        print(f"{row['nodes']:>10} {row['queries']:>8} {row['selectivity']:>7} {row['sparsity']:>6} " + " ".join(cells))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark de passage à l'échelle des moteurs de recherche pondérée.")
+    ap.add_argument("--nodes", type=int, nargs="+", default=[10**3, 10**4, 10**5, 10**6, 10**7])
+    ap.add_argument("--queries", type=int, nargs="+", default=[10**2, 10**3, 10**4, 10**5])
+    ap.add_argument("--selectivity", type=float, nargs="+", default=[0.001, 0.01, 0.1],
+                    help="Fraction visée de noeuds retournés par requête (pilote D)")
+    ap.add_argument("--sparsity", type=float, nargs="+", default=[0.0, 0.5, 0.9],
+                    help="Fraction de poids Y nuls par requête")
+    ap.add_argument("--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES))
+    ap.add_argument("--max-work", type=float, default=2e8,
+                    help="Ignore les cellules dont N*Q dépasse ce budget")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--json", type=str, default="benchmark_scaling.json", help="Fichier JSON des résultats")
+    args = ap.parse_args()
+
+    rows = run_benchmark(args.nodes, args.queries, args.selectivity, args.sparsity,
+                         args.engines, args.max_work, args.seed)
+    print_table(rows, args.engines)
+
+    with open(args.json, "w", encoding="utf-8") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "seed": args.seed,
+            "max_work": args.max_work,
+            "rows": rows,
+        }, f, indent=2)
+    print(f"\n✅ Résultats JSON : {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,33 @@ Brute-force weighted search on a graph of nodes with 50-dimensional feature vect
 
 Usage
 -----
-python brute_force_search.py <points.csv> <queries.csv> [output.csv]
+python brute_force_search.py <points.csv> <queries.csv> [output.csv] [--profile [--profile-memory]]
+                             [--checkpoint-every K [--resume]] [--threads N] [--format csv|npz]
 
 - <points.csv>  : CSV contenant au minimum les colonnes 'node_id' et 'feature_1'..'feature_50' (autres colonnes ignorées).
 - <queries.csv> : CSV contenant au minimum les colonnes 'point_A', 'Y_vector', 'D', et **de préférence** 'A_vector'.
                   'Y_vector' et 'A_vector' sont des chaînes de 50 valeurs séparées par ';'.
 - [output.csv]  : (optionnel) fichier de sortie, par défaut 'responses.csv'.
 
+Options
+-------
+--profile : mesure chaque phase (chargement CSV, parsing des requêtes, calcul des distances, tri,
+            écriture) : temps mur, temps CPU et hausse du pic RSS pendant la phase (le pic RSS du
+            processus, cumulatif, n'est donné qu'une fois pour toute l'exécution), ainsi que les
+            percentiles du temps de calcul par requête et du nombre de matches. Le tout est écrit dans un fichier JSON à côté de la
+            sortie (ex: responses.profile.json).
+--profile-memory : (implique --profile) ajoute le pic tracemalloc de chaque phase. tracemalloc trace
+            chaque allocation et gonfle les temps mesurés : à lancer dans une passe séparée.
+--checkpoint-every K : traite les requêtes par blocs de K et ajoute chaque bloc terminé à la sortie,
+            avec un manifeste <sortie>.ckpt.json (progression, hash SHA-256 des fichiers d'entrée).
+--threads N : répartit les requêtes sur N threads ; les distances sont calculées par tuiles de lignes avec
+            des tampons par thread, et numpy relâche le GIL pendant ces opérations.
+--format npz : écrit la sortie en tableaux binaires (.npz non compressé) au lieu du CSV : offsets (Q+1),
+            indices des noeuds, distances float32, identifiants des requêtes et table des node_id.
+            Relecture : load_response_npz(path). Le CSV reste le format par défaut (évaluateur).
+--resume  : reprend à partir du manifeste (blocs terminés ignorés, bloc partiel tronqué) ; le fichier
+            final est identique à celui d'une exécution sans interruption.
+
 Méthode
 -------
 Pour chaque requête q=(point_A, A, Y, D), on calcule la distance euclidienne pondérée:
@@ -20,18 +40,33 @@ Pour chaque requête q=(point_A, A, Y, D), on calcule la distance euclidienne po
 
 On retourne tous les noeuds P tels que dist(A,P) <= D. Implémentation 100% brute-force (pas d'optimisations).
 
+Voir aussi distributed_search.py (mode coordinateur/workers sur des partitions du fichier de points).
+
 Compatibilité
 -------------
 Si la colonne 'A_vector' est absente, on **génère** un vecteur A (50 dim) de manière **déterministe** à partir de
 'point_A' (seed dérivé), pour rester compatible avec les anciens jeux de requêtes.
 """
 from __future__ import annotations
+import argparse
 import sys
+import os
+import json
+import time
+import csv
 import hashlib
-from typing import List, Tuple
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import resource  # Unix uniquement (pic RSS)
+except ImportError:  # pragma: no cover - Windows
+    resource = None
 
 import numpy as np
-import pandas as pd
+
+if TYPE_CHECKING:  # pandas n'est importé que par les appelants qui manipulent des DataFrames
+    import pandas as pd
 
 NUM_FEATURES = 50
 
@@ -48,6 +83,21 @@ def parse_weights(y_str: str) -> np.ndarray:
 def parse_A(a_str: str) -> np.ndarray:
     return parse_vec_50(a_str, 'A_vector')
 
+def parse_vec_50_batch(semicol_strs: Sequence[Any], label: str) -> np.ndarray:
+    """Parse une colonne entière de vecteurs ';' en un tableau (Q,50).
+    Chemin rapide : un seul split + conversion numpy ; sinon retombe sur parse_vec_50 ligne par ligne
+    (espaces, ';' final, longueur invalide -> même message d'erreur).
+    """
+    rows = [str(s).split(';') for s in semicol_strs]
+    if all(len(r) == NUM_FEATURES for r in rows):
+        try:
+            return np.array([x for r in rows for x in r], dtype=float).reshape(len(rows), NUM_FEATURES)
+        except ValueError:
+            pass
+    if not rows:
+        return np.empty((0, NUM_FEATURES), dtype=float)
+    return np.stack([parse_vec_50(s, label) for s in semicol_strs])
+
 def generate_A(point_A: str) -> np.ndarray:
     """Generate a deterministic 50-dim vector A in [0,100] seeded by point_A."""
     h = hashlib.sha256(point_A.encode('utf-8')).hexdigest()
@@ -55,88 +105,631 @@ def generate_A(point_A: str) -> np.ndarray:
     rng = np.random.default_rng(seed)
     return rng.uniform(0.0, 100.0, size=NUM_FEATURES).astype(float)
 
-def brute_force_search(points_df: pd.DataFrame, queries_df: pd.DataFrame) -> List[Tuple[str, float, List[Tuple[str, float]]]]:
-    # Identify the 50 feature columns (tolerant to extra columns like 'cluster_id')
-    feature_cols = [f'feature_{i+1}' for i in range(NUM_FEATURES)]
-    for col in feature_cols:
-        if col not in points_df.columns:
+# --- Génération vectorisée de A ---------------------------------------------------------------
+# np.random.default_rng(seed) = PCG64(SeedSequence(seed)). On réimplémente ces deux étapes sur des
+# tableaux uint32/uint64 (une ligne par requête) pour produire exactement les mêmes doubles que
+# generate_A, sans construire un Generator par requête.
+
+_SS_INIT_A = 0x43b0d7e5
+_SS_MULT_A = 0x931e8875
+_SS_INIT_B = 0x8b51f9dd
+_SS_MULT_B = 0x58f38ded
+_SS_MIX_MULT_L = np.uint32(0xca01f9dd)
+_SS_MIX_MULT_R = np.uint32(0x4973f715)
+_SS_POOL_SIZE = 4
+_MASK32 = 0xFFFFFFFF
+
+_U64_MASK32 = np.uint64(0xFFFFFFFF)
+_PCG_MULT_HI = np.uint64(2549297995355413924)
+_PCG_MULT_LO = np.uint64(4865540595714422341)
+
+def _ss_hashmix(value: np.ndarray, hash_const: List[int], mult: int) -> np.ndarray:
+    value = value ^ np.uint32(hash_const[0])
+    hash_const[0] = (hash_const[0] * mult) & _MASK32
+    value = value * np.uint32(hash_const[0])
+    return value ^ (value >> np.uint32(16))
+
+def _ss_mix(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    result = _SS_MIX_MULT_L * x - _SS_MIX_MULT_R * y
+    return result ^ (result >> np.uint32(16))
+
+def _seed_sequence_state(seeds: np.ndarray) -> np.ndarray:
+    """SeedSequence(seed).generate_state(4, uint64) pour un tableau de seeds 32 bits -> (Q,4) uint64."""
+    with np.errstate(over='ignore'):
+        hash_const = [_SS_INIT_A]
+        zeros = np.zeros_like(seeds)
+        pool = [_ss_hashmix(seeds, hash_const, _SS_MULT_A)]
+        pool += [_ss_hashmix(zeros, hash_const, _SS_MULT_A) for _ in range(_SS_POOL_SIZE - 1)]
+        for i_src in range(_SS_POOL_SIZE):
+            for i_dst in range(_SS_POOL_SIZE):
+                if i_src != i_dst:
+                    pool[i_dst] = _ss_mix(pool[i_dst], _ss_hashmix(pool[i_src], hash_const, _SS_MULT_A))
+
+        hash_const = [_SS_INIT_B]
+        words = [_ss_hashmix(pool[i % _SS_POOL_SIZE], hash_const, _SS_MULT_B) for i in range(8)]
+
+    # Deux mots 32 bits consécutifs forment un uint64 (petit-boutiste, comme .view(np.uint64))
+    lo = np.stack(words[0::2], axis=1).astype(np.uint64)
+    hi = np.stack(words[1::2], axis=1).astype(np.uint64)
+    return lo | (hi << np.uint64(32))
+
+def _mulhi64(a: np.ndarray, b: np.uint64) -> np.ndarray:
+    a0, a1 = a & _U64_MASK32, a >> np.uint64(32)
+    b0, b1 = b & _U64_MASK32, b >> np.uint64(32)
+    p00, p01, p10, p11 = a0 * b0, a0 * b1, a1 * b0, a1 * b1
+    mid = (p00 >> np.uint64(32)) + (p01 & _U64_MASK32) + (p10 & _U64_MASK32)
+    return p11 + (p01 >> np.uint64(32)) + (p10 >> np.uint64(32)) + (mid >> np.uint64(32))
+
+def _pcg_step(hi: np.ndarray, lo: np.ndarray, inc_hi: np.ndarray, inc_lo: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """state = state * MULT + inc (arithmétique 128 bits sur des paires uint64)."""
+    new_hi = _mulhi64(lo, _PCG_MULT_LO) + lo * _PCG_MULT_HI + hi * _PCG_MULT_LO
+    new_lo = lo * _PCG_MULT_LO
+    out_lo = new_lo + inc_lo
+    out_hi = new_hi + inc_hi + (out_lo < new_lo).astype(np.uint64)
+    return out_hi, out_lo
+
+def _pcg64_uniform(state_words: np.ndarray, n: int, low: float, high: float) -> np.ndarray:
+    """Equivalent vectorisé de default_rng(seed).uniform(low, high, size=n), une ligne par seed."""
+    s_hi, s_lo = state_words[:, 0], state_words[:, 1]
+    i_hi, i_lo = state_words[:, 2], state_words[:, 3]
+    out = np.empty((state_words.shape[0], n), dtype=float)
+    with np.errstate(over='ignore'):
+        # pcg_setseq_128_srandom_r
+        inc_hi = (i_hi << np.uint64(1)) | (i_lo >> np.uint64(63))
+        inc_lo = (i_lo << np.uint64(1)) | np.uint64(1)
+        hi, lo = inc_hi.copy(), inc_lo.copy()
+        lo2 = lo + s_lo
+        hi = hi + s_hi + (lo2 < lo).astype(np.uint64)
+        hi, lo = _pcg_step(hi, lo2, inc_hi, inc_lo)
+        for j in range(n):
+            hi, lo = _pcg_step(hi, lo, inc_hi, inc_lo)
+            # Sortie XSL-RR puis next_double = (x >> 11) * 2^-53
+            x = hi ^ lo
+            rot = hi >> np.uint64(58)
+            x = (x >> rot) | (x << ((np.uint64(64) - rot) & np.uint64(63)))
+            out[:, j] = (x >> np.uint64(11)).astype(float) * (1.0 / 9007199254740992.0)
+    return low + (high - low) * out
+
+def generate_A_batch(point_ids: Iterable[str]) -> np.ndarray:
+    """Version vectorisée de generate_A : retourne un tableau (Q,50) identique bit à bit.
+    Les seeds sont dérivés en une passe et chaque point_A distinct n'est calculé qu'une fois.
+    """
+    index: Dict[str, int] = {}
+    inverse = np.fromiter((index.setdefault(str(p), len(index)) for p in point_ids), dtype=np.intp)
+    if not index:
+        return np.empty((0, NUM_FEATURES), dtype=float)
+
+    # seed = int(sha256[:16 hex], 16) % 2**32  -> octets 4..7 du digest en big-endian
+    digests = b''.join(hashlib.sha256(p.encode('utf-8')).digest() for p in index)
+    seeds = np.frombuffer(digests, dtype='>u4').reshape(-1, 8)[:, 1].astype(np.uint32)
+
+    unique_A = _pcg64_uniform(_seed_sequence_state(seeds), NUM_FEATURES, 0.0, 100.0)
+    return unique_A[inverse]
+
+# --- Instrumentation (--profile) ----------------------------------------------------------------
+
+def _peak_rss_kb() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak  # macOS: octets, Linux: Ko
+
+class SearchProfiler:
+    """Accumule, par phase, le temps mur, le temps CPU et le pic mémoire d'une exécution.
+
+    - `phase(name)` : context manager pour les phases exécutées une seule fois (chargement, écriture).
+    - `start()` / `lap(name)` : pour les phases entrelacées dans la boucle des requêtes ; chaque lap
+      ajoute le temps écoulé depuis le dernier point de repère à la phase `name`.
+    - `rss_growth_kb` : de combien le pic RSS du processus (ru_maxrss, cumulatif) a monté pendant la phase ;
+      0 pour une phase qui reste sous le pic déjà atteint.
+    - `track_memory=True` : pic tracemalloc par phase en plus. tracemalloc ralentit chaque allocation,
+      donc les temps d'une telle passe ne sont pas comparables à ceux d'une passe sans.
+    """
+
+    def __init__(self, track_memory: bool = False) -> None:
+        self._tracemalloc = None
+        if track_memory:
+            import tracemalloc  # importé ici : seul --profile-memory en a besoin
+            self._tracemalloc = tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.query_compute_s: List[float] = []
+        self.query_matches: List[int] = []
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        self._mark = (self._wall0, self._cpu0)
+        self._rss_mark = _peak_rss_kb()
+
+    def _add(self, name: str, wall: float, cpu: float) -> None:
+        ph = self.phases.setdefault(name, {'wall_s': 0.0, 'cpu_s': 0.0, 'calls': 0})
+        ph['wall_s'] += wall
+        ph['cpu_s'] += cpu
+        ph['calls'] += 1
+        peak = _peak_rss_kb()
+        if peak is not None:
+            ph['rss_growth_kb'] = ph.get('rss_growth_kb', 0) + peak - self._rss_mark
+            self._rss_mark = peak
+        if self._tracemalloc:
+            peak_bytes = self._tracemalloc.get_traced_memory()[1]
+            ph['tracemalloc_peak_bytes'] = max(ph.get('tracemalloc_peak_bytes', 0), peak_bytes)
+            self._tracemalloc.reset_peak()
+
+    def phase(self, name: str) -> '_ProfiledPhase':
+        return _ProfiledPhase(self, name)
+
+    def start(self) -> None:
+        if self._tracemalloc:
+            self._tracemalloc.reset_peak()
+        self._mark = (time.perf_counter(), time.process_time())
+        self._rss_mark = _peak_rss_kb()
+
+    def lap(self, name: str) -> float:
+        """Clôt le segment courant au nom de `name` et retourne sa durée murale."""
+        wall, cpu = time.perf_counter(), time.process_time()
+        elapsed = wall - self._mark[0]
+        self._add(name, elapsed, cpu - self._mark[1])
+        self._mark = (wall, cpu)
+        return elapsed
+
+    def record_query(self, compute_s: float, n_matches: int) -> None:
+        self.query_compute_s.append(compute_s)
+        self.query_matches.append(n_matches)
+
+    def to_dict(self, **metadata: Any) -> Dict[str, Any]:
+        import platform
+
+        def stats(values: List[float]) -> Dict[str, float]:
+            if not values:
+                return {}
+            arr = np.asarray(values, dtype=float)
+            p50, p90, p95, p99 = np.percentile(arr, [50, 90, 95, 99])
+            return {'min': float(arr.min()), 'p50': float(p50), 'p90': float(p90), 'p95': float(p95),
+                    'p99': float(p99), 'max': float(arr.max()), 'mean': float(arr.mean()), 'total': float(arr.sum())}
+
+        return {
+            **metadata,
+            'python': platform.python_version(),
+            'memory_tracking': self._tracemalloc is not None,
+            'numpy': np.__version__,
+            'total_wall_s': time.perf_counter() - self._wall0,
+            'total_cpu_s': time.process_time() - self._cpu0,
+            'peak_rss_kb': _peak_rss_kb(),
+            'phases': self.phases,
+            'per_query': {
+                'count': len(self.query_compute_s),
+                'compute_s': stats(self.query_compute_s),
+                'matches': stats(self.query_matches),
+            },
+        }
+
+    def write(self, output_path: str, **metadata: Any) -> str:
+        """Écrit le profil JSON à côté de `output_path` et retourne le chemin du sidecar."""
+        sidecar = profile_sidecar_path(output_path)
+        with open(sidecar, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(**metadata), f, indent=2)
+        return sidecar
+
+class _ProfiledPhase:
+    def __init__(self, profiler: SearchProfiler, name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> SearchProfiler:
+        self.profiler.start()
+        return self.profiler
+
+    def __exit__(self, *exc: Any) -> None:
+        self.profiler.lap(self.name)
+
+def profile_sidecar_path(output_path: str) -> str:
+    return os.path.splitext(output_path)[0] + '.profile.json'
+
+# --- Chargement / écriture sans pandas --------------------------------------------------------
+
+FEATURE_COLS = [f'feature_{i+1}' for i in range(NUM_FEATURES)]
+OUTPUT_COLS = ['query_id', 'D', 'num_matches', 'nodes', 'nodes_with_distance']
+
+class QueryBatch(NamedTuple):
+    """Requêtes parsées : identifiants, rayons (Q,), centres A (Q,50) et poids Y (Q,50)."""
+    q_ids: List[str]
+    D: np.ndarray
+    A: np.ndarray
+    Y: np.ndarray
+
+def _read_header(path: str) -> List[str]:
+    with open(path, newline='', encoding='utf-8') as f:
+        return next(csv.reader(f), [])
+
+def load_points_csv(points_file: str) -> Tuple[List[str], np.ndarray]:
+    """Charge le fichier des noeuds -> (node_ids, points_mat (N,50)) avec le parseur C de numpy."""
+    header = _read_header(points_file)
+    if 'node_id' not in header:
+        raise KeyError("Points file must contain 'node_id' column")
+    for col in FEATURE_COLS:
+        if col not in header:
             raise KeyError(f"Missing column '{col}' in points file")
 
-    results_per_query: List[Tuple[str, float, List[Tuple[str, float]]]] = []
+    opts = dict(delimiter=',', skiprows=1, quotechar='"', encoding='utf-8', ndmin=1)
+    node_ids = np.loadtxt(points_file, usecols=header.index('node_id'), dtype=str, **opts).tolist()
+    opts['ndmin'] = 2
+    points_mat = np.loadtxt(points_file, usecols=[header.index(c) for c in FEATURE_COLS], dtype=float, **opts)
+    return node_ids, points_mat.reshape(-1, NUM_FEATURES)
 
-    # Pre-materialize points to numpy for speed (still brute-force)
-    node_ids = points_df['node_id'].astype(str).to_list()
-    points_mat = points_df[feature_cols].to_numpy(dtype=float)
+def read_queries_csv(queries_file: str) -> Dict[str, List[str]]:
+    """Lit le fichier des requêtes en colonnes de chaînes (point_A, Y_vector, D, A_vector optionnel)."""
+    with open(queries_file, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        for col in ('point_A', 'Y_vector', 'D'):
+            if col not in header:
+                raise KeyError(f"Queries file must contain '{col}' column")
+        rows = [r for r in reader if r]
+    # A_vector is optional but recommended
+    return {col: [r[j] for r in rows] for j, col in enumerate(header)}
 
-    has_A = 'A_vector' in queries_df.columns
+def build_query_batch(point_ids: Sequence[Any], D_values: Sequence[Any], Y_strs: Sequence[Any],
+                      A_strs: Optional[Sequence[Any]] = None) -> QueryBatch:
+    q_ids = [str(p) for p in point_ids]
+    D = np.array([float(d) for d in D_values], dtype=float)
+    Y = parse_vec_50_batch(Y_strs, 'Y_vector')
+    if A_strs is not None:
+        A = parse_vec_50_batch(A_strs, 'A_vector')
+    else:
+        # Backward compatibility : tous les A générés d'un coup (vectorisé, mémoïsé par point_A)
+        A = generate_A_batch(q_ids)
+    return QueryBatch(q_ids, D, A, Y)
 
-    for _, q in queries_df.iterrows():
-        q_id = str(q['point_A'])
-        D = float(q['D'])
-        Y = parse_weights(q['Y_vector'])
+# --- Recherche ---------------------------------------------------------------------------------
 
-        if has_A:
-            A = parse_A(q['A_vector'])
-        else:
-            A = generate_A(q_id)  # Backward compatibility
+DEFAULT_TILE_ROWS = 8192
+
+class _Scratch:
+    """Tampons de travail d'un thread, réutilisés d'une requête à l'autre (pas d'allocation (N,50))."""
+
+    def __init__(self, rows: int) -> None:
+        self.diff = np.empty((rows, NUM_FEATURES))
+        self.weighted = np.empty((rows, NUM_FEATURES))
+        self.dists = np.empty(rows)
+
+def _query_hits(points_mat: np.ndarray, A: np.ndarray, Y: np.ndarray, D: float,
+                scratch: _Scratch, tile_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices et distances des noeuds à distance <= D, calculés par tuiles de `tile_rows` lignes.
+    Même enchaînement d'opérations que np.sqrt(np.sum(Y * diff * diff, axis=1)) -> mêmes distances au bit près.
+    """
+    idx_parts, dist_parts = [], []
+    for start in range(0, points_mat.shape[0], tile_rows):
+        block = points_mat[start:start + tile_rows]
+        n = block.shape[0]
+        diff, weighted, dists = scratch.diff[:n], scratch.weighted[:n], scratch.dists[:n]
+        np.subtract(block, A, out=diff)
+        np.multiply(Y, diff, out=weighted)
+        np.multiply(weighted, diff, out=weighted)
+        np.sum(weighted, axis=1, out=dists)
+        np.sqrt(dists, out=dists)
+        hit = np.flatnonzero(dists <= D)
+        if len(hit):
+            idx_parts.append(hit + start)
+            dist_parts.append(dists[hit])
+    if not idx_parts:
+        return np.zeros(0, dtype=np.intp), np.zeros(0)
+    return np.concatenate(idx_parts), np.concatenate(dist_parts)
+
+def _sorted_hits(node_ids: List[str], idx: np.ndarray, dists: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices et distances triés par distance croissante puis node_id (déterminisme).
+    Le tri garde les indices : deux noeuds de même node_id restent distincts."""
+    idx_l, dists_l = idx.tolist(), dists.tolist()
+    order = sorted(range(len(idx_l)), key=lambda k: (dists_l[k], node_ids[idx_l[k]]))
+    return idx[order], dists[order]
 
-        # Compute distances to all nodes (vectorized)
-        diff = points_mat - A  # (N,50)
-        dists = np.sqrt(np.sum(Y * diff * diff, axis=1))
+def _sorted_matches(node_ids: List[str], idx: np.ndarray, dists: np.ndarray) -> List[Tuple[str, float]]:
+    idx, dists = _sorted_hits(node_ids, idx, dists)
+    return [(node_ids[i], d) for i, d in zip(idx.tolist(), dists.tolist())]
+
+def _threaded_search(node_ids: List[str], points_mat: np.ndarray, queries: QueryBatch, threads: int,
+                     tile_rows: int, profiler: Optional[SearchProfiler], index_only: bool = False) -> List[Tuple[str, float, Any]]:
+    """Répartit les requêtes en tranches sur un ThreadPoolExecutor. Les grosses opérations numpy
+    (soustraction, produits, réduction sur une tuile) relâchent le GIL : les threads calculent en parallèle."""
+    import threading  # importés ici : le chemin série (cas par défaut) s'en passe
+    from concurrent.futures import ThreadPoolExecutor
+
+    local = threading.local()
+    rows = min(tile_rows, max(points_mat.shape[0], 1))
+    finish = _sorted_hits if index_only else _sorted_matches
+
+    def run(span: Tuple[int, int]) -> List[Tuple[str, float, Any, float]]:
+        scratch = getattr(local, 'scratch', None)
+        if scratch is None:
+            scratch = local.scratch = _Scratch(rows)
+        out = []
+        for q_idx in range(*span):
+            t0 = time.perf_counter()
+            D = float(queries.D[q_idx])
+            idx, dists = _query_hits(points_mat, queries.A[q_idx], queries.Y[q_idx], D, scratch, tile_rows)
+            compute_s = time.perf_counter() - t0
+            out.append((queries.q_ids[q_idx], D, finish(node_ids, idx, dists), compute_s))
+        return out
+
+    n_q = len(queries.q_ids)
+    step = max(1, -(-n_q // (threads * 4)))  # ~4 tranches par thread pour équilibrer la charge
+    spans = [(start, min(start + step, n_q)) for start in range(0, n_q, step)]
+
+    results_per_query: List[Tuple[str, float, Any]] = []
+    if profiler:
+        profiler.start()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for part in pool.map(run, spans):
+            for q_id, D, matches, compute_s in part:
+                results_per_query.append((q_id, D, matches))
+                if profiler:
+                    profiler.record_query(compute_s, len(matches[0]) if index_only else len(matches))
+    if profiler:
+        profiler.lap('threaded_search')
+    return results_per_query
 
-        # Collect matches within radius D
-        matches: List[Tuple[str, float]] = [
-            (node_ids[i], float(dists[i])) for i in range(len(node_ids)) if dists[i] <= D
-        ]
+def radius_search(node_ids: List[str], points_mat: np.ndarray, queries: QueryBatch,
+                  profiler: Optional[SearchProfiler] = None, threads: int = 1,
+                  tile_rows: int = DEFAULT_TILE_ROWS, index_only: bool = False) -> List[Tuple[str, float, Any]]:
+    """Recherche brute-force sur des tableaux déjà chargés (aucune dépendance à pandas).
+    `threads > 1` répartit les requêtes sur un pool de threads (voir _threaded_search).
+    Chaque résultat est (q_id, D, matches) avec matches = [(node_id, distance), ...] ; avec `index_only`,
+    matches = (indices dans node_ids, distances), deux tableaux triés de la même façon (voir results_to_arrays).
+    """
+    if threads > 1:
+        return _threaded_search(node_ids, points_mat, queries, threads, tile_rows, profiler, index_only)
 
-        # Sort matches by distance asc, then node_id for determinism
-        matches.sort(key=lambda x: (x[1], x[0]))
+    finish = _sorted_hits if index_only else _sorted_matches
+    results_per_query: List[Tuple[str, float, Any]] = []
+    scratch = _Scratch(min(tile_rows, max(points_mat.shape[0], 1)))
+    if profiler:
+        profiler.start()
+
+    for q_idx, q_id in enumerate(queries.q_ids):
+        D = float(queries.D[q_idx])
+
+        # Compute distances to all nodes (vectorized, by tiles) and keep those within radius D
+        idx, dists = _query_hits(points_mat, queries.A[q_idx], queries.Y[q_idx], D, scratch, tile_rows)
+        if profiler:
+            compute_s = profiler.lap('distance_compute')
+
+        matches = finish(node_ids, idx, dists)
+        if profiler:
+            profiler.lap('select_sort')
+            profiler.record_query(compute_s, len(idx))
 
         results_per_query.append((q_id, D, matches))
 
     return results_per_query
 
-def write_response_csv(results: List[Tuple[str, float, List[Tuple[str, float]]]], output_path: str) -> None:
-    rows = []
+def brute_force_search(points_df: pd.DataFrame, queries_df: pd.DataFrame,
+                       profiler: Optional[SearchProfiler] = None,
+                       threads: int = 1) -> List[Tuple[str, float, List[Tuple[str, float]]]]:
+    """Point d'entrée DataFrame (compatibilité) : convertit en tableaux puis appelle radius_search."""
+    # Identify the 50 feature columns (tolerant to extra columns like 'cluster_id')
+    for col in FEATURE_COLS:
+        if col not in points_df.columns:
+            raise KeyError(f"Missing column '{col}' in points file")
+    if profiler:
+        profiler.start()
+
+    # Pre-materialize points to numpy for speed (still brute-force)
+    node_ids = points_df['node_id'].astype(str).to_list()
+    points_mat = points_df[FEATURE_COLS].to_numpy(dtype=float)
+    if profiler:
+        profiler.lap('prepare')
+
+    queries = build_query_batch(
+        queries_df['point_A'].astype(str).to_list(),
+        queries_df['D'].to_list(),
+        queries_df['Y_vector'].to_list(),
+        queries_df['A_vector'].to_list() if 'A_vector' in queries_df.columns else None,
+    )
+    if profiler:
+        profiler.lap('query_parse')
+
+    return radius_search(node_ids, points_mat, queries, profiler, threads)
+
+def _write_response_rows(f: Any, results: List[Tuple[str, float, List[Tuple[str, float]]]],
+                         header: bool = False, extra: Sequence[Tuple[str, Any]] = ()) -> None:
+    """`extra` : colonnes constantes ajoutées après OUTPUT_COLS (ex: version de snapshot)."""
+    writer = csv.writer(f, lineterminator=os.linesep)
+    if header:
+        writer.writerow(OUTPUT_COLS + [name for name, _ in extra])
+    extra_values = [value for _, value in extra]
     for q_id, D, matches in results:
         node_list = ';'.join(n for n, _ in matches)
         node_with_dist_list = ';'.join(f"{n}:{d:.6f}" for n, d in matches)
-        rows.append({
-            'query_id': q_id,
-            'D': D,
-            'num_matches': len(matches),
-            'nodes': node_list,
-            'nodes_with_distance': node_with_dist_list,
-        })
-    out_df = pd.DataFrame(rows, columns=['query_id', 'D', 'num_matches', 'nodes', 'nodes_with_distance'])
-    out_df.to_csv(output_path, index=False)
+        writer.writerow([q_id, D, len(matches), node_list, node_with_dist_list] + extra_values)
+
+def write_response_csv(results: List[Tuple[str, float, List[Tuple[str, float]]]], output_path: str) -> None:
+    # Même format que DataFrame.to_csv(index=False), sans importer pandas
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        _write_response_rows(f, results, header=True)
+
+# --- Sortie binaire (--format npz) -------------------------------------------------------------
+
+class ResponseArrays(NamedTuple):
+    """Réponses en tableaux plats (format CSR) : les matches de la requête i sont
+    node_index[offsets[i]:offsets[i+1]] (indices dans node_ids) et distances[offsets[i]:offsets[i+1]]."""
+    query_ids: np.ndarray    # (Q,) str
+    D: np.ndarray            # (Q,) float64
+    offsets: np.ndarray      # (Q+1,) int64
+    node_index: np.ndarray   # (M,) int32/int64, indices dans node_ids
+    distances: np.ndarray    # (M,) float32
+    node_ids: np.ndarray     # (N,) bytes UTF-8, table des noeuds (ordre du fichier de points)
+
+    def matches(self, i: int) -> List[Tuple[str, float]]:
+        lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+        names = [n.decode('utf-8') for n in self.node_ids[self.node_index[lo:hi]].tolist()]
+        return list(zip(names, self.distances[lo:hi].tolist()))
+
+def results_to_arrays(results: List[Tuple[str, float, Tuple[np.ndarray, np.ndarray]]],
+                      node_ids: List[str]) -> ResponseArrays:
+    """`results` : sortie de radius_search(..., index_only=True). Les indices viennent directement de la
+    recherche (pas de table nom -> position, fausse si des node_id sont dupliqués)."""
+    counts = np.fromiter((len(idx) for _, _, (idx, _) in results), dtype=np.int64, count=len(results))
+    offsets = np.zeros(len(results) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    index_dtype = np.int32 if len(node_ids) < 2**31 else np.int64
+    node_index = np.concatenate([idx for _, _, (idx, _) in results] or [np.zeros(0, dtype=np.intp)])
+    distances = np.concatenate([d for _, _, (_, d) in results] or [np.zeros(0)])
+    node_index, distances = node_index.astype(index_dtype), distances.astype(np.float32)
+    return ResponseArrays(np.array([q for q, _, _ in results], dtype=str),
+                          np.array([D for _, D, _ in results], dtype=float),
+                          offsets, node_index, distances, np.array([n.encode('utf-8') for n in node_ids], dtype=bytes))
+
+def write_response_npz(results: List[Tuple[str, float, Tuple[np.ndarray, np.ndarray]]], node_ids: List[str],
+                       output_path: str) -> None:
+    # Non compressé et sans objets Python : chaque tableau se relit directement (pas de pickle, pas de parsing)
+    with open(output_path, 'wb') as f:
+        np.savez(f, **results_to_arrays(results, node_ids)._asdict())
+
+def load_response_npz(path: str) -> ResponseArrays:
+    """Relit un fichier écrit par --format npz."""
+    with np.load(path, allow_pickle=False) as data:
+        return ResponseArrays(**{name: data[name] for name in ResponseArrays._fields})
+
+# --- Checkpoint / reprise (--checkpoint-every, --resume) ---------------------------------------
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def checkpoint_manifest_path(output_path: str) -> str:
+    return output_path + '.ckpt.json'
+
+def slice_queries(queries: QueryBatch, start: int, stop: int) -> QueryBatch:
+    return QueryBatch(queries.q_ids[start:stop], queries.D[start:stop], queries.A[start:stop], queries.Y[start:stop])
+
+def _write_manifest(path: str, manifest: Dict[str, Any]) -> None:
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)  # atomique : le manifeste n'est jamais à moitié écrit
+
+def run_checkpointed(node_ids: List[str], points_mat: np.ndarray, queries: QueryBatch, output_path: str,
+                     block_size: int, input_files: Dict[str, str], resume: bool = False,
+                     profiler: Optional[SearchProfiler] = None, threads: int = 1) -> int:
+    """Traite les requêtes par blocs et ajoute chaque bloc terminé à `output_path`.
+
+    Après chaque bloc, la sortie est fsync-ée puis le manifeste est mis à jour (requêtes terminées,
+    taille de sortie valide, hash des entrées). Avec `resume=True`, la sortie est tronquée à la
+    dernière taille valide et seuls les blocs restants sont calculés. Retourne le nombre de requêtes
+    déjà faites au démarrage.
+    """
+    manifest_path = checkpoint_manifest_path(output_path)
+    manifest = {
+        'inputs': {label: {'path': path, 'sha256': file_sha256(path)} for label, path in input_files.items()},
+        'num_queries': len(queries.q_ids),
+        'block_size': block_size,
+        'completed_queries': 0,
+        'output_bytes': 0,
+        'complete': False,
+    }
+
+    done = 0
+    if resume and os.path.exists(manifest_path) and os.path.exists(output_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            previous = json.load(f)
+        for label, entry in manifest['inputs'].items():
+            if previous['inputs'].get(label, {}).get('sha256') != entry['sha256']:
+                raise ValueError(f"Checkpoint incompatible (fichier '{label}' modifié) : relancez sans --resume")
+        if previous.get('num_queries') != manifest['num_queries']:
+            raise ValueError("Checkpoint incompatible (num_queries a changé) : relancez sans --resume")
+        done = previous['completed_queries']
+        manifest.update(completed_queries=done, output_bytes=previous['output_bytes'])
+        with open(output_path, 'r+b') as f:
+            f.truncate(previous['output_bytes'])  # écarte un éventuel bloc partiellement écrit
+    elif resume:
+        print("Aucun checkpoint trouvé : démarrage depuis le début.")
+
+    phase = profiler.phase if profiler else (lambda name: nullcontext())
+    with open(output_path, 'a' if done else 'w', newline='', encoding='utf-8') as f:
+        if not done:
+            _write_response_rows(f, [], header=True)
+        for start in range(done, len(queries.q_ids), block_size):
+            stop = min(start + block_size, len(queries.q_ids))
+            block_results = radius_search(node_ids, points_mat, slice_queries(queries, start, stop), profiler, threads)
+            with phase('write_csv'):
+                _write_response_rows(f, block_results)
+                f.flush()
+                os.fsync(f.fileno())
+            manifest.update(completed_queries=stop, output_bytes=os.fstat(f.fileno()).st_size)
+            _write_manifest(manifest_path, manifest)
+        if not len(queries.q_ids):
+            f.flush()
+            manifest['output_bytes'] = os.fstat(f.fileno()).st_size
+
+    manifest['complete'] = True
+    _write_manifest(manifest_path, manifest)
+    return done
 
 def main(argv: List[str]) -> None:
-    if len(argv) < 3 or len(argv) > 4:
-        print("Usage : python brute_force_search.py <points.csv> <queries.csv> [output.csv]")
-        sys.exit(1)
+    ap = argparse.ArgumentParser(description="Recherche brute-force pondérée (rayon D) sur des noeuds 50-dim.")
+    ap.add_argument("points_csv", help="Fichier des noeuds (node_id, feature_1..feature_50)")
+    ap.add_argument("queries_csv", help="Fichier des requêtes (point_A, Y_vector, D, A_vector)")
+    ap.add_argument("output_csv", nargs="?", default=None,
+                    help="Fichier de sortie (défaut: responses.csv, ou responses.npz avec --format npz)")
+    ap.add_argument("--profile", action="store_true",
+                    help="Mesure temps/CPU/pic RSS par phase et écrit <sortie>.profile.json")
+    ap.add_argument("--profile-memory", action="store_true",
+                    help="Avec le profil, pic tracemalloc par phase (ralentit l'exécution ; implique --profile)")
+    ap.add_argument("--checkpoint-every", type=int, default=0, metavar="K",
+                    help="Écrit la sortie par blocs de K requêtes avec un manifeste de reprise (0 = désactivé)")
+    ap.add_argument("--resume", action="store_true",
+                    help="Reprend un calcul interrompu à partir de <sortie>.ckpt.json")
+    ap.add_argument("--threads", type=int, default=1, metavar="N",
+                    help="Nombre de threads de calcul (numpy relâche le GIL ; 1 = série)")
+    ap.add_argument("--format", choices=["csv", "npz"], default="csv",
+                    help="Format de sortie : csv (défaut, lu par l'évaluateur) ou npz (tableaux binaires)")
+    args = ap.parse_args(argv[1:])
+    if args.resume and args.checkpoint_every <= 0:
+        ap.error("--resume requiert --checkpoint-every K")
+    if args.format == "npz" and args.checkpoint_every > 0:
+        ap.error("--checkpoint-every n'est disponible qu'avec --format csv")
+    if args.output_csv is None:
+        args.output_csv = "responses.npz" if args.format == "npz" else "responses.csv"
 
-    points_file = argv[1]
-    queries_file = argv[2]
-    output_file = argv[3] if len(argv) == 4 else 'responses.csv'
+    points_file = args.points_csv
+    queries_file = args.queries_csv
+    output_file = args.output_csv
+    profiler = SearchProfiler(args.profile_memory) if args.profile or args.profile_memory else None
+    phase = profiler.phase if profiler else (lambda name: nullcontext())
 
-    # Read inputs
-    points_df = pd.read_csv(points_file)
-    queries_df = pd.read_csv(queries_file)
+    # Read inputs (numpy + csv uniquement : pas d'import de pandas au démarrage)
+    with phase('load_csv'):
+        node_ids, points_mat = load_points_csv(points_file)
+        query_cols = read_queries_csv(queries_file)
 
-    # Sanity checks
-    if 'node_id' not in points_df.columns:
-        raise KeyError("Points file must contain 'node_id' column")
-    for col in ('point_A', 'Y_vector', 'D'):
-        if col not in queries_df.columns:
-            raise KeyError(f"Queries file must contain '{col}' column")
-    # A_vector is optional but recommended
+    with phase('query_parse'):
+        queries = build_query_batch(query_cols['point_A'], query_cols['D'], query_cols['Y_vector'],
+                                    query_cols.get('A_vector'))
 
-    # Compute brute-force results
-    results = brute_force_search(points_df, queries_df)
+    if args.checkpoint_every > 0:
+        skipped = run_checkpointed(node_ids, points_mat, queries, output_file, args.checkpoint_every,
+                                   {'points': points_file, 'queries': queries_file}, args.resume, profiler,
+                                   args.threads)
+        if skipped:
+            print(f"↪️  Reprise : {skipped} requêtes déjà traitées ignorées")
+    else:
+        # Compute brute-force results (indices directement pour npz : pas de retour par les noms)
+        results = radius_search(node_ids, points_mat, queries, profiler, args.threads,
+                                index_only=args.format == "npz")
 
-    # Write output
-    write_response_csv(results, output_file)
+        # Write output
+        if args.format == "npz":
+            with phase('write_npz'):
+                write_response_npz(results, node_ids, output_file)
+        else:
+            with phase('write_csv'):
+                write_response_csv(results, output_file)
+    if profiler:
+        sidecar = profiler.write(output_file, points_file=points_file, queries_file=queries_file,
+                                 output_file=output_file, num_points=len(node_ids), num_queries=len(queries.q_ids))
+        print(f"📊 Profil écrit : {sidecar}")
     print(f"✅ Fichier de réponse généré : {output_file}")
 
 if __name__ == '__main__':
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Recherche pondérée distribuée (scatter-gather) sur des partitions du fichier de noeuds.
+
+Usage
+-----
+python distributed_search.py worker <points.csv> --partition i/n [--scheme hash|range] [--host H] [--port P]
+python distributed_search.py coordinator <queries.csv> [output.csv] --workers host:port [host:port ...] [--block-size B]
+python distributed_search.py local <points.csv> <queries.csv> [output.csv] [--n-workers 3] [--scheme hash|range]
+
+- worker      : charge UNE partition du fichier de points (hash du node_id ou plage de lignes) et répond aux
+                requêtes sur un port TCP (port 0 = port libre, affiché sur stdout sous la forme 'PORT <n>').
+- coordinator : diffuse les blocs de requêtes à tous les workers, fusionne les listes de matches triées
+                de chaque partition (fusion k-voies) et écrit responses.csv.
+- local       : lance n workers sur localhost, exécute le coordinateur puis arrête les workers (tests).
+
+La sortie est identique à celle de brute_force_search.py : chaque worker calcule exactement les mêmes
+distances que le calcul mono-processus, et la fusion par (distance, node_id) reproduit le tri global.
+
+Protocole : trame = en-tête '!IQ' (taille JSON, taille du corps) + en-tête JSON + corps binaire (float64 /
+int32 little-endian). Aucun pickle ne circule sur le réseau. La table des node_id n'est jamais transférée
+en entier : chaque réponse de recherche porte la table des seuls noeuds qu'elle cite (longueurs int32 +
+octets UTF-8), et le coordinateur ne garde rien d'un bloc à l'autre.
+"""
+from __future__ import annotations
+import argparse
+import csv
+import heapq
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from brute_force_search import (FEATURE_COLS, NUM_FEATURES, QueryBatch, _write_response_rows,
+                                build_query_batch, radius_search, read_queries_csv, slice_queries)
+
+_FRAME = struct.Struct('!IQ')
+DEFAULT_BLOCK_SIZE = 1024
+
+
+# --- Trames réseau ---
+
+def send_message(sock: socket.socket, header: Dict[str, Any], body: bytes = b'') -> None:
+    h = json.dumps(header).encode('utf-8')
+    sock.sendall(_FRAME.pack(len(h), len(body)) + h + body)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:], n - got)
+        if k == 0:
+            raise ConnectionError("Connexion fermée par le pair")
+        got += k
+    return bytes(buf)
+
+
+def recv_message(sock: socket.socket) -> Tuple[Dict[str, Any], bytes]:
+    h_len, b_len = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    header = json.loads(_recv_exact(sock, h_len).decode('utf-8'))
+    return header, _recv_exact(sock, b_len)
+
+
+# --- Partitionnement ---
+
+def partition_of(node_id: str, row_idx: int, n_rows: int, n_parts: int, scheme: str) -> int:
+    if scheme == 'hash':
+        return zlib.crc32(node_id.encode('utf-8')) % n_parts  # stable d'un processus à l'autre
+    return row_idx * n_parts // max(n_rows, 1)
+
+
+def load_points_partition(points_file: str, part: int, n_parts: int,
+                          scheme: str = 'hash') -> Tuple[List[str], np.ndarray]:
+    """Charge uniquement les lignes de la partition `part` (sur `n_parts`) en streaming."""
+    with open(points_file, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if 'node_id' not in header:
+            raise KeyError("Points file must contain 'node_id' column")
+        for col in FEATURE_COLS:
+            if col not in header:
+                raise KeyError(f"Missing column '{col}' in points file")
+        id_col = header.index('node_id')
+        feat_cols = [header.index(c) for c in FEATURE_COLS]
+
+        n_rows = 0
+        if scheme == 'range':
+            n_rows = sum(1 for row in reader if row)
+            f.seek(0)
+            next(reader)
+
+        node_ids: List[str] = []
+        feats: List[List[str]] = []
+        row_idx = 0
+        for row in reader:
+            if not row:
+                continue
+            if partition_of(row[id_col], row_idx, n_rows, n_parts, scheme) == part:
+                node_ids.append(row[id_col])
+                feats.append([row[j] for j in feat_cols])
+            row_idx += 1
+
+    points_mat = np.array(feats, dtype=float).reshape(-1, NUM_FEATURES)
+    return node_ids, points_mat
+
+
+def _encode_id_table(ids: Sequence[str]) -> bytes:
+    raw = [i.encode('utf-8') for i in ids]
+    return np.array([len(b) for b in raw], dtype='<i4').tobytes() + b''.join(raw)
+
+
+def _decode_id_table(k: int, body: bytes, offset: int) -> List[str]:
+    lengths = np.frombuffer(body, dtype='<i4', count=k, offset=offset).tolist()
+    pos = offset + 4 * k
+    ids = []
+    for n in lengths:
+        ids.append(body[pos:pos + n].decode('utf-8'))
+        pos += n
+    return ids
+
+
+# --- Worker ---
+
+def _encode_queries(queries: QueryBatch) -> bytes:
+    return b''.join(np.ascontiguousarray(a, dtype='<f8').tobytes() for a in (queries.D, queries.A, queries.Y))
+
+
+def _decode_queries(n: int, body: bytes) -> QueryBatch:
+    flat = np.frombuffer(body, dtype='<f8')
+    D = flat[:n]
+    A = flat[n:n + n * NUM_FEATURES].reshape(n, NUM_FEATURES)
+    Y = flat[n + n * NUM_FEATURES:].reshape(n, NUM_FEATURES)
+    return QueryBatch([str(i) for i in range(n)], D.astype(float), A.astype(float), Y.astype(float))
+
+
+def serve_worker(points_file: str, part: int, n_parts: int, scheme: str, host: str, port: int) -> None:
+    node_ids, points_mat = load_points_partition(points_file, part, n_parts, scheme)
+
+    with socket.create_server((host, port)) as server:
+        print(f"PORT {server.getsockname()[1]}", flush=True)
+        print(f"Worker {part}/{n_parts} ({scheme}) : {len(node_ids)} noeuds", file=sys.stderr, flush=True)
+        running = True
+        while running:
+            conn, _ = server.accept()
+            with conn:
+                while True:
+                    try:
+                        header, body = recv_message(conn)
+                    except ConnectionError:
+                        break
+                    op = header.get('op')
+                    if op == 'info':
+                        send_message(conn, {'part': part, 'n_parts': n_parts, 'n_nodes': len(node_ids)})
+                    elif op == 'search':
+                        results = radius_search(node_ids, points_mat, _decode_queries(header['n'], body))
+                        # table des noeuds cités par ce bloc seulement ; idx y renvoie
+                        block_index: Dict[str, int] = {}
+                        idx = np.array([block_index.setdefault(n, len(block_index))
+                                        for _, _, m in results for n, _ in m], dtype='<i4')
+                        counts = np.array([len(m) for _, _, m in results], dtype='<i8')
+                        dists = np.array([d for _, _, m in results for _, d in m], dtype='<f8')
+                        send_message(conn, {'n': len(results), 'k': len(block_index)},
+                                     counts.tobytes() + idx.tobytes() + dists.tobytes()
+                                     + _encode_id_table(list(block_index)))
+                    elif op == 'shutdown':
+                        send_message(conn, {'ok': True})
+                        running = False
+                        break
+                    else:
+                        send_message(conn, {'error': f"op inconnue: {op}"})
+
+
+# --- Coordinateur ---
+
+def _parse_address(addr: str) -> Tuple[str, int]:
+    host, _, port = addr.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+class WorkerClient:
+    """Connexion persistante vers un worker."""
+
+    def __init__(self, address: str) -> None:
+        self.sock = socket.create_connection(_parse_address(address))
+        send_message(self.sock, {'op': 'info'})
+        info, _ = recv_message(self.sock)
+        self.n_nodes: int = info['n_nodes']
+
+    def send_search(self, queries: QueryBatch) -> None:
+        send_message(self.sock, {'op': 'search', 'n': len(queries.q_ids)}, _encode_queries(queries))
+
+    def recv_search(self) -> List[List[Tuple[str, float]]]:
+        header, body = recv_message(self.sock)
+        n = header['n']
+        counts = np.frombuffer(body, dtype='<i8', count=n)
+        total = int(counts.sum())
+        idx = np.frombuffer(body, dtype='<i4', count=total, offset=8 * n)
+        dists = np.frombuffer(body, dtype='<f8', count=total, offset=8 * n + 4 * total)
+        block_ids = _decode_id_table(header['k'], body, 8 * n + 12 * total)
+        out, pos = [], 0
+        for c in counts.tolist():
+            out.append([(block_ids[i], d) for i, d in zip(idx[pos:pos + c].tolist(), dists[pos:pos + c].tolist())])
+            pos += c
+        return out
+
+    def shutdown(self) -> None:
+        send_message(self.sock, {'op': 'shutdown'})
+        recv_message(self.sock)
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+def scatter_gather_search(clients: Sequence[WorkerClient], queries: QueryBatch, output_file: str,
+                          block_size: int = DEFAULT_BLOCK_SIZE) -> None:
+    """Diffuse chaque bloc à tous les workers puis fusionne (k-voies) leurs listes triées."""
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        _write_response_rows(f, [], header=True)
+        for start in range(0, len(queries.q_ids), block_size):
+            block = slice_queries(queries, start, start + block_size)
+            for client in clients:  # scatter : les workers calculent en parallèle
+                client.send_search(block)
+            per_worker = [client.recv_search() for client in clients]  # gather
+
+            block_results = []
+            for j, q_id in enumerate(block.q_ids):
+                merged = list(heapq.merge(*(res[j] for res in per_worker), key=lambda m: (m[1], m[0])))
+                block_results.append((q_id, float(block.D[j]), merged))
+            _write_response_rows(f, block_results)
+
+
+def run_coordinator(queries_file: str, output_file: str, addresses: Sequence[str],
+                    block_size: int = DEFAULT_BLOCK_SIZE, shutdown_workers: bool = False) -> None:
+    cols = read_queries_csv(queries_file)
+    queries = build_query_batch(cols['point_A'], cols['D'], cols['Y_vector'], cols.get('A_vector'))
+    clients = [WorkerClient(addr) for addr in addresses]
+    try:
+        scatter_gather_search(clients, queries, output_file, block_size)
+        if shutdown_workers:
+            for client in clients:
+                client.shutdown()
+    finally:
+        for client in clients:
+            client.close()
+
+
+def run_local(points_file: str, queries_file: str, output_file: str, n_workers: int, scheme: str,
+              block_size: int = DEFAULT_BLOCK_SIZE) -> None:
+    """Lance n workers locaux (ports libres), exécute le coordinateur puis arrête les workers."""
+    procs: List[subprocess.Popen] = []
+    try:
+        for part in range(n_workers):
+            procs.append(subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), 'worker', points_file,
+                 '--partition', f'{part}/{n_workers}', '--scheme', scheme, '--port', '0'],
+                stdout=subprocess.PIPE, text=True))
+        addresses = []
+        for proc in procs:
+            line = proc.stdout.readline()
+            if not line.startswith('PORT '):
+                raise RuntimeError("Le worker n'a pas démarré correctement")
+            addresses.append(f"127.0.0.1:{int(line.split()[1])}")
+        run_coordinator(queries_file, output_file, addresses, block_size, shutdown_workers=True)
+    finally:
+        for proc in procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def _parse_partition(value: str) -> Tuple[int, int]:
+    part, _, n_parts = value.partition('/')
+    part, n_parts = int(part), int(n_parts)
+    if not 0 <= part < n_parts:
+        raise argparse.ArgumentTypeError("partition attendue sous la forme i/n avec 0 <= i < n")
+    return part, n_parts
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Recherche pondérée scatter-gather sur partitions de noeuds.")
+    sub = ap.add_subparsers(dest="mode", required=True)
+
+    w = sub.add_parser("worker", help="Sert une partition du fichier de points")
+    w.add_argument("points_csv")
+    w.add_argument("--partition", type=_parse_partition, required=True, help="i/n")
+    w.add_argument("--scheme", choices=["hash", "range"], default="hash")
+    w.add_argument("--host", default="127.0.0.1")
+    w.add_argument("--port", type=int, default=0)
+
+    c = sub.add_parser("coordinator", help="Diffuse les requêtes et fusionne les réponses")
+    c.add_argument("queries_csv")
+    c.add_argument("output_csv", nargs="?", default="responses.csv")
+    c.add_argument("--workers", nargs="+", required=True, help="Adresses host:port des workers")
+    c.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE)
+    c.add_argument("--shutdown-workers", action="store_true", help="Arrête les workers à la fin")
+
+    loc = sub.add_parser("local", help="Workers + coordinateur sur localhost (tests)")
+    loc.add_argument("points_csv")
+    loc.add_argument("queries_csv")
+    loc.add_argument("output_csv", nargs="?", default="responses.csv")
+    loc.add_argument("--n-workers", type=int, default=3)
+    loc.add_argument("--scheme", choices=["hash", "range"], default="hash")
+    loc.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE)
+
+    args = ap.parse_args(argv)
+    if args.mode == "worker":
+        part, n_parts = args.partition
+        serve_worker(args.points_csv, part, n_parts, args.scheme, args.host, args.port)
+        return
+    if args.mode == "coordinator":
+        run_coordinator(args.queries_csv, args.output_csv, args.workers, args.block_size, args.shutdown_workers)
+    else:
+        run_local(args.points_csv, args.queries_csv, args.output_csv, args.n_workers, args.scheme, args.block_size)
+    print(f"✅ Fichier de réponse généré : {args.output_csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,35 +5,211 @@
 
 Usage
 -----
+python evaluate_bruteforce.py <script_path> [--scaling [--scaling-nodes ...] [--scaling-queries ...]]
 python evaluate_bruteforce.py <script_path> <points.csv> <queries.csv> <candidate_output.csv> <reference.csv> [--report report.csv]
+                            [--repeat N] [--warmup K] [--in-process [--entry brute_force_search]]
+                            [--exact] [--candidates autre.py ... [--cpu-budget C] [--pin [--cores-per-candidate K]]]
+                            [--history [PATH]] [--compare-baseline]
+                            [--timeout S] [--cpu-limit S] [--memory-limit MO]
 
 - <script_path>         : chemin du script à évaluer (ex: brute_force_search.py)
 - <points.csv>          : fichier des nœuds (node_id, feature_1..feature_50)
 - <queries.csv>         : fichier des requêtes (avec A_vector/Y_vector/D)
 - <candidate_output.csv>: chemin où le script évalué écrira sa sortie
 - <reference.csv>       : fichier de référence (vérité terrain) au même format que la sortie
-- --report              : (optionnel) CSV détaillé par requête (comparaison des volumes)
+- --report              : (optionnel) CSV détaillé par requête (comparaison des volumes) ; le résumé (correctness
+                          + statistiques de temps/CPU/mémoire) est écrit à côté dans <report>.summary.csv
+- --repeat N --warmup K : (optionnel) K exécutions d'échauffement non mesurées puis N exécutions mesurées ; le résumé
+                          donne le temps mur min/médian/p95, le CPU user+sys (médiane) et le pic RSS du candidat
+- --candidates          : (optionnel) classement : script_path et ces scripts sont évalués chacun dans son processus
+                          (sortie <candidate_output>.<i>.csv) ; la référence est chargée et indexée une seule fois.
+                          --cpu-budget C limite les cœurs utilisés ; avec --pin, les candidats tournent en parallèle,
+                          épinglés sur des groupes disjoints de --cores-per-candidate cœurs (sinon l'un après
+                          l'autre, chacun épinglé sur les C premiers cœurs). Avec --exact, le classement se fait sur le Jaccard des ensembles de nœuds.
+                          --report enregistre alors le classement.
+- --history [PATH]      : (optionnel) base SQLite (défaut: evaluation_history.sqlite à côté de ce script) où chaque
+                          évaluation est ajoutée : temps, CPU, mémoire, correctness, clé = hash du script + hash des
+                          entrées + empreinte machine. Sans --history ni --compare-baseline, rien n'est enregistré.
+- --compare-baseline    : (implique --history) compare les temps mesurés aux 20 dernières évaluations du même script
+                          (mêmes entrées, même machine, même mode) : test de Mann-Whitney unilatéral + seuil
+                          --slowdown-threshold. Requiert --repeat >= 3. Un ralentissement significatif est signalé et
+                          le code de sortie vaut 3.
+- --timeout S, --cpu-limit S, --memory-limit MO : (optionnel) limites de chaque exécution du candidat : temps mur
+                          (groupe de processus tué), RLIMIT_CPU et RLIMIT_AS (posés par prlimit). Elles sont
+                          rappelées dans le résumé ; un candidat interrompu est scoré sur les lignes complètes déjà
+                          écrites (requêtes manquantes = listes vides).
+- --scaling             : (optionnel) génère points/requêtes pour une série géométrique de tailles (--scaling-nodes,
+                          --scaling-queries ; sélectivité 1%), produit les références avec le moteur de confiance
+                          (--reference-script, en cache dans --cache-dir sous le hash des entrées), lance le candidat
+                          à chaque taille puis affiche les tableaux temps-vs-N (Q fixé) et temps-vs-Q (N fixé) avec
+                          l'exposant empirique ajusté (pente log-log). Les fichiers positionnels sont alors inutiles.
+- --in-process          : (optionnel) importe le candidat et appelle <--entry>(points_df, queries_df) sur des DataFrames
+                          lus par l'évaluateur, puis son write_response_csv : lecture, calcul et écriture sont chronométrés
+                          séparément, sans le démarrage de l'interpréteur ni les imports. Le mode sous-processus reste
+                          celui des scripts boîte noire.
+- --recall-targets      : (optionnel) liste de rappels visés ; le candidat est lancé une fois par valeur avec
+                          '--recall-target <t>' (ex: approx_search.py) et l'évaluateur affiche la courbe
+                          vitesse/rappel. --curve enregistre cette courbe en CSV.
 
 La métrique 'correctness' est la moyenne, sur les requêtes, de:
     correctness_q = min(num_matches_candidat, num_matches_reference) / max(1, num_matches_reference)
 
 NB: on borne à 100% si le candidat retourne plus de nœuds que la référence.
+Cette métrique ne regarde que les volumes : avec --exact, la colonne 'nodes' est comparée en ensembles et le
+résumé ajoute précision, rappel et Jaccard moyens (la référence est lue par blocs, scoring vectorisé).
 Le temps de calcul mesure le temps d'exécution du script évalué (mur), hors parsing/évaluation.
+Le CPU (user+sys) est celui du processus candidat seul (rusage du fils, Unix uniquement). Son pic RSS est lu
+dans /proc/<pid>/status (VmHWM, Linux) : ru_maxrss du fils compte aussi les pages héritées de l'évaluateur.
 """
 import argparse
+import csv
+import hashlib
+import importlib.util
+import json
+import math
 import os
+import platform
+import queue
+import shutil
+import signal
+import sqlite3
 import sys
 import subprocess
+import tempfile
+import threading
 import time
-from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
 
+import numpy as np
 import pandas as pd
 
+try:
+    import resource  # Unix uniquement (pic RSS en mode --in-process)
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
 REQUIRED_OUT_COLS = ["query_id", "D", "num_matches", "nodes", "nodes_with_distance"]
 
-def run_candidate(script_path: str, points_csv: str, queries_csv: str, candidate_out: str) -> Tuple[float, str, str]:
-    """Lance le script candidat et mesure le temps d'exécution mur (en secondes).
-    Retourne (elapsed_s, stdout, stderr).
+class CandidateRun(NamedTuple):
+    elapsed_s: float
+    cpu_user_s: Optional[float]   # None si wait4 indisponible (Windows)
+    cpu_sys_s: Optional[float]
+    max_rss_kb: Optional[int]
+    returncode: int
+    stdout: str
+    stderr: str
+    phases: Optional[Dict[str, float]] = None  # --in-process : load / compute / write (s)
+    killed: str = ""                           # limite atteinte : "wall", "cpu", "memory" (sinon "")
+
+class Limits(NamedTuple):
+    """Limites appliquées au processus candidat (None = pas de limite)."""
+    wall_s: Optional[float] = None      # temps mur : le groupe de processus est tué (SIGKILL)
+    cpu_s: Optional[int] = None         # RLIMIT_CPU : SIGXCPU puis SIGKILL
+    memory_mb: Optional[int] = None     # RLIMIT_AS : MemoryError / échec d'allocation dans le candidat
+
+    def describe(self) -> str:
+        parts = [f"mur {self.wall_s:g} s" if self.wall_s else "",
+                 f"CPU {self.cpu_s} s" if self.cpu_s else "",
+                 f"mémoire (espace d'adressage) {self.memory_mb} Mo" if self.memory_mb else ""]
+        return ", ".join(p for p in parts if p) or "aucune"
+
+def _rlimits(limits: Optional[Limits]) -> List[Tuple[str, int, Tuple[int, int]]]:
+    """(option prlimit, ressource, (souple, dure)) pour chaque limite active gérée par setrlimit."""
+    out = []
+    if limits and limits.cpu_s:
+        out.append(("--cpu", resource.RLIMIT_CPU, (limits.cpu_s, limits.cpu_s + 1)))
+    if limits and limits.memory_mb:
+        size = limits.memory_mb * 1024 * 1024
+        out.append(("--as", resource.RLIMIT_AS, (size, size)))
+    return out
+
+def _launcher_prefix(cpus: Optional[Sequence[int]], limits: Optional[Limits]) -> List[str]:
+    """Préfixe taskset/prlimit de la commande du candidat. Pas de preexec_fn : il n'est pas sûr quand
+    Popen est appelé depuis plusieurs threads (classement --pin). Les deux outils font exec de la
+    commande : même pid, donc wait4 mesure toujours le seul candidat, et les limites sont en place
+    avant le démarrage de l'interpréteur. Un outil absent est remplacé par _apply_after_spawn."""
+    prefix: List[str] = []
+    rlimits = _rlimits(limits)
+    if rlimits and shutil.which("prlimit"):
+        prefix += ["prlimit", *(f"{opt}={soft}:{hard}" for opt, _, (soft, hard) in rlimits), "--"]
+    if cpus and shutil.which("taskset"):
+        prefix += ["taskset", "-c", ",".join(map(str, cpus))]
+    return prefix
+
+def _apply_after_spawn(pid: int, prefix: Sequence[str], cpus: Optional[Sequence[int]],
+                       limits: Optional[Limits]) -> None:
+    """Repli sans taskset/prlimit : affinité et limites posées sur le fils déjà lancé (sched_setaffinity,
+    resource.prlimit). Le candidat tourne quelques instants sans elles."""
+    try:
+        if cpus and "taskset" not in prefix:
+            os.sched_setaffinity(pid, cpus)
+        if "prlimit" not in prefix:
+            for _, res, values in _rlimits(limits):
+                resource.prlimit(pid, res, values)
+    except ProcessLookupError:
+        pass  # déjà terminé
+
+def _pinned_env(cpus: Sequence[int]) -> Dict[str, str]:
+    """Environnement d'un candidat épinglé : les pools de threads BLAS/OpenMP suivent le nombre de cœurs."""
+    env = dict(os.environ)
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        env[var] = str(len(cpus))
+    return env
+
+RSS_POLL_INTERVAL_S = 0.005
+
+def _read_vmhwm_kb(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None  # processus terminé (zombie sans mémoire) ou /proc absent
+
+def _poll_own_peak_rss(pid: int, argv: Sequence[str], stop: threading.Event, peak: List[int]) -> None:
+    """Relève VmHWM du candidat jusqu'à `stop`. Avant l'exec de `argv`, le fils est encore une copie de
+    l'évaluateur (ou taskset/prlimit) : on n'échantillonne qu'une fois sa ligne de commande devenue `argv`."""
+    expected = "\0".join(argv[:2]).encode()
+    started = False
+    while not stop.is_set():
+        if not started:
+            try:
+                with open(f"/proc/{pid}/cmdline", "rb") as f:
+                    started = f.read().startswith(expected)
+            except OSError:
+                return
+        if started:
+            kb = _read_vmhwm_kb(pid)
+            if kb is not None:
+                peak[0] = max(peak[0], kb)
+        stop.wait(RSS_POLL_INTERVAL_S)
+
+# Signatures d'un échec d'allocation sous RLIMIT_AS (Python, glibc, chargeur de bibliothèques partagées)
+_MEMORY_ERROR_MARKERS = ("MemoryError", "Cannot allocate memory", "failed to map segment",
+                         "std::bad_alloc", "out of memory")
+_MEMORY_SIGNALS = {-signal.SIGKILL, -signal.SIGSEGV, -signal.SIGABRT, -signal.SIGBUS}
+
+def _memory_failure(returncode: int, stderr: str) -> bool:
+    """Échec attribuable à la limite mémoire : tué par un signal typique d'une allocation refusée, ou
+    message d'allocation dans stderr. Tout autre code non nul reste un échec ordinaire du candidat."""
+    if returncode == 0:
+        return False
+    return returncode in _MEMORY_SIGNALS or any(m in stderr for m in _MEMORY_ERROR_MARKERS)
+
+def run_candidate_measured(script_path: str, points_csv: str, queries_csv: str, candidate_out: str,
+                           extra_args: Sequence[str] = (), cpus: Optional[Sequence[int]] = None,
+                           limits: Optional[Limits] = None) -> CandidateRun:
+    """Lance le script candidat et mesure temps mur, CPU user/sys et pic RSS de ce seul processus.
+    ru_maxrss du fils vaut max(pages héritées de l'évaluateur au fork, pic propre) : il n'est retenu que s'il
+    dépasse le pic de l'évaluateur (c'est alors forcément le pic propre). Sinon le pic est le VmHWM relevé
+    toutes les RSS_POLL_INTERVAL_S pendant l'exécution (None si aucun relevé : /proc absent, exécution trop brève).
+    `extra_args` est ajouté à la ligne de commande (ex: ['--recall-target', '0.95']).
+    `cpus` épingle le candidat sur ces cœurs (taskset, Linux).
+    `limits` borne temps mur (minuterie), CPU et espace d'adressage (prlimit, Linux).
     """
     # Supprime un éventuel ancien fichier de sortie pour éviter les confusions
     try:
@@ -42,13 +218,195 @@ def run_candidate(script_path: str, points_csv: str, queries_csv: str, candidate
     except Exception:
         pass
 
-    cmd = [sys.executable, script_path, points_csv, queries_csv, candidate_out]
+    prefix = _launcher_prefix(cpus, limits)
+    argv = [sys.executable, script_path, points_csv, queries_csv, candidate_out, *extra_args]
+    cmd = [*prefix, *argv]
+    inherited_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+
+    # stdout/stderr dans des fichiers temporaires : on attend le fils avec os.wait4 pour récupérer SON rusage
+    # (getrusage(RUSAGE_CHILDREN) cumule tous les fils et ne donne que le max RSS global)
+    with tempfile.TemporaryFile() as f_out, tempfile.TemporaryFile() as f_err:
+        t0 = time.perf_counter()
+        # nouvelle session : en cas de dépassement du temps mur, on tue aussi les éventuels sous-processus
+        proc = subprocess.Popen(cmd, stdout=f_out, stderr=f_err, env=_pinned_env(cpus) if cpus else None,
+                                start_new_session=bool(limits and limits.wall_s))
+        _apply_after_spawn(proc.pid, prefix, cpus, limits)
+        polled = [0]
+        stop_polling = threading.Event()
+        poller = threading.Thread(target=_poll_own_peak_rss, args=(proc.pid, argv, stop_polling, polled), daemon=True)
+        poller.start()
+        timed_out = threading.Event()
+
+        def on_timeout() -> None:
+            timed_out.set()
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+        watchdog = threading.Timer(limits.wall_s, on_timeout) if limits and limits.wall_s else None
+        if watchdog:
+            watchdog.start()
+        try:
+            if hasattr(os, "wait4"):
+                _, status, usage = os.wait4(proc.pid, 0)
+                t1 = time.perf_counter()
+                proc.returncode = os.waitstatus_to_exitcode(status)
+                cpu_user, cpu_sys = usage.ru_utime, usage.ru_stime
+                max_rss = polled[0] or None
+                if inherited_kb is not None and usage.ru_maxrss > inherited_kb:
+                    max_rss = usage.ru_maxrss  # au-delà de tout héritage : c'est le pic propre du candidat
+                if max_rss is not None and sys.platform == "darwin":
+                    max_rss //= 1024  # macOS: octets
+            else:  # pragma: no cover - Windows
+                proc.wait()
+                t1 = time.perf_counter()
+                cpu_user = cpu_sys = max_rss = None
+        finally:
+            stop_polling.set()
+            poller.join()
+            if watchdog:
+                watchdog.cancel()
+        f_out.seek(0)
+        f_err.seek(0)
+        stdout = f_out.read().decode("utf-8", errors="replace")
+        stderr = f_err.read().decode("utf-8", errors="replace")
+
+    killed = ""
+    if timed_out.is_set():
+        killed = "wall"
+    elif limits and limits.cpu_s and proc.returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+        killed = "cpu"
+    elif limits and limits.memory_mb and _memory_failure(proc.returncode, stderr):
+        killed = "memory"
+    return CandidateRun(t1 - t0, cpu_user, cpu_sys, max_rss, proc.returncode, stdout, stderr, None, killed)
+
+def salvage_partial_output(candidate_out: str) -> str:
+    """Copie scorable de la sortie d'un candidat interrompu : seules les lignes complètes sont gardées (la
+    dernière peut être tronquée) ; sortie absente -> en-tête seul (toutes les requêtes comptent comme vides)."""
+    data = b""
+    if os.path.exists(candidate_out):
+        with open(candidate_out, "rb") as f:
+            data = f.read()
+        data = data[:data.rfind(b"\n") + 1]
+    header = (",".join(REQUIRED_OUT_COLS) + "\n").encode()
+    if not data.split(b"\n", 1)[0].startswith(b"query_id"):
+        data = header
+    root, ext = os.path.splitext(candidate_out)
+    partial = f"{root}.partial{ext or '.csv'}"
+    with open(partial, "wb") as f:
+        f.write(data)
+    return partial
+
+def run_candidate(script_path: str, points_csv: str, queries_csv: str, candidate_out: str,
+                  extra_args: Sequence[str] = ()) -> Tuple[float, str, str]:
+    """Lance le script candidat et mesure le temps d'exécution mur (en secondes).
+    Retourne (elapsed_s, stdout, stderr).
+    """
+    run = run_candidate_measured(script_path, points_csv, queries_csv, candidate_out, extra_args)
+    return run.elapsed_s, run.stdout, run.stderr
+
+def run_repeated(script_path: str, points_csv: str, queries_csv: str, candidate_out: str,
+                 repeat: int = 1, warmup: int = 0, extra_args: Sequence[str] = (),
+                 cpus: Optional[Sequence[int]] = None, limits: Optional[Limits] = None) -> List[CandidateRun]:
+    """`warmup` exécutions non mesurées (caches disque, .pyc) puis `repeat` exécutions mesurées.
+    La sortie évaluée est celle de la dernière exécution."""
+    for _ in range(warmup):
+        run_candidate_measured(script_path, points_csv, queries_csv, candidate_out, extra_args, cpus, limits)
+    return [run_candidate_measured(script_path, points_csv, queries_csv, candidate_out, extra_args, cpus, limits)
+            for _ in range(max(1, repeat))]
+
+def scorable_output(run: CandidateRun, candidate_out: str, limits: Optional[Limits] = None) -> str:
+    """Sortie à scorer : celle du candidat, ou sa partie complète s'il a été interrompu par une limite.
+    Avec des limites actives, tout échec (code de sortie non nul ou sortie absente) passe aussi par la
+    récupération partielle : un candidat tué tôt est scoré à vide au lieu d'interrompre l'évaluation."""
+    failed = run.returncode != 0 or not os.path.exists(candidate_out)
+    if run.killed or (limits and any(limits) and failed):
+        return salvage_partial_output(candidate_out)
+    return candidate_out
+
+# --- Mode --in-process : le candidat est importé, pas de démarrage d'interpréteur dans la mesure ---
 
+DEFAULT_ENTRY = "brute_force_search"
+
+def load_candidate_module(script_path: str) -> ModuleType:
+    """Importe le script candidat sous son propre nom (ses imports de modules voisins restent valides)."""
+    script_dir = os.path.dirname(os.path.abspath(script_path))
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+    name = os.path.splitext(os.path.basename(script_path))[0]
+    spec = importlib.util.spec_from_file_location(name, script_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def write_results_csv(results: Sequence[Tuple[str, float, List[Tuple[str, float]]]], output_path: str) -> None:
+    """Écriture au format de sortie standard, pour les candidats sans write_response_csv."""
+    with open(output_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator=os.linesep)
+        writer.writerow(REQUIRED_OUT_COLS)
+        for q_id, D, matches in results:
+            writer.writerow([q_id, D, len(matches), ";".join(n for n, _ in matches),
+                             ";".join(f"{n}:{d:.6f}" for n, d in matches)])
+
+def run_in_process(module: ModuleType, entry: str, points_csv: str, queries_csv: str,
+                   candidate_out: str) -> CandidateRun:
+    """Appelle `module.<entry>(points_df, queries_df)` et chronomètre séparément lecture, calcul et écriture.
+    CPU = os.times() du processus évaluateur ; pic RSS = celui de l'évaluateur (candidat inclus)."""
+    search = getattr(module, entry)
+    write = getattr(module, "write_response_csv", write_results_csv)
+    c0 = os.times()
     t0 = time.perf_counter()
-    proc = subprocess.run(cmd, capture_output=True, text=True)
+    points_df = pd.read_csv(points_csv)
+    queries_df = pd.read_csv(queries_csv)
     t1 = time.perf_counter()
+    results = search(points_df, queries_df)
+    t2 = time.perf_counter()
+    write(results, candidate_out)
+    t3 = time.perf_counter()
+    c1 = os.times()
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+    return CandidateRun(t3 - t0, c1.user - c0.user, c1.system - c0.system, max_rss, 0, "", "",
+                        {"load": t1 - t0, "compute": t2 - t1, "write": t3 - t2})
 
-    return t1 - t0, proc.stdout, proc.stderr
+def run_repeated_in_process(script_path: str, points_csv: str, queries_csv: str, candidate_out: str,
+                            entry: str = DEFAULT_ENTRY, repeat: int = 1, warmup: int = 0) -> List[CandidateRun]:
+    module = load_candidate_module(script_path)
+    if not callable(getattr(module, entry, None)):
+        raise AttributeError(f"{script_path} n'expose pas de fonction '{entry}(points_df, queries_df)'")
+    for _ in range(warmup):
+        run_in_process(module, entry, points_csv, queries_csv, candidate_out)
+    return [run_in_process(module, entry, points_csv, queries_csv, candidate_out) for _ in range(max(1, repeat))]
+
+def timing_summary(runs: Sequence[CandidateRun]) -> Dict[str, Any]:
+    """Temps mur min/médian/p95, CPU user/sys médians et pic RSS (max) sur les exécutions mesurées."""
+    wall = pd.Series([r.elapsed_s for r in runs], dtype=float)
+    summary: Dict[str, Any] = {
+        "runs": len(runs),
+        "killed_runs": sum(1 for r in runs if r.killed),
+        "wall_min_s": float(wall.min()),
+        "wall_median_s": float(wall.median()),
+        "wall_p95_s": float(wall.quantile(0.95)),
+        "cpu_user_s": None,
+        "cpu_sys_s": None,
+        "cpu_total_s": None,
+        "max_rss_kb": None,
+    }
+    if all(r.cpu_user_s is not None for r in runs):
+        user = pd.Series([r.cpu_user_s for r in runs], dtype=float)
+        sys_ = pd.Series([r.cpu_sys_s for r in runs], dtype=float)
+        summary.update(cpu_user_s=float(user.median()), cpu_sys_s=float(sys_.median()),
+                       cpu_total_s=float((user + sys_).median()))
+    if any(r.max_rss_kb is not None for r in runs):
+        summary["max_rss_kb"] = max(r.max_rss_kb for r in runs if r.max_rss_kb is not None)
+    if all(r.phases for r in runs):
+        for name in runs[0].phases:
+            summary[f"{name}_median_s"] = float(pd.Series([r.phases[name] for r in runs]).median())
+    return summary
+
+def summary_path(report_path: str) -> str:
+    return os.path.splitext(report_path)[0] + ".summary.csv"
 
 def load_output_csv(path: str) -> pd.DataFrame:
     if not os.path.exists(path):
@@ -74,19 +432,14 @@ def evaluate(candidate_df: pd.DataFrame, reference_df: pd.DataFrame) -> Tuple[pd
 
     # Jointure sur les requêtes de référence
     details = ref.merge(pred, on="query_id", how="left", suffixes=("_ref", "_pred"))
-    details["num_matches_pred"].fillna(0, inplace=True)
-    details["num_matches_pred"] = details["num_matches_pred"].astype(int)
+    details["num_matches_pred"] = details["num_matches_pred"].fillna(0).astype(int)
 
-    # correctness par requête (bornée à 1.0)
+    # correctness par requête (bornée à 1.0), vectorisée
     # Evite division par zéro si la référence contient 0 (on définit alors correctness=1 si pred=0, sinon 0)
-    def corr_row(row):
-        n_ref = int(row["num_matches_ref"])
-        n_pred = int(row["num_matches_pred"])
-        if n_ref <= 0:
-            return 1.0 if n_pred == 0 else 0.0
-        return min(n_pred / n_ref, 1.0)
-
-    details["correctness"] = details.apply(corr_row, axis=1)
+    n_ref = details["num_matches_ref"].to_numpy()
+    n_pred = details["num_matches_pred"].to_numpy()
+    details["correctness"] = np.where(n_ref <= 0, (n_pred == 0).astype(float),
+                                      np.minimum(n_pred / np.maximum(n_ref, 1), 1.0))
 
     mean_correctness = float(details["correctness"].mean()) if len(details) else 0.0
 
@@ -98,43 +451,673 @@ def evaluate(candidate_df: pd.DataFrame, reference_df: pd.DataFrame) -> Tuple[pd
 
     return details, mean_correctness
 
+# --- Mode --exact : comparaison des ensembles de nœuds (colonne 'nodes') ---
+
+EXACT_CHUNK_ROWS = 100_000
+
+def _node_pairs(nodes: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """(pos, node) pour chaque nœud de chaque liste 'n1;n2;...' (pos = position de la requête dans le bloc).
+    Un seul join + split sur tout le bloc : bien plus rapide qu'un str.split ligne par ligne."""
+    values = nodes.to_numpy(dtype=object)
+    if not len(values):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=object)
+    counts = np.fromiter((v.count(";") + 1 for v in values), dtype=np.int64, count=len(values))
+    tokens = np.array(";".join(values).split(";"), dtype=object)
+    pos = np.repeat(np.arange(len(values), dtype=np.int64), counts)
+    keep = tokens != ""
+    return pos[keep], tokens[keep]
+
+def _read_nodes_csv(path: str, chunksize: Optional[int] = None):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Fichier non trouvé: {path}")
+    return pd.read_csv(path, usecols=["query_id", "nodes"], dtype=str, keep_default_na=False, chunksize=chunksize)
+
+class ReferenceIndex(NamedTuple):
+    """Référence lue et indexée une seule fois (réutilisée pour tous les candidats)."""
+    query_pos: pd.Index      # query_id -> position de la requête
+    nodes: pd.Index          # code -> node_id (nœuds présents dans la référence)
+    keys: np.ndarray         # clés (position * len(nodes) + code) triées, une par paire (requête, nœud)
+    num_ref: np.ndarray      # (Q,) taille de chaque ensemble de référence
+
+def index_reference(reference_csv: str, chunksize: int = EXACT_CHUNK_ROWS) -> ReferenceIndex:
+    """Lit la référence par blocs : seuls les node_id distincts et des entiers par paire restent en mémoire."""
+    query_ids, pos_parts, code_parts = [], [], []
+    nodes = pd.Index([], dtype=object)
+    offset = 0
+    for chunk in _read_nodes_csv(reference_csv, chunksize):
+        pos, tokens = _node_pairs(chunk["nodes"])
+        codes = nodes.get_indexer(tokens)
+        unknown = codes < 0
+        if unknown.any():
+            nodes = nodes.append(pd.Index(pd.unique(tokens[unknown])))
+            codes[unknown] = nodes.get_indexer(tokens[unknown])
+        pos_parts.append(pos + offset)
+        code_parts.append(codes)
+        query_ids.append(chunk["query_id"].to_numpy(dtype=object))
+        offset += len(chunk)
+
+    query_pos = pd.Index(np.concatenate(query_ids) if query_ids else np.zeros(0, dtype=object))
+    if not query_pos.is_unique:
+        raise ValueError(f"query_id dupliqués dans la référence {reference_csv}")
+    n_codes = max(len(nodes), 1)
+    pos = np.concatenate(pos_parts) if pos_parts else np.zeros(0, dtype=np.int64)
+    codes = np.concatenate(code_parts).astype(np.int64) if code_parts else np.zeros(0, dtype=np.int64)
+    keys = np.unique(pos * n_codes + codes)
+    return ReferenceIndex(query_pos, nodes, keys, np.bincount(keys // n_codes, minlength=len(query_pos)))
+
+def evaluate_exact(candidate_csv: str, reference: Any,
+                   chunksize: int = EXACT_CHUNK_ROWS) -> Tuple[pd.DataFrame, Dict[str, float]]:
+    """Précision/rappel/Jaccard par requête sur les ensembles de nœuds.
+    `reference` est un ReferenceIndex (déjà indexé) ou le chemin du CSV de référence. Le candidat (colonnes
+    query_id/nodes) est scoré par blocs de `chunksize` requêtes, de façon vectorisée : ses paires (requête, nœud)
+    sont converties en clés entières et cherchées dans les clés triées de la référence. Une requête absente chez
+    le candidat compte comme une liste vide ; les requêtes inconnues de la référence sont ignorées.
+    Retourne (détails par requête, moyennes + nombre de requêtes à ensemble identique).
+    """
+    ref = reference if isinstance(reference, ReferenceIndex) else index_reference(reference, chunksize)
+    n_q, n_codes = len(ref.query_pos), max(len(ref.nodes), 1)
+
+    pred = _read_nodes_csv(candidate_csv).drop_duplicates("query_id", keep="last")
+    pred_pos = ref.query_pos.get_indexer(pred["query_id"])
+    pred, pred_pos = pred[pred_pos >= 0], pred_pos[pred_pos >= 0]
+
+    n_pred = np.zeros(n_q, dtype=np.int64)
+    n_common = np.zeros(n_q, dtype=np.int64)
+    for start in range(0, len(pred), chunksize):
+        local_pos, tokens = _node_pairs(pred["nodes"].iloc[start:start + chunksize])
+        qpos = pred_pos[start:start + chunksize][local_pos].astype(np.int64)
+        # taille des ensembles prédits (nœuds dédupliqués par requête, y compris hors référence)
+        local_codes, local_nodes = pd.factorize(tokens)
+        stride = max(len(local_nodes), 1)
+        n_pred += np.bincount(np.unique(qpos * stride + local_codes) // stride, minlength=n_q)
+        # intersection : clés présentes dans la référence (recherche dichotomique dans les clés triées)
+        codes = ref.nodes.get_indexer(tokens)
+        known = codes >= 0
+        keys = np.unique(qpos[known] * n_codes + codes[known])
+        idx = np.minimum(np.searchsorted(ref.keys, keys), max(len(ref.keys) - 1, 0))
+        hits = keys[ref.keys[idx] == keys] if len(ref.keys) else keys[:0]
+        n_common += np.bincount(hits // n_codes, minlength=n_q)
+
+    n_ref = ref.num_ref
+    n_union = n_ref + n_pred - n_common
+    # Listes vides : precision=1 si rien n'est prédit, recall=1 si rien n'est attendu, jaccard=1 si les deux
+    details = pd.DataFrame({
+        "query_id": ref.query_pos.to_numpy(),
+        "num_ref": n_ref,
+        "num_pred": n_pred,
+        "num_common": n_common,
+        "precision": np.where(n_pred > 0, n_common / np.maximum(n_pred, 1), 1.0),
+        "recall": np.where(n_ref > 0, n_common / np.maximum(n_ref, 1), 1.0),
+        "jaccard": np.where(n_union > 0, n_common / np.maximum(n_union, 1), 1.0),
+    })
+    summary = {
+        "precision": float(details["precision"].mean()) if len(details) else 0.0,
+        "recall": float(details["recall"].mean()) if len(details) else 0.0,
+        "jaccard": float(details["jaccard"].mean()) if len(details) else 0.0,
+        "exact_sets": int((details["jaccard"] == 1.0).sum()),
+    }
+    return details, summary
+
+def score_output(candidate_out: str, ref_df: pd.DataFrame,
+                 ref_index: Optional[ReferenceIndex] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Métrique par volumes (+ ensembles si `ref_index`) d'une sortie candidat.
+    Retourne (détails par requête, résumé : num_queries, exact_match, correctness, set_*)."""
+    details, mean_corr = evaluate(load_output_csv(candidate_out), ref_df)
+    scores: Dict[str, Any] = {"num_queries": len(ref_df),
+                              "exact_match": int((details["num_ref"] == details["num_pred"]).sum()),
+                              "correctness": mean_corr}
+    if ref_index is not None:
+        exact_details, set_scores = evaluate_exact(candidate_out, ref_index)
+        details = details.merge(exact_details[["query_id", "num_common", "precision", "recall", "jaccard"]],
+                                on="query_id", how="left")
+        scores.update({f"set_{k}": v for k, v in set_scores.items()})
+    return details, scores
+
+def sweep_recall_targets(script_path: str, points_csv: str, queries_csv: str, candidate_out: str,
+                         ref_df: pd.DataFrame, targets: List[float]) -> pd.DataFrame:
+    """Lance le candidat pour chaque rappel visé et retourne la courbe vitesse/rappel.
+    - recall_target, elapsed_s, correctness (métrique de l'évaluateur), exact_match, speedup
+    speedup est relatif à la cible la plus haute (la plus proche de l'exact).
+    """
+    rows = []
+    for target in targets:
+        elapsed, _, err = run_candidate(script_path, points_csv, queries_csv, candidate_out,
+                                        ["--recall-target", str(target)])
+        try:
+            details, mean_corr = evaluate(load_output_csv(candidate_out), ref_df)
+            exact = int((details["num_ref"] == details["num_pred"]).sum())
+        except (FileNotFoundError, KeyError):
+            print(f"⚠️  Pas de sortie exploitable pour --recall-target {target}\n{err.strip()}")
+            mean_corr, exact = 0.0, 0
+        rows.append({"recall_target": target, "elapsed_s": elapsed, "correctness": mean_corr,
+                     "exact_match": exact})
+
+    curve = pd.DataFrame(rows).sort_values("recall_target", ascending=False).reset_index(drop=True)
+    baseline = curve["elapsed_s"].iloc[0] if len(curve) else 0.0
+    curve["speedup"] = baseline / curve["elapsed_s"] if len(curve) else []
+    return curve
+
+# --- Historique SQLite (--history, --compare-baseline) ---
+
+DEFAULT_HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "evaluation_history.sqlite")
+BASELINE_WINDOW = 20
+SLOWDOWN_ALPHA = 0.05
+MIN_BASELINE_SAMPLES = 3  # en dessous, le test unilatéral ne peut pas atteindre p < SLOWDOWN_ALPHA
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    script_path TEXT NOT NULL,
+    script_sha256 TEXT NOT NULL,
+    points_sha256 TEXT NOT NULL,
+    queries_sha256 TEXT NOT NULL,
+    reference_sha256 TEXT NOT NULL,
+    machine_fingerprint TEXT NOT NULL,
+    machine_info TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    runs INTEGER NOT NULL,
+    warmup INTEGER NOT NULL,
+    wall_samples_s TEXT NOT NULL,
+    wall_min_s REAL, wall_median_s REAL, wall_p95_s REAL,
+    cpu_user_s REAL, cpu_sys_s REAL, cpu_total_s REAL, max_rss_kb INTEGER,
+    num_queries INTEGER, exact_match INTEGER, correctness REAL, set_jaccard REAL
+);
+CREATE INDEX IF NOT EXISTS runs_lookup
+    ON runs (script_path, points_sha256, queries_sha256, reference_sha256, machine_fingerprint);
+"""
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+def machine_fingerprint() -> Tuple[str, Dict[str, Any]]:
+    """Empreinte de la machine : les temps ne sont comparés qu'entre exécutions de même empreinte."""
+    info = {"host": platform.node(), "machine": platform.machine(), "cpu": _cpu_model(),
+            "cpus": len(available_cpus()), "python": platform.python_version(), "numpy": np.__version__,
+            "pandas": pd.__version__}
+    return hashlib.sha256(json.dumps(info, sort_keys=True).encode()).hexdigest()[:16], info
+
+def open_history(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.executescript(HISTORY_SCHEMA)
+    return conn
+
+def record_run(conn: sqlite3.Connection, script_path: str, input_hashes: Dict[str, str], mode: str, warmup: int,
+               walls: Sequence[float], timing: Dict[str, Any], scores: Dict[str, Any]) -> int:
+    """Ajoute une évaluation à l'historique ; retourne son id."""
+    fingerprint, info = machine_fingerprint()
+    cur = conn.execute(
+        "INSERT INTO runs (created_at, script_path, script_sha256, points_sha256, queries_sha256, reference_sha256,"
+        " machine_fingerprint, machine_info, mode, runs, warmup, wall_samples_s, wall_min_s, wall_median_s,"
+        " wall_p95_s, cpu_user_s, cpu_sys_s, cpu_total_s, max_rss_kb, num_queries, exact_match, correctness,"
+        " set_jaccard) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (time.strftime("%Y-%m-%dT%H:%M:%S"), os.path.basename(script_path), file_sha256(script_path),
+         input_hashes["points"], input_hashes["queries"], input_hashes["reference"], fingerprint,
+         json.dumps(info, sort_keys=True), mode, timing["runs"], warmup, json.dumps(list(walls)),
+         timing["wall_min_s"], timing["wall_median_s"], timing["wall_p95_s"], timing["cpu_user_s"],
+         timing["cpu_sys_s"], timing["cpu_total_s"], timing["max_rss_kb"], scores.get("num_queries"),
+         scores.get("exact_match"), scores.get("correctness"), scores.get("set_jaccard")))
+    conn.commit()
+    return cur.lastrowid
+
+def baseline_walls(conn: sqlite3.Connection, script_path: str, input_hashes: Dict[str, str], mode: str,
+                   exclude_id: int, window: int = BASELINE_WINDOW) -> Tuple[List[float], int]:
+    """Échantillons de temps mur des `window` dernières évaluations comparables (même script, mêmes entrées,
+    même machine, même mode). Retourne (échantillons, nombre d'évaluations)."""
+    fingerprint, _ = machine_fingerprint()
+    rows = conn.execute(
+        "SELECT wall_samples_s FROM runs WHERE script_path = ? AND points_sha256 = ? AND queries_sha256 = ?"
+        " AND reference_sha256 = ? AND machine_fingerprint = ? AND mode = ? AND id != ? ORDER BY id DESC LIMIT ?",
+        (os.path.basename(script_path), input_hashes["points"], input_hashes["queries"], input_hashes["reference"],
+         fingerprint, mode, exclude_id, window)).fetchall()
+    return [w for (samples,) in rows for w in json.loads(samples)], len(rows)
+
+def mann_whitney_greater(x: Sequence[float], y: Sequence[float]) -> float:
+    """p-valeur unilatérale (approximation normale, correction des ex-aequo) de H1 : x tend à dépasser y."""
+    n1, n2 = len(x), len(y)
+    if not n1 or not n2:
+        return 1.0
+    ranks = pd.Series([*x, *y]).rank().to_numpy()
+    u = ranks[:n1].sum() - n1 * (n1 + 1) / 2
+    _, counts = np.unique(np.concatenate([x, y]), return_counts=True)
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - (counts ** 3 - counts).sum() / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+def compare_to_baseline(walls: Sequence[float], baseline: Sequence[float], threshold: float,
+                        alpha: float = SLOWDOWN_ALPHA) -> Dict[str, Any]:
+    """Ralentissement signalé si la médiane dépasse celle de l'historique de plus de `threshold` ET si le test
+    de Mann-Whitney est significatif au seuil `alpha`. Avec moins de MIN_BASELINE_SAMPLES temps d'un côté ou de
+    l'autre, aucun verdict n'est rendu (`insufficient`) : le test ne pourrait jamais conclure."""
+    current, base = float(np.median(walls)), float(np.median(baseline)) if len(baseline) else float("nan")
+    p_value = mann_whitney_greater(walls, baseline)
+    ratio = current / base if len(baseline) and base > 0 else float("nan")
+    insufficient = min(len(walls), len(baseline)) < MIN_BASELINE_SAMPLES
+    return {"baseline_median_s": base, "current_median_s": current, "ratio": ratio, "p_value": p_value,
+            "insufficient": insufficient,
+            "slowdown": bool(not insufficient and ratio > 1 + threshold and p_value < alpha)}
+
+def print_baseline_verdict(label: str, verdict: Dict[str, Any], n_runs: int) -> None:
+    if not n_runs:
+        print(f"Baseline {label}: aucun historique comparable (même script, entrées, machine et mode)")
+        return
+    if verdict["insufficient"]:
+        flag = f"échantillons insuffisants (< {MIN_BASELINE_SAMPLES} temps), pas de verdict"
+    else:
+        flag = "⚠️  RALENTISSEMENT SIGNIFICATIF" if verdict["slowdown"] else "ok"
+    print(f"Baseline {label}: médiane {verdict['current_median_s']:.3f} s vs {verdict['baseline_median_s']:.3f} s "
+          f"({n_runs} évaluations) -> x{verdict['ratio']:.3f}, p={verdict['p_value']:.4f} : {flag}")
+
+# --- Mode classement (--candidates) ---
+
+def available_cpus() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))  # pragma: no cover - sans affinité (macOS, Windows)
+
+def core_slots(cpu_budget: int, cores_per_candidate: int) -> List[List[int]]:
+    """Découpe les `cpu_budget` premiers cœurs disponibles en groupes disjoints de `cores_per_candidate`."""
+    cpus = available_cpus()[:max(1, cpu_budget)]
+    per = max(1, min(cores_per_candidate, len(cpus)))
+    return [cpus[i:i + per] for i in range(0, len(cpus) - per + 1, per)]
+
+def candidate_output_path(candidate_out: str, index: int) -> str:
+    root, ext = os.path.splitext(candidate_out)
+    return f"{root}.{index}{ext or '.csv'}"
+
+def run_leaderboard(scripts: Sequence[str], points_csv: str, queries_csv: str, candidate_out: str,
+                    ref_df: pd.DataFrame, ref_index: Optional[ReferenceIndex] = None, repeat: int = 1,
+                    warmup: int = 0, cpu_budget: int = 1, cores_per_candidate: int = 1,
+                    pin: bool = False, limits: Optional[Limits] = None) -> pd.DataFrame:
+    """Évalue chaque script dans son propre processus (sortie séparée) et retourne le classement.
+    Avec `pin`, le budget CPU est découpé en groupes de cœurs disjoints : un candidat par groupe tourne en
+    parallèle, épinglé sur son groupe. Sans `pin`, les candidats passent l'un après l'autre, épinglés sur les
+    `cpu_budget` premiers cœurs (si l'affinité est disponible) : le budget s'applique aussi. La référence
+    (ref_df, ref_index) est chargée et indexée une seule fois par l'appelant.
+    Classement : candidats terminés d'abord, puis qualité décroissante (set_jaccard si ref_index est fourni,
+    correctness sinon) et temps mur médian croissant (un candidat interrompu par une limite est scoré sur sa
+    sortie partielle). La colonne wall_samples garde
+    les temps de chaque exécution mesurée (historique).
+    """
+    if pin:
+        slots = core_slots(cpu_budget, cores_per_candidate)
+    else:
+        slots = [available_cpus()[:max(1, cpu_budget)] if hasattr(os, "sched_setaffinity") else None]
+    free_slots: "queue.Queue[Optional[List[int]]]" = queue.Queue()
+    for slot in slots:
+        free_slots.put(slot)
+
+    def evaluate_one(index: int, script: str) -> Dict[str, Any]:
+        out_path = candidate_output_path(candidate_out, index)
+        cpus = free_slots.get()
+        try:
+            runs = run_repeated(script, points_csv, queries_csv, out_path, repeat, warmup, cpus=cpus, limits=limits)
+        finally:
+            free_slots.put(cpus)
+        row: Dict[str, Any] = {"script": script, "cpus": ",".join(map(str, cpus)) if cpus else "",
+                               "returncode": runs[-1].returncode, **timing_summary(runs),
+                               "wall_samples": [r.elapsed_s for r in runs]}
+        try:
+            row.update(score_output(scorable_output(runs[-1], out_path, limits), ref_df, ref_index)[1])
+            if runs[-1].killed:
+                row["status"] = f"limite {runs[-1].killed} (sortie partielle)"
+            else:
+                row["status"] = "ok" if runs[-1].returncode == 0 else f"exit {runs[-1].returncode}"
+        except (FileNotFoundError, KeyError, pd.errors.ParserError) as e:
+            row.update(num_queries=len(ref_df), exact_match=0, correctness=0.0, status=f"sortie invalide ({e})")
+        return row
+
+    with ThreadPoolExecutor(max_workers=len(slots)) as pool:
+        rows = list(pool.map(evaluate_one, range(len(scripts)), scripts))
+
+    board = pd.DataFrame(rows)
+    board["_failed"] = board["status"] != "ok"  # interrompus / en erreur après les candidats complets
+    # correctness ne compare que les volumes : avec --exact, le Jaccard des ensembles départage vraiment
+    quality = "correctness"
+    if ref_index is not None and "set_jaccard" in board:
+        board["set_jaccard"] = board["set_jaccard"].fillna(0.0)  # sortie invalide : ensembles vides
+        quality = "set_jaccard"
+    board = board.sort_values(["_failed", quality, "wall_median_s"],
+                              ascending=[True, False, True]).drop(columns="_failed")
+    board.insert(0, "rank", range(1, len(board) + 1))
+    return board.reset_index(drop=True)
+
+def print_leaderboard(board: pd.DataFrame) -> None:
+    print("\n===== Classement des candidats =====")
+    has_sets = "set_jaccard" in board
+    print(f"{'#':>3} {'script':<28} {'médiane (s)':>11} {'min (s)':>8} {'CPU (s)':>8} {'RSS (Mo)':>9} "
+          f"{'correctness':>11} {'exact':>9}" + (f" {'Jaccard':>8}" if has_sets else "") + "  statut")
+    for row in board.to_dict("records"):
+        cpu = f"{row['cpu_total_s']:.3f}" if pd.notna(row.get("cpu_total_s")) else "-"
+        rss = f"{row['max_rss_kb'] / 1024:.1f}" if pd.notna(row.get("max_rss_kb")) else "-"
+        jaccard = f" {row['set_jaccard']:>8.4f}" if has_sets else ""
+        print(f"{row['rank']:>3} {os.path.basename(row['script']):<28} {row['wall_median_s']:>11.3f} "
+              f"{row['wall_min_s']:>8.3f} {cpu:>8} {rss:>9} {row['correctness'] * 100:>10.2f}% "
+              f"{row['exact_match']:>4}/{row['num_queries']:<4}{jaccard}  {row['status']}")
+
+# --- Mode passage à l'échelle (--scaling) ---
+
+DEFAULT_SCALING_NODES = [1_000, 4_000, 16_000, 64_000]
+DEFAULT_SCALING_QUERIES = [25, 100, 400]
+DEFAULT_CACHE_DIR = ".eval_cache"
+SCALING_SELECTIVITY = 0.01
+REFERENCE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "brute_force_search.py")
+
+def scaling_inputs(cache_dir: str, n_nodes: int, n_queries: int, seed: int) -> Tuple[str, str]:
+    """Fichiers points/requêtes synthétiques (générateurs de benchmark_scaling), générés une seule fois."""
+    from benchmark_scaling import generate_nodes, generate_queries  # import tardif : mode optionnel
+
+    points_csv = os.path.join(cache_dir, f"points_N{n_nodes}_s{seed}.csv")
+    queries_csv = os.path.join(cache_dir, f"queries_N{n_nodes}_Q{n_queries}_s{seed}.csv")
+    if not os.path.exists(points_csv):
+        generate_nodes(n_nodes, np.random.default_rng([seed, n_nodes])).to_csv(points_csv, index=False)
+    if not os.path.exists(queries_csv):
+        points_mat = pd.read_csv(points_csv).iloc[:, 1:].to_numpy(dtype=float)
+        generate_queries(points_mat, n_queries, SCALING_SELECTIVITY, 0.0,
+                         np.random.default_rng([seed, n_nodes, n_queries])).to_csv(queries_csv, index=False)
+    return points_csv, queries_csv
+
+def cached_reference(cache_dir: str, points_csv: str, queries_csv: str,
+                     reference_script: str = REFERENCE_SCRIPT) -> str:
+    """Réponse de référence du moteur de confiance, en cache sous le hash (points, requêtes, script)."""
+    key = hashlib.sha256("".join(file_sha256(p) for p in (points_csv, queries_csv, reference_script)).encode())
+    ref_csv = os.path.join(cache_dir, f"ref_{key.hexdigest()[:20]}.csv")
+    if not os.path.exists(ref_csv):
+        run = run_candidate_measured(reference_script, points_csv, queries_csv, ref_csv + ".tmp")
+        if run.returncode != 0:
+            raise RuntimeError(f"Le moteur de référence a échoué :\n{run.stderr.strip()}")
+        os.replace(ref_csv + ".tmp", ref_csv)
+    return ref_csv
+
+def fit_exponent(sizes: Sequence[float], times: Sequence[float]) -> float:
+    """Pente de log(temps) en fonction de log(taille) (moindres carrés) : temps ~ taille^pente."""
+    if len(sizes) < 2:
+        return float("nan")
+    return float(np.polyfit(np.log(sizes), np.log(np.maximum(times, 1e-9)), 1)[0])
+
+def run_scaling(script_path: str, nodes: Sequence[int], queries: Sequence[int], cache_dir: str, seed: int = 42,
+                repeat: int = 1, warmup: int = 0, in_process: bool = False, entry: str = DEFAULT_ENTRY,
+                exact: bool = False, reference_script: str = REFERENCE_SCRIPT,
+                limits: Optional[Limits] = None) -> Tuple[pd.DataFrame, Dict[str, float]]:
+    """Série temps-vs-N (Q = queries[0]) et temps-vs-Q (N = nodes[0]) ; retourne (tableau, exposants)."""
+    os.makedirs(cache_dir, exist_ok=True)
+    cells = [("N", n, queries[0]) for n in nodes] + [("Q", nodes[0], q) for q in queries[1:]]
+    rows = []
+    for axis, n_nodes, n_queries in cells:
+        points_csv, queries_csv = scaling_inputs(cache_dir, n_nodes, n_queries, seed)
+        ref_csv = cached_reference(cache_dir, points_csv, queries_csv, reference_script)
+        out_csv = os.path.join(cache_dir, f"candidate_N{n_nodes}_Q{n_queries}.csv")
+        if in_process:
+            runs = run_repeated_in_process(script_path, points_csv, queries_csv, out_csv, entry, repeat, warmup)
+        else:
+            runs = run_repeated(script_path, points_csv, queries_csv, out_csv, repeat, warmup, limits=limits)
+        timing = timing_summary(runs)
+        _, scores = score_output(scorable_output(runs[-1], out_csv, limits), load_output_csv(ref_csv),
+                                 index_reference(ref_csv) if exact else None)
+        rows.append({"axis": axis, "nodes": n_nodes, "queries": n_queries, **timing, **scores})
+        print(f"  N={n_nodes:>8} Q={n_queries:>6} : {timing['wall_median_s']:.3f} s, "
+              f"correctness {scores['correctness'] * 100:.2f}%")
+
+    table = pd.DataFrame(rows)
+    # la cellule (nodes[0], queries[0]) appartient aux deux séries
+    by_n = table[table["queries"] == queries[0]].sort_values("nodes")
+    by_q = table[table["nodes"] == nodes[0]].sort_values("queries")
+    time_col = "compute_median_s" if in_process else "wall_median_s"
+    # pente globale + pente entre les deux plus grandes tailles (moins sensible aux coûts fixes : démarrage,
+    # imports, lecture des requêtes)
+    exponents = {"nodes": fit_exponent(by_n["nodes"], by_n[time_col]),
+                 "queries": fit_exponent(by_q["queries"], by_q[time_col]),
+                 "nodes_tail": fit_exponent(by_n["nodes"][-2:], by_n[time_col][-2:]),
+                 "queries_tail": fit_exponent(by_q["queries"][-2:], by_q[time_col][-2:])}
+    return table, exponents
+
+def print_scaling(table: pd.DataFrame, exponents: Dict[str, float], nodes: Sequence[int],
+                  queries: Sequence[int], time_col: str) -> None:
+    for label, key, fixed in (("N", "nodes", f"Q={queries[0]}"), ("Q", "queries", f"N={nodes[0]}")):
+        other = "queries" if key == "nodes" else "nodes"
+        series = table[table[other] == (queries[0] if key == "nodes" else nodes[0])].sort_values(key)
+        print(f"\n===== Temps vs {label} ({fixed}) =====")
+        print(f"{label:>10} {'temps (s)':>10} {'correctness':>12}")
+        for row in series.to_dict("records"):
+            print(f"{row[key]:>10} {row[time_col]:>10.3f} {row['correctness'] * 100:>11.2f}%")
+        print(f"Exposant empirique : temps ~ {label}^{exponents[key]:.2f} "
+              f"(entre les deux plus grandes tailles : {label}^{exponents[key + '_tail']:.2f})")
+
+def history_input_hashes(args: argparse.Namespace) -> Dict[str, str]:
+    return {"points": file_sha256(args.points_csv), "queries": file_sha256(args.queries_csv),
+            "reference": file_sha256(args.reference_csv)}
+
 def main():
     ap = argparse.ArgumentParser(description="Évalue un script brute-force sur la base d'un CSV de référence.")
     ap.add_argument("script_path", type=str, help="Chemin du script candidat (ex: brute_force_search.py)")
-    ap.add_argument("points_csv", type=str, help="Fichier des nœuds")
-    ap.add_argument("queries_csv", type=str, help="Fichier des requêtes")
-    ap.add_argument("candidate_output", type=str, help="Chemin de sortie où le candidat écrira ses résultats")
-    ap.add_argument("reference_csv", type=str, help="Fichier de référence (vérité terrain)")
+    ap.add_argument("points_csv", type=str, nargs="?", help="Fichier des nœuds")
+    ap.add_argument("queries_csv", type=str, nargs="?", help="Fichier des requêtes")
+    ap.add_argument("candidate_output", type=str, nargs="?",
+                    help="Chemin de sortie où le candidat écrira ses résultats")
+    ap.add_argument("reference_csv", type=str, nargs="?", help="Fichier de référence (vérité terrain)")
     ap.add_argument("--report", type=str, default=None, help="Chemin d'export CSV détaillé par requête")
+    ap.add_argument("--recall-targets", type=float, nargs="+", default=None,
+                    help="Balaye '--recall-target' du candidat et affiche la courbe vitesse/rappel")
+    ap.add_argument("--curve", type=str, default=None, help="Chemin d'export CSV de la courbe vitesse/rappel")
+    ap.add_argument("--repeat", type=int, default=1, metavar="N", help="Nombre d'exécutions mesurées (défaut: 1)")
+    ap.add_argument("--warmup", type=int, default=0, metavar="K", help="Exécutions d'échauffement non mesurées")
+    ap.add_argument("--exact", action="store_true",
+                    help="Compare aussi les ensembles de nœuds (précision/rappel/Jaccard par requête)")
+    ap.add_argument("--in-process", action="store_true",
+                    help="Importe le candidat et appelle --entry(points_df, queries_df) au lieu de lancer un processus")
+    ap.add_argument("--entry", type=str, default=DEFAULT_ENTRY,
+                    help=f"Fonction de recherche appelée en mode --in-process (défaut: {DEFAULT_ENTRY})")
+    ap.add_argument("--candidates", type=str, nargs="+", default=None, metavar="SCRIPT",
+                    help="Classement : scripts évalués en plus de script_path, un tableau trié unique")
+    ap.add_argument("--cpu-budget", type=int, default=None, metavar="C",
+                    help="Classement : nombre de cœurs utilisables (défaut: tous)")
+    ap.add_argument("--cores-per-candidate", type=int, default=1, metavar="K",
+                    help="Classement : cœurs par candidat avec --pin (défaut: 1)")
+    ap.add_argument("--pin", action="store_true",
+                    help="Classement : candidats en parallèle, épinglés sur des cœurs disjoints")
+    ap.add_argument("--history", type=str, nargs="?", const=DEFAULT_HISTORY, default=None, metavar="PATH",
+                    help=f"Ajoute l'évaluation à cette base SQLite (sans PATH : {DEFAULT_HISTORY})")
+    ap.add_argument("--no-history", action="store_true",
+                    help="N'enregistre rien (défaut, sauf avec --history ou --compare-baseline)")
+    ap.add_argument("--compare-baseline", action="store_true",
+                    help="Compare le temps aux évaluations comparables de l'historique (code de sortie 3 si "
+                         "ralentissement significatif)")
+    ap.add_argument("--slowdown-threshold", type=float, default=0.05, metavar="R",
+                    help="Ralentissement relatif minimal signalé par --compare-baseline (défaut: 0.05 = 5%%)")
+    ap.add_argument("--timeout", type=float, default=None, metavar="S",
+                    help="Temps mur maximal d'une exécution du candidat (tué au-delà, sortie partielle scorée)")
+    ap.add_argument("--cpu-limit", type=int, default=None, metavar="S", help="RLIMIT_CPU du candidat (secondes)")
+    ap.add_argument("--memory-limit", type=int, default=None, metavar="MO",
+                    help="RLIMIT_AS du candidat (Mo d'espace d'adressage)")
+    ap.add_argument("--scaling", action="store_true",
+                    help="Passage à l'échelle sur données générées (points/requêtes/référence non requis)")
+    ap.add_argument("--scaling-nodes", type=int, nargs="+", default=DEFAULT_SCALING_NODES, metavar="N")
+    ap.add_argument("--scaling-queries", type=int, nargs="+", default=DEFAULT_SCALING_QUERIES, metavar="Q")
+    ap.add_argument("--cache-dir", type=str, default=DEFAULT_CACHE_DIR,
+                    help=f"Données générées et références en cache (défaut: {DEFAULT_CACHE_DIR})")
+    ap.add_argument("--reference-script", type=str, default=REFERENCE_SCRIPT,
+                    help="Moteur de confiance qui produit les références (défaut: brute_force_search.py)")
+    ap.add_argument("--seed", type=int, default=42, help="Graine des données générées (--scaling)")
     args = ap.parse_args()
+    limits = Limits(args.timeout, args.cpu_limit, args.memory_limit)
+    if any(limits) and args.in_process:
+        ap.error("--timeout/--cpu-limit/--memory-limit s'appliquent au processus candidat (pas à --in-process)")
+    if (args.cpu_limit or args.memory_limit) and resource is None:
+        ap.error("--cpu-limit/--memory-limit requièrent le module resource (Unix)")
+    if args.scaling:
+        if args.candidates or args.recall_targets:
+            ap.error("--scaling ne se combine pas avec --candidates ni --recall-targets")
+        time_col = "compute_median_s" if args.in_process else "wall_median_s"
+        print(f"Passage à l'échelle de {args.script_path} (cache : {args.cache_dir})")
+        table, exponents = run_scaling(args.script_path, args.scaling_nodes, args.scaling_queries, args.cache_dir,
+                                       args.seed, args.repeat, args.warmup, args.in_process, args.entry,
+                                       args.exact, args.reference_script, limits)
+        if args.report:
+            table.to_csv(args.report, index=False)
+        print_scaling(table, exponents, args.scaling_nodes, args.scaling_queries, time_col)
+        return
+    if None in (args.points_csv, args.queries_csv, args.candidate_output, args.reference_csv):
+        ap.error("points_csv, queries_csv, candidate_output et reference_csv sont requis (sauf avec --scaling)")
+    if args.compare_baseline and args.no_history:
+        ap.error("--compare-baseline requiert l'historique (retirez --no-history)")
+    if args.compare_baseline and args.repeat < MIN_BASELINE_SAMPLES:
+        ap.error(f"--compare-baseline requiert --repeat >= {MIN_BASELINE_SAMPLES} (un test sur moins de temps "
+                 f"ne peut jamais signaler de ralentissement)")
+    if args.no_history:
+        args.history = None
+    elif args.compare_baseline and not args.history:
+        args.history = DEFAULT_HISTORY
+    if args.in_process and (args.recall_targets or args.candidates):
+        ap.error("--recall-targets et --candidates ne sont disponibles qu'en mode sous-processus")
+    if (args.pin or args.cpu_budget) and not hasattr(os, "sched_setaffinity"):
+        ap.error("--pin et --cpu-budget requièrent os.sched_setaffinity (Linux)")
 
-    # 1) Exécuter le candidat et mesurer le temps
-    elapsed, out, err = run_candidate(args.script_path, args.points_csv, args.queries_csv, args.candidate_output)
+    if args.candidates:
+        ref_df = load_output_csv(args.reference_csv)
+        ref_index = index_reference(args.reference_csv) if args.exact else None
+        cpu_budget = args.cpu_budget or len(available_cpus())
+        board = run_leaderboard([args.script_path, *args.candidates], args.points_csv, args.queries_csv,
+                                args.candidate_output, ref_df, ref_index, args.repeat, args.warmup,
+                                cpu_budget, args.cores_per_candidate, args.pin, limits)
+        verdicts = []
+        if args.history:
+            conn, input_hashes = open_history(args.history), history_input_hashes(args)
+            for row in board.to_dict("records"):
+                if not os.path.exists(row["script"]):
+                    continue
+                run_id = record_run(conn, row["script"], input_hashes, "subprocess", args.warmup,
+                                    row["wall_samples"], row, row)
+                if args.compare_baseline:
+                    baseline, n_runs = baseline_walls(conn, row["script"], input_hashes, "subprocess", run_id)
+                    verdicts.append((os.path.basename(row["script"]),
+                                     compare_to_baseline(row["wall_samples"], baseline, args.slowdown_threshold),
+                                     n_runs))
+            conn.close()
+        board = board.drop(columns="wall_samples")
+        if args.report:
+            board.to_csv(args.report, index=False)
+        slots = core_slots(cpu_budget, args.cores_per_candidate) if args.pin else []
+        print(f"Limites par exécution : {limits.describe()}")
+        print(f"Budget CPU : {cpu_budget} cœur(s)" +
+              (f", {len(slots)} candidat(s) en parallèle sur {args.cores_per_candidate} cœur(s) épinglé(s)"
+               if args.pin else f", candidats exécutés l'un après l'autre sur les cœurs {board['cpus'].iloc[0]}"))
+        print_leaderboard(board)
+        if args.report:
+            print(f"Classement : {args.report}")
+        for label, verdict, n_runs in verdicts:
+            print_baseline_verdict(label, verdict, n_runs)
+        if any(verdict["slowdown"] for _, verdict, _ in verdicts):
+            sys.exit(3)
+        return
 
-    # 2) Charger la sortie candidat et la référence
-    cand_df = load_output_csv(args.candidate_output)
-    ref_df = load_output_csv(args.reference_csv)
+    if args.recall_targets:
+        ref_df = load_output_csv(args.reference_csv)
+        curve = sweep_recall_targets(args.script_path, args.points_csv, args.queries_csv,
+                                     args.candidate_output, ref_df, args.recall_targets)
+        if args.curve:
+            curve.to_csv(args.curve, index=False)
+        total_q = len(ref_df)
+        print("\n===== Courbe vitesse / rappel =====")
+        print(f"Requêtes (référence): {total_q}")
+        print(f"{'cible':>8} {'temps (s)':>10} {'speedup':>8} {'correctness':>12} {'exact':>10}")
+        for row in curve.itertuples():
+            print(f"{row.recall_target:>8.3f} {row.elapsed_s:>10.3f} {row.speedup:>7.2f}x "
+                  f"{row.correctness * 100:>11.2f}% {row.exact_match:>5}/{total_q}")
+        return
 
-    # 3) Évaluer
-    details, mean_corr = evaluate(cand_df, ref_df)
+    # 1) Exécuter le candidat (échauffement + répétitions) et mesurer temps/CPU/mémoire
+    if args.in_process:
+        runs = run_repeated_in_process(args.script_path, args.points_csv, args.queries_csv, args.candidate_output,
+                                       args.entry, args.repeat, args.warmup)
+    else:
+        runs = run_repeated(args.script_path, args.points_csv, args.queries_csv, args.candidate_output,
+                            args.repeat, args.warmup, limits=limits)
+    timing = timing_summary(runs)
+    out, err = runs[-1].stdout, runs[-1].stderr
 
-    # 4) Enregistrer le report si demandé
+    # 2) + 3) Charger la sortie candidat et la référence, puis évaluer
+    ref_df = load_output_csv(args.reference_csv)
+    details, scores = score_output(scorable_output(runs[-1], args.candidate_output, limits), ref_df,
+                                   index_reference(args.reference_csv) if args.exact else None)
+    total_q, exact, mean_corr = scores["num_queries"], scores["exact_match"], scores["correctness"]
+
+    # 4) Enregistrer le report si demandé (détail par requête + résumé)
     if args.report:
         details.to_csv(args.report, index=False)
+        pd.DataFrame([{"script": args.script_path, "mode": "in_process" if args.in_process else "subprocess",
+                       "warmup": args.warmup, "limit_wall_s": limits.wall_s, "limit_cpu_s": limits.cpu_s,
+                       "limit_memory_mb": limits.memory_mb, "killed": runs[-1].killed, **timing, **scores}]
+                     ).to_csv(summary_path(args.report), index=False)
+
+    # 4b) Historique SQLite (+ comparaison à la baseline)
+    verdict, n_runs = None, 0
+    if args.history:
+        conn, input_hashes = open_history(args.history), history_input_hashes(args)
+        mode = "in_process" if args.in_process else "subprocess"
+        walls = [r.elapsed_s for r in runs]
+        run_id = record_run(conn, args.script_path, input_hashes, mode, args.warmup, walls, timing, scores)
+        if args.compare_baseline:
+            baseline, n_runs = baseline_walls(conn, args.script_path, input_hashes, mode, run_id)
+            verdict = compare_to_baseline(walls, baseline, args.slowdown_threshold)
+        conn.close()
 
     # 5) Afficher un résumé clair
-    total_q = len(ref_df)
-    exact = int((details["num_ref"] == details["num_pred"]).sum())
-    print("\\n===== Résumé de l'évaluation =====")
+    print("\n===== Résumé de l'évaluation =====")
     print(f"Requêtes (référence): {total_q}")
-    print(f"Temps d'exécution (script candidat): {elapsed:.3f} s")
+    if any(limits):
+        print(f"Limites par exécution : {limits.describe()}")
+    if timing["killed_runs"]:
+        print(f"⚠️  {timing['killed_runs']}/{timing['runs']} exécution(s) interrompue(s) par une limite "
+              f"(dernière : {runs[-1].killed or 'terminée'}) ; la sortie partielle est scorée")
+    if not runs[-1].killed and runs[-1].returncode != 0:
+        print(f"❌ Échec du candidat (code de sortie {runs[-1].returncode}) : sa sortie partielle est scorée")
+    if timing["runs"] > 1:
+        print(f"Temps d'exécution (script candidat, {timing['runs']} runs, {args.warmup} warmup): "
+              f"min {timing['wall_min_s']:.3f} s | médiane {timing['wall_median_s']:.3f} s | "
+              f"p95 {timing['wall_p95_s']:.3f} s")
+    else:
+        print(f"Temps d'exécution (script candidat): {timing['wall_median_s']:.3f} s")
+    if args.in_process:
+        print(f"Phases (médiane, en processus): lecture {timing['load_median_s']:.3f} s | "
+              f"calcul {timing['compute_median_s']:.3f} s | écriture {timing['write_median_s']:.3f} s")
+    if timing["cpu_total_s"] is not None:
+        rss = f"{timing['max_rss_kb'] / 1024:.1f} Mo" if timing["max_rss_kb"] is not None else "non mesuré"
+        print(f"CPU candidat (médiane): user {timing['cpu_user_s']:.3f} s + sys {timing['cpu_sys_s']:.3f} s "
+              f"= {timing['cpu_total_s']:.3f} s | pic RSS: {rss}")
     print(f"Exact match (num_ref == num_pred): {exact}/{total_q} ({(exact/total_q*100 if total_q else 0):.1f}%)")
     print(f"Correctness moyenne (0..1): {mean_corr:.4f}  -> {(mean_corr*100):.2f}%")
+    if args.exact:
+        print(f"Ensembles identiques: {scores['set_exact_sets']}/{total_q} | précision {scores['set_precision']:.4f} | "
+              f"rappel {scores['set_recall']:.4f} | Jaccard {scores['set_jaccard']:.4f}")
+    if args.report:
+        print(f"Report : {args.report} (résumé : {summary_path(args.report)})")
+
+    if verdict is not None:
+        print_baseline_verdict(os.path.basename(args.script_path), verdict, n_runs)
 
     if out.strip():
-        print("\\n--- STDOUT candidat ---\\n" + out.strip())
+        print("\n--- STDOUT candidat ---\n" + out.strip())
     if err.strip():
-        print("\\n--- STDERR candidat ---\\n" + err.strip())
+        print("\n--- STDERR candidat ---\n" + err.strip())
+    if verdict is not None and verdict["slowdown"]:
+        sys.exit(3)
 
 if __name__ == "__main__":
     main()
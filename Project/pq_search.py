@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Recherche pondérée sur un stockage compressé par quantification produit (PQ) avec raffinement exact.
+
+Usage
+-----
+python pq_search.py <points.csv> <queries.csv> [output.csv] [--store DIR] [--subspaces 10] [--centroids 256]
+                    [--slack S] [--report-recall]
+
+Stockage (DIR, par défaut '<points>.pq/')
+-----------------------------------------
+- pq.npz       : codebooks (M,K,50/M), codes uint8 (M,N), résidus de quantification au carré par sous-espace
+                 (M,N) float32 arrondis vers le haut, et de quoi vérifier que le stockage est à jour :
+                 source (taille, mtime_ns du fichier de points) et params (subspaces, centroids)
+- node_ids.npy : identifiants (N,) en chaînes numpy à largeur fixe, ouverts en np.memmap
+- points.f64   : matrice pleine précision (N,50) float64, ouverte en np.memmap pour le re-scoring exact
+Seuls les codes et les résidus (5*M octets/noeud) sont chargés en RAM ; les identifiants et la matrice pleine
+restent sur disque et ne sont lus que pour les candidats (pages mises en cache par l'OS à la demande).
+Un stockage existant n'est réutilisé que si source et params correspondent ; sinon il est reconstruit.
+
+Méthode
+-------
+Pour chaque requête (A, Y, D) et chaque sous-espace m, on calcule une table T[m,k] = sum_j Y_j (A_j - C[m,k,j])^2
+(K entrées), puis la distance approchée de chaque noeud par M lectures de table : d~(P)^2 = sum_m T[m, code_m(P)].
+
+- Mode exact (par défaut) : la norme pondérée vérifie l'inégalité triangulaire, donc
+      dist(A,P) >= d~(P) - sqrt( sum_m max(Y_m) * ||P_m - C_m(P)||^2 )
+  Tout noeud dont cette borne inférieure dépasse D est écarté sans perte ; les candidats restants sont
+  re-scorés exactement sur la matrice memmap -> résultat identique à la force brute (rappel 100%).
+- Mode approché (--slack S) : candidats = noeuds avec d~(P) <= S*D, puis re-scoring exact. Plus rapide,
+  rappel < 100% ; --report-recall compare au résultat brute-force.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from brute_force_search import (NUM_FEATURES, QueryBatch, build_query_batch, load_points_csv,
+                                radius_search, read_queries_csv, write_response_csv)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SearchResults = List[Tuple[str, float, List[Tuple[str, float]]]]
+
+DEFAULT_SUBSPACES = 10
+DEFAULT_CENTROIDS = 256
+TRAIN_SAMPLE = 64 * DEFAULT_CENTROIDS
+KMEANS_ITERS = 12
+ENCODE_CHUNK = 16_384
+
+
+class PQStore(NamedTuple):
+    node_ids: np.ndarray        # (N,) <U, np.memmap en lecture seule (indexé pour les seuls matches)
+    codebooks: np.ndarray       # (M, K, d) float64
+    codes: np.ndarray           # (M, N) uint8
+    residual_sq: np.ndarray     # (M, N) float32, ||P_m - C_m(P)||^2 arrondi vers le haut
+    full: np.ndarray            # (N, 50) float64, np.memmap en lecture seule
+
+
+# --- Construction du stockage ---
+
+def kmeans(X: np.ndarray, k: int, iters: int, rng: np.random.Generator) -> np.ndarray:
+    """Lloyd vectorisé (distance euclidienne) ; les centres vides sont réinitialisés au hasard."""
+    k = min(k, X.shape[0])
+    centers = X[rng.choice(X.shape[0], size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign = nearest_center(X, centers)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.stack([np.bincount(assign, weights=X[:, j], minlength=k) for j in range(X.shape[1])], axis=1)
+        empty = counts == 0
+        centers[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centers[empty] = X[rng.choice(X.shape[0], size=int(empty.sum()))]
+    return centers
+
+
+def nearest_center(X: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    # ||X||^2 est constant par ligne : inutile pour l'argmin
+    return np.argmin((centers * centers).sum(axis=1)[None, :] - 2.0 * X @ centers.T, axis=1)
+
+
+def train_codebooks(points_mat: np.ndarray, n_subspaces: int = DEFAULT_SUBSPACES,
+                    n_centroids: int = DEFAULT_CENTROIDS, seed: int = 0) -> np.ndarray:
+    if NUM_FEATURES % n_subspaces:
+        raise ValueError(f"{NUM_FEATURES} n'est pas divisible par {n_subspaces} sous-espaces")
+    if n_centroids > 256:
+        raise ValueError("Les codes sont stockés sur uint8 : 256 centroïdes au maximum")
+    rng = np.random.default_rng(seed)
+    sample = points_mat[rng.choice(points_mat.shape[0], size=min(TRAIN_SAMPLE, points_mat.shape[0]), replace=False)]
+    d = NUM_FEATURES // n_subspaces
+    books = np.zeros((n_subspaces, n_centroids, d))
+    for m in range(n_subspaces):
+        centers = kmeans(sample[:, m * d:(m + 1) * d], n_centroids, KMEANS_ITERS, rng)
+        books[m, :len(centers)] = centers
+        books[m, len(centers):] = centers[0]  # peu de points : centroïdes dupliqués, jamais meilleurs
+    return books
+
+
+def encode(points_mat: np.ndarray, codebooks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Retourne (codes (M,N) uint8, résidus au carré par sous-espace (M,N) float32 arrondis vers le haut)."""
+    M, _, d = codebooks.shape
+    N = points_mat.shape[0]
+    codes = np.empty((M, N), dtype=np.uint8)
+    resid_sq = np.empty((M, N), dtype=np.float32)
+    for start in range(0, N, ENCODE_CHUNK):
+        block = points_mat[start:start + ENCODE_CHUNK]
+        for m in range(M):
+            sub = block[:, m * d:(m + 1) * d]
+            c = nearest_center(sub, codebooks[m])
+            codes[m, start:start + len(block)] = c
+            r = sub - codebooks[m][c]
+            exact = (r * r).sum(axis=1)
+            r32 = exact.astype(np.float32)
+            # float32 pour la mémoire, mais jamais sous la vraie valeur (la borne reste valide)
+            resid_sq[m, start:start + len(block)] = np.where(r32 < exact, np.nextafter(r32, np.float32(np.inf)), r32)
+    return codes, resid_sq
+
+
+def source_signature(points_csv: str) -> np.ndarray:
+    """(taille, mtime_ns) du fichier de points : change dès que le fichier est remplacé ou modifié."""
+    st = os.stat(points_csv)
+    return np.array([st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+
+def store_is_current(store_dir: str, points_csv: str, n_subspaces: int, n_centroids: int) -> bool:
+    """True si <store_dir>/pq.npz a été construit depuis ce fichier de points avec ces paramètres."""
+    path = os.path.join(store_dir, 'pq.npz')
+    if not os.path.exists(path) or not os.path.exists(os.path.join(store_dir, 'node_ids.npy')):
+        return False
+    with np.load(path) as z:
+        if 'source' not in z.files or 'params' not in z.files:
+            return False  # stockage d'une version antérieure, sans métadonnées
+        return (np.array_equal(z['source'], source_signature(points_csv))
+                and z['params'].tolist() == [n_subspaces, n_centroids])
+
+
+def build_pq_store(node_ids: List[str], points_mat: np.ndarray, store_dir: str,
+                   n_subspaces: int = DEFAULT_SUBSPACES, n_centroids: int = DEFAULT_CENTROIDS,
+                   seed: int = 0, source: Optional[np.ndarray] = None) -> None:
+    os.makedirs(store_dir, exist_ok=True)
+    full = np.memmap(os.path.join(store_dir, 'points.f64'), dtype='<f8', mode='w+', shape=points_mat.shape)
+    full[:] = points_mat
+    full.flush()
+    del full
+    np.save(os.path.join(store_dir, 'node_ids.npy'), np.array(node_ids, dtype=str))
+
+    codebooks = train_codebooks(points_mat, n_subspaces, n_centroids, seed)
+    codes, residual_sq = encode(points_mat, codebooks)
+    # pq.npz en dernier : sa présence (avec source/params) atteste un stockage complet
+    np.savez(os.path.join(store_dir, 'pq.npz'), codebooks=codebooks, codes=codes, residual_sq=residual_sq,
+             source=source if source is not None else np.full(2, -1, dtype=np.int64),
+             params=np.array([n_subspaces, n_centroids], dtype=np.int64))
+
+
+def load_pq_store(store_dir: str) -> PQStore:
+    with np.load(os.path.join(store_dir, 'pq.npz')) as z:
+        codebooks, codes, residual_sq = z['codebooks'], z['codes'], z['residual_sq']
+    node_ids = np.load(os.path.join(store_dir, 'node_ids.npy'), mmap_mode='r')
+    full = np.memmap(os.path.join(store_dir, 'points.f64'), dtype='<f8', mode='r',
+                     shape=(len(node_ids), NUM_FEATURES))
+    return PQStore(node_ids, codebooks, codes, residual_sq, full)
+
+
+# --- Recherche ---
+
+def distance_tables(codebooks: np.ndarray, A: np.ndarray, Y: np.ndarray) -> np.ndarray:
+    """T[m,k] = sum_j Y_j (A_j - C[m,k,j])^2 pour chaque sous-espace m."""
+    M, _, d = codebooks.shape
+    diff = A.reshape(M, 1, d) - codebooks
+    return (Y.reshape(M, 1, d) * diff * diff).sum(axis=2)
+
+
+def approx_sq_distances(store: PQStore, tables: np.ndarray) -> np.ndarray:
+    acc = tables[0][store.codes[0]]
+    for m in range(1, tables.shape[0]):
+        acc += tables[m][store.codes[m]]
+    return acc
+
+
+def pq_search(store: PQStore, queries: QueryBatch, slack: Optional[float] = None) -> Tuple[SearchResults, Dict[str, float]]:
+    """Filtre PQ puis re-scoring exact sur la matrice memmap. Retourne (résultats, statistiques)."""
+    results: SearchResults = []
+    n_candidates = 0
+    for q_idx, q_id in enumerate(queries.q_ids):
+        D = float(queries.D[q_idx])
+        A, Y = queries.A[q_idx], queries.Y[q_idx]
+
+        approx = np.sqrt(approx_sq_distances(store, distance_tables(store.codebooks, A, Y)))
+        if slack is None:
+            y_max = np.maximum(Y.reshape(store.codebooks.shape[0], -1).max(axis=1), 0.0)
+            lower = approx - np.sqrt(y_max @ store.residual_sq)
+            cand = np.flatnonzero(lower <= D * (1.0 + 1e-9) + 1e-9)  # marge pour les arrondis flottants
+        else:
+            cand = np.flatnonzero(approx <= slack * D)
+        n_candidates += len(cand)
+
+        # Re-scoring exact (même formule que radius_search -> mêmes distances au bit près)
+        diff = store.full[cand] - A
+        dists = np.sqrt(np.sum(Y * diff * diff, axis=1))
+        keep = dists <= D
+        names = store.node_ids[cand[keep]].tolist()  # seules les lignes des matches sont lues
+        matches = list(zip(names, dists[keep].tolist()))
+        matches.sort(key=lambda x: (x[1], x[0]))
+        results.append((q_id, D, matches))
+
+    n_nodes = max(len(store.node_ids), 1)
+    stats = {'mean_candidates': n_candidates / max(len(queries.q_ids), 1),
+             'candidate_fraction': n_candidates / (n_nodes * max(len(queries.q_ids), 1))}
+    return results, stats
+
+
+def recall_against(results: SearchResults, reference: SearchResults) -> Dict[str, float]:
+    """Rappel moyen par requête (ensembles de noeuds) et rappel global vs la référence."""
+    pred = {q: {n for n, _ in m} for q, _, m in results}
+    per_query, hit, total = [], 0, 0
+    for q, _, m in reference:
+        ref = {n for n, _ in m}
+        inter = len(ref & pred.get(q, set()))
+        per_query.append(inter / len(ref) if ref else 1.0)
+        hit += inter
+        total += len(ref)
+    return {'mean_recall': float(np.mean(per_query)) if per_query else 1.0,
+            'global_recall': hit / total if total else 1.0}
+
+
+def pq_engine(points_df: pd.DataFrame, queries_df: pd.DataFrame) -> SearchResults:
+    """Adaptateur (points_df, queries_df) pour benchmark_scaling (construction du stockage incluse)."""
+    from brute_force_search import FEATURE_COLS
+    node_ids = points_df['node_id'].astype(str).to_list()
+    points_mat = points_df[FEATURE_COLS].to_numpy(dtype=float)
+    queries = build_query_batch(queries_df['point_A'].astype(str).to_list(), queries_df['D'].to_list(),
+                                queries_df['Y_vector'].to_list(),
+                                queries_df['A_vector'].to_list() if 'A_vector' in queries_df.columns else None)
+    with tempfile.TemporaryDirectory() as tmp:
+        build_pq_store(node_ids, points_mat, tmp)
+        store = load_pq_store(tmp)
+        results, _ = pq_search(store, queries)
+        del store
+    return results
+
+
+def main(argv: List[str]) -> None:
+    ap = argparse.ArgumentParser(description="Recherche pondérée sur stockage PQ avec raffinement exact.")
+    ap.add_argument("points_csv")
+    ap.add_argument("queries_csv")
+    ap.add_argument("output_csv", nargs="?", default="responses.csv")
+    ap.add_argument("--store", default=None, help="Répertoire du stockage PQ (défaut: <points>.pq)")
+    ap.add_argument("--rebuild", action="store_true", help="Reconstruit le stockage même s'il existe")
+    ap.add_argument("--subspaces", type=int, default=DEFAULT_SUBSPACES)
+    ap.add_argument("--centroids", type=int, default=DEFAULT_CENTROIDS)
+    ap.add_argument("--slack", type=float, default=None,
+                    help="Mode approché : candidats avec distance PQ <= slack*D (défaut: filtre exact)")
+    ap.add_argument("--report-recall", action="store_true", help="Compare au résultat brute-force")
+    args = ap.parse_args(argv[1:])
+
+    store_dir = args.store or os.path.splitext(args.points_csv)[0] + '.pq'
+    if args.rebuild or not store_is_current(store_dir, args.points_csv, args.subspaces, args.centroids):
+        t0 = time.perf_counter()
+        source = source_signature(args.points_csv)  # avant la lecture : une modification pendant la
+        node_ids, points_mat = load_points_csv(args.points_csv)  # construction forcera un nouveau build
+        build_pq_store(node_ids, points_mat, store_dir, args.subspaces, args.centroids, source=source)
+        del points_mat
+        print(f"🗜️  Stockage PQ construit dans {store_dir} ({time.perf_counter() - t0:.2f}s)")
+
+    store = load_pq_store(store_dir)
+    cols = read_queries_csv(args.queries_csv)
+    queries = build_query_batch(cols['point_A'], cols['D'], cols['Y_vector'], cols.get('A_vector'))
+
+    t0 = time.perf_counter()
+    results, stats = pq_search(store, queries, args.slack)
+    elapsed = time.perf_counter() - t0
+    write_response_csv(results, args.output_csv)
+    print(f"Recherche PQ : {elapsed:.3f}s, {stats['mean_candidates']:.1f} candidats/requête "
+          f"({stats['candidate_fraction'] * 100:.2f}% des noeuds)")
+
+    if args.report_recall:
+        t0 = time.perf_counter()
+        reference = radius_search(store.node_ids.tolist(), np.asarray(store.full), queries)
+        ref_elapsed = time.perf_counter() - t0
+        recall = recall_against(results, reference)
+        print(json.dumps({**stats, **recall, 'pq_seconds': elapsed, 'brute_force_seconds': ref_elapsed}, indent=2))
+    print(f"✅ Fichier de réponse généré : {args.output_csv}")
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Service de recherche longue durée avec rechargement à chaud du fichier de points.
+
+Usage
+-----
+python search_service.py <points.csv> <queries_dir> <responses_dir> [--poll 1.0] [--threads N] [--once]
+
+- Chaque fichier *.csv déposé dans <queries_dir> est un lot de requêtes (même format que queries_structured.csv).
+  Sa réponse est écrite dans <responses_dir> sous le même nom (écriture atomique : tmp + rename), avec une
+  colonne supplémentaire 'snapshot_version'. Les lots déjà répondus sont ignorés.
+- Dépôt : écrire le lot sous un autre nom (ex: lot.csv.tmp) puis le renommer en *.csv. Par sécurité, un lot
+  n'est lu que si sa taille et son mtime n'ont pas changé depuis le tour précédent (copie encore en cours).
+- Un lot illisible est déplacé dans <queries_dir>/failed/ avec un fichier <nom>.err (message d'erreur) :
+  il n'est pas retenté. Pour le relancer, le corriger et le redéposer.
+- Quand <points.csv> change (mtime/taille), un nouveau snapshot (matrice des points + index des node_id) est
+  construit dans un thread en arrière-plan, puis publié atomiquement entre deux lots.
+
+Snapshots
+---------
+Un lot prend une référence sur le snapshot courant au démarrage et le garde jusqu'à la fin : un lot en cours
+termine toujours sur l'ancien snapshot, et toutes ses réponses portent la même version. Un snapshot remplacé
+est libéré (tableaux rendus au ramasse-miettes) dès que son dernier lecteur le rend. Si le nouveau fichier est
+illisible (copie en cours, colonnes manquantes...), l'ancien snapshot reste en service.
+
+--once : traite les lots présents puis s'arrête (sans surveiller le fichier de points ; au moins deux tours,
+         pour vérifier que chaque lot est complet).
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from brute_force_search import (build_query_batch, load_points_csv, radius_search, read_queries_csv,
+                                _write_response_rows)
+
+DEFAULT_POLL_S = 1.0
+
+
+class Snapshot:
+    """Version figée des noeuds : la matrice et ses index ne sont jamais modifiés après construction."""
+
+    def __init__(self, version: int, source_stat: Tuple[int, int], node_ids: List[str], points_mat: np.ndarray) -> None:
+        self.version = version
+        self.source_stat = source_stat
+        self.node_ids = node_ids
+        self.points_mat = points_mat
+        self.readers = 0
+        self.retired = False
+
+    def release(self) -> None:
+        self.node_ids, self.points_mat = [], np.empty((0, 0))
+
+
+class SnapshotStore:
+    """Snapshot courant + comptage des lecteurs. publish() est atomique vis-à-vis de acquire()."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._current: Optional[Snapshot] = None
+        self._live: Dict[int, Snapshot] = {}
+
+    @property
+    def current_version(self) -> int:
+        with self._lock:
+            return self._current.version if self._current else 0
+
+    def live_versions(self) -> List[int]:
+        """Versions encore en mémoire (courante + anciennes ayant des lecteurs)."""
+        with self._lock:
+            return sorted(self._live)
+
+    def publish(self, snapshot: Snapshot) -> None:
+        with self._lock:
+            old, self._current = self._current, snapshot
+            self._live[snapshot.version] = snapshot
+            if old is not None:
+                old.retired = True
+                self._release_if_idle(old)
+
+    @contextmanager
+    def acquire(self) -> Iterator[Snapshot]:
+        with self._lock:
+            snapshot = self._current
+            if snapshot is None:
+                raise RuntimeError("Aucun snapshot publié")
+            snapshot.readers += 1
+        try:
+            yield snapshot
+        finally:
+            with self._lock:
+                snapshot.readers -= 1
+                self._release_if_idle(snapshot)
+
+    def _release_if_idle(self, snapshot: Snapshot) -> None:
+        if snapshot.retired and snapshot.readers == 0:
+            del self._live[snapshot.version]
+            snapshot.release()
+
+
+def _stat_key(path: str) -> Tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def build_snapshot(points_file: str, version: int) -> Snapshot:
+    stat = _stat_key(points_file)
+    node_ids, points_mat = load_points_csv(points_file)
+    return Snapshot(version, stat, node_ids, points_mat)
+
+
+class SnapshotReloader(threading.Thread):
+    """Surveille le fichier de points et publie un nouveau snapshot quand il change."""
+
+    def __init__(self, points_file: str, store: SnapshotStore, poll_s: float = DEFAULT_POLL_S) -> None:
+        super().__init__(name="snapshot-reloader", daemon=True)
+        self.points_file = points_file
+        self.store = store
+        self.poll_s = poll_s
+        self._stop_event = threading.Event()
+        self._seen: Optional[Tuple[int, int]] = None
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def check_once(self) -> bool:
+        """Recharge si le fichier a changé depuis la dernière tentative. Retourne True si publié."""
+        try:
+            stat = _stat_key(self.points_file)
+        except OSError:
+            return False  # fichier en cours de remplacement
+        if stat == self._seen:
+            return False
+        self._seen = stat
+        try:
+            snapshot = build_snapshot(self.points_file, self.store.current_version + 1)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️  Rechargement ignoré ({e}) : le snapshot {self.store.current_version} reste en service")
+            return False
+        if snapshot.source_stat != stat:
+            self._seen = None  # modifié pendant la lecture : on relira au prochain tour
+            return False
+        self.store.publish(snapshot)
+        print(f"🔄 Snapshot {snapshot.version} publié ({len(snapshot.node_ids)} noeuds)")
+        return True
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.poll_s):
+            try:
+                self.check_once()
+            except Exception as e:  # le thread ne doit jamais mourir : le rechargement continuerait d'être attendu
+                print(f"⚠️  Erreur du rechargement ({e!r}) : le snapshot {self.store.current_version} reste en service")
+
+
+def answer_batch(store: SnapshotStore, queries_file: str, output_file: str, threads: int = 1) -> int:
+    """Répond à un lot sur le snapshot courant ; retourne la version utilisée."""
+    cols = read_queries_csv(queries_file)
+    queries = build_query_batch(cols['point_A'], cols['D'], cols['Y_vector'], cols.get('A_vector'))
+    with store.acquire() as snapshot:
+        results = radius_search(snapshot.node_ids, snapshot.points_mat, queries, threads=threads)
+        version = snapshot.version
+    tmp = output_file + '.tmp'
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
+        _write_response_rows(f, results, header=True, extra=[('snapshot_version', version)])
+    os.replace(tmp, output_file)
+    return version
+
+
+FAILED_DIR = 'failed'
+
+
+def pending_batches(queries_dir: str, responses_dir: str) -> List[str]:
+    return sorted(name for name in os.listdir(queries_dir)
+                  if name.endswith('.csv') and os.path.isfile(os.path.join(queries_dir, name))
+                  and not os.path.exists(os.path.join(responses_dir, name)))
+
+
+def stable_batches(queries_dir: str, names: List[str], last_stat: Dict[str, Tuple[int, int]]) -> List[str]:
+    """Lots dont (mtime, taille) n'a pas bougé depuis le tour précédent ; `last_stat` est mis à jour."""
+    ready = []
+    current: Dict[str, Tuple[int, int]] = {}
+    for name in names:
+        try:
+            current[name] = _stat_key(os.path.join(queries_dir, name))
+        except OSError:
+            continue  # renommé / supprimé entre-temps
+        if last_stat.get(name) == current[name]:
+            ready.append(name)
+    last_stat.clear()
+    last_stat.update(current)
+    return ready
+
+
+def set_aside_failed(queries_dir: str, name: str, error: Exception) -> bool:
+    """Déplace un lot en échec dans <queries_dir>/failed/ avec son message d'erreur. False si impossible."""
+    failed_dir = os.path.join(queries_dir, FAILED_DIR)
+    try:
+        os.makedirs(failed_dir, exist_ok=True)
+        with open(os.path.join(failed_dir, name + '.err'), 'w', encoding='utf-8') as f:
+            f.write(f"{error!r}\n")
+        os.replace(os.path.join(queries_dir, name), os.path.join(failed_dir, name))
+        return True
+    except OSError:
+        return False
+
+
+def serve(points_file: str, queries_dir: str, responses_dir: str, poll_s: float = DEFAULT_POLL_S,
+          threads: int = 1, once: bool = False) -> None:
+    os.makedirs(responses_dir, exist_ok=True)
+    store = SnapshotStore()
+    reloader = SnapshotReloader(points_file, store, poll_s)
+    if not reloader.check_once():  # snapshot 1, chargé avant le premier lot
+        raise SystemExit(f"Impossible de charger {points_file}")
+    if not once:
+        reloader.start()
+    last_stat: Dict[str, Tuple[int, int]] = {}
+    failed: Dict[str, Tuple[int, int]] = {}  # lots en échec non déplaçables -> (mtime, taille) à ne pas retenter
+    try:
+        while True:
+            for name in stable_batches(queries_dir, pending_batches(queries_dir, responses_dir), last_stat):
+                if failed.get(name) == last_stat[name]:
+                    continue  # même fichier, déjà en échec ; un lot redéposé (autre stat) est retenté
+                try:
+                    version = answer_batch(store, os.path.join(queries_dir, name),
+                                           os.path.join(responses_dir, name), threads)
+                except (OSError, ValueError, KeyError, IndexError) as e:  # IndexError : ligne tronquée
+                    if set_aside_failed(queries_dir, name, e):
+                        print(f"❌ Lot {name} ignoré : {e} (déplacé dans {FAILED_DIR}/)")
+                    else:
+                        failed[name] = last_stat[name]
+                        print(f"❌ Lot {name} ignoré : {e}")
+                    continue
+                print(f"✅ {name} -> snapshot {version}")
+            if once and all(failed.get(name) == last_stat.get(name)
+                            for name in pending_batches(queries_dir, responses_dir)):
+                break
+            time.sleep(poll_s)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reloader.stop()
+
+
+def main(argv: List[str]) -> None:
+    ap = argparse.ArgumentParser(description="Service de recherche avec rechargement à chaud des noeuds.")
+    ap.add_argument("points_csv")
+    ap.add_argument("queries_dir", help="Répertoire surveillé : un fichier CSV de requêtes par lot")
+    ap.add_argument("responses_dir", help="Répertoire des réponses (même nom que le lot)")
+    ap.add_argument("--poll", type=float, default=DEFAULT_POLL_S, help="Intervalle de surveillance (s)")
+    ap.add_argument("--threads", type=int, default=1, metavar="N")
+    ap.add_argument("--once", action="store_true", help="Traite les lots présents puis s'arrête")
+    args = ap.parse_args(argv[1:])
+    serve(args.points_csv, args.queries_dir, args.responses_dir, args.poll, args.threads, args.once)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,312 @@
+import os
+import random
+import tempfile
+import time
+from typing import Hashable, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from union_find_performance_tester import (_unique_sorted, compare_results, connected_labels,
+                                           generate_test_data, partition_par_unions_4, spanning_forest)
+
+DEFAULT_KEY_WIDTH = 16
+DEFAULT_BATCH_SIZE = 1_000_000
+DEFAULT_CHUNK_ROWS = 4_000_000
+
+_FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+_FNV_PRIME = np.uint64(0x100000001B3)
+
+
+def _key_bytes(keys: Sequence[str]) -> np.ndarray:
+    """Clés texte -> tableau d'octets (UTF-8), à la largeur de la plus longue clé."""
+    arr = np.asarray(keys)
+    if arr.dtype.kind == 'U':
+        try:
+            arr = arr.astype('S')
+        except UnicodeEncodeError:
+            arr = np.char.encode(arr, 'utf-8')
+    if arr.dtype.kind != 'S':
+        raise TypeError(f"Clés texte attendues, reçu {arr.dtype}")
+    return arr
+
+
+def encode_keys(keys: Sequence[str], key_width: int) -> np.ndarray:
+    """Clés texte -> tableau d'octets à largeur fixe (UTF-8). Une clé trop longue est une erreur, pas une troncature."""
+    arr = _key_bytes(keys)
+    if arr.dtype.itemsize > key_width:
+        raise ValueError(f"Clé de {arr.dtype.itemsize} octets > key_width={key_width}")
+    return arr.astype(f'S{key_width}')
+
+
+class DiskUnionFind:
+    """
+    Union-Find dont toutes les structures de taille n vivent dans des fichiers np.memmap :
+
+    - table de hachage à adressage ouvert (sondage linéaire) : table_keys (clés à largeur fixe) et
+      table_ids (identifiant + 1, 0 = case vide), 2 x capacité cases ;
+    - keys_by_id : clé de chaque identifiant (pour écrire la partition) ;
+    - parent / size : la forêt Union-Find (int32, union par taille).
+
+    Tout est traité par lots vectorisés : les clés d'un lot sont hachées puis sondées dans l'ordre des
+    cases (accès disque croissants), et chaque lot de relations est d'abord réduit à sa forêt couvrante
+    locale avant de toucher les tableaux globaux. La mémoire vive utilisée est proportionnelle au lot,
+    pas à n : le cache de pages du système garde les pages chaudes.
+
+    Ordre de grandeur pour 500M éléments avec key_width=16 : ~20 Go de table de hachage, 8 Go de clés
+    et 4 Go pour parent/size, sur disque.
+    """
+
+    def __init__(self, directory: str, capacity: int, key_width: int = DEFAULT_KEY_WIDTH):
+        if capacity >= 2 ** 31 - 1:
+            raise ValueError("capacity doit tenir dans un int32")
+        self.directory = directory
+        self.capacity = capacity
+        self.key_width = -(-key_width // 8) * 8  # multiple de 8 : hachage par mots de 64 bits
+        self.n = 0
+        table_size = 1
+        while table_size < 2 * capacity:
+            table_size *= 2
+        self._mask = np.uint64(table_size - 1)
+        os.makedirs(directory, exist_ok=True)
+
+        def mm(name: str, dtype, length: int) -> np.memmap:
+            return np.memmap(os.path.join(directory, name), dtype=dtype, mode='w+', shape=(max(length, 1),))
+
+        key_dtype = f'S{self.key_width}'
+        self.table_keys = mm('table_keys.bin', key_dtype, table_size)
+        self.table_ids = mm('table_ids.bin', np.int32, table_size)
+        self.keys_by_id = mm('keys_by_id.bin', key_dtype, capacity)
+        self.parent = mm('parent.bin', np.int32, capacity)
+        self.size = mm('size.bin', np.int32, capacity)
+
+    # --- Table de hachage sur disque ---
+
+    def _slots(self, keys: np.ndarray) -> np.ndarray:
+        """FNV-1a sur des mots de 64 bits (vectorisé sur le lot), réduit à la taille de la table."""
+        words = np.ascontiguousarray(keys).view(np.uint64).reshape(len(keys), -1)
+        h = np.full(len(keys), _FNV_OFFSET, dtype=np.uint64)
+        for col in range(words.shape[1]):
+            h ^= words[:, col]
+            h *= _FNV_PRIME
+        h ^= h >> np.uint64(29)
+        return (h & self._mask).astype(np.int64)
+
+    def _probe(self, keys: np.ndarray, insert: bool) -> np.ndarray:
+        """
+        Identifiants des clés (encodées) ; -1 si absente et insert=False.
+        Les doublons du lot sont fusionnés (np.unique) ; quand plusieurs nouvelles clés visent la même
+        case vide, une seule l'obtient par tour et les autres re-sondent.
+        """
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        slots = self._slots(uniq)
+        order = np.argsort(slots, kind='stable')  # accès à la table dans l'ordre des cases
+        uniq, slots = uniq[order], slots[order]
+        result = np.full(len(uniq), -1, dtype=np.int64)
+        pending = np.arange(len(uniq))
+        mask = int(self._mask)
+
+        while len(pending):
+            s = slots[pending]
+            stored = np.asarray(self.table_ids[s])
+            occupied = stored != 0
+            match = occupied & (np.asarray(self.table_keys[s]) == uniq[pending])
+            result[pending[match]] = stored[match] - 1
+            done = match.copy()
+
+            empty = np.flatnonzero(~occupied)
+            if len(empty) and insert:
+                _, first = np.unique(s[empty], return_index=True)
+                winners = pending[empty[first]]
+                new_ids = np.arange(self.n, self.n + len(winners))
+                if new_ids[-1] >= self.capacity:
+                    raise MemoryError(f"Capacité dépassée ({self.capacity} éléments)")
+                self.table_keys[slots[winners]] = uniq[winners]
+                self.table_ids[slots[winners]] = new_ids + 1
+                self.keys_by_id[new_ids] = uniq[winners]
+                self.parent[new_ids] = new_ids
+                self.size[new_ids] = 1
+                self.n += len(winners)
+                result[winners] = new_ids
+                done[empty[first]] = True
+            elif len(empty):
+                done[empty] = True  # case vide : la clé est absente
+
+            advance = occupied & ~match
+            slots[pending[advance]] = (slots[pending[advance]] + 1) & mask
+            pending = pending[~done]
+
+        unsorted = np.empty_like(result)
+        unsorted[order] = result
+        return unsorted[inverse]
+
+    def add_elements(self, keys: Sequence[str]) -> np.ndarray:
+        """Interne un lot de clés ; retourne leurs identifiants (les clés déjà connues gardent le leur)."""
+        if not len(keys):
+            return np.zeros(0, dtype=np.int64)
+        return self._probe(encode_keys(keys, self.key_width), insert=True)
+
+    def lookup(self, keys: Sequence[str]) -> np.ndarray:
+        """Identifiants des clés, -1 pour une clé inconnue (dont toute clé plus longue que key_width)."""
+        if not len(keys):
+            return np.zeros(0, dtype=np.int64)
+        arr = _key_bytes(keys)
+        if arr.dtype.itemsize <= self.key_width:
+            return self._probe(arr.astype(f'S{self.key_width}'), insert=False)
+        # Une clé trop longue n'a jamais pu être insérée (add_elements la refuse) : inconnue, pas une erreur
+        fits = np.char.str_len(arr) <= self.key_width
+        ids = np.full(len(arr), -1, dtype=np.int64)
+        ids[fits] = self._probe(arr[fits].astype(f'S{self.key_width}'), insert=False)
+        return ids
+
+    # --- Union-Find ---
+
+    def _roots(self, ids: np.ndarray) -> np.ndarray:
+        roots = np.asarray(self.parent[ids])
+        while True:
+            up = np.asarray(self.parent[roots])
+            if np.array_equal(up, roots):
+                return roots
+            roots = up
+
+    def union_ids(self, xs: np.ndarray, ys: np.ndarray) -> int:
+        """
+        Applique un lot de paires d'identifiants. Le lot est réduit à sa forêt couvrante, puis les racines
+        globales concernées sont fusionnées par composante du lot : la racine de plus grande taille
+        absorbe les autres (union par taille, hauteur en O(log n)). Les extrémités du lot sont ensuite
+        rattachées directement à leur racine (compression). Retourne le nombre de fusions.
+        """
+        fx, fy = spanning_forest(xs.astype(np.int32), ys.astype(np.int32))
+        if not len(fx):
+            return 0
+        rx, ry = self._roots(fx), self._roots(fy)
+        cross = rx != ry
+        rx, ry = rx[cross], ry[cross]
+        if not len(rx):
+            return 0
+
+        roots, local = np.unique(np.concatenate([rx, ry]), return_inverse=True)
+        local = local.astype(np.int32)
+        labels = connected_labels(len(roots), local[:len(rx)], local[len(rx):])
+        sizes = np.asarray(self.size[roots]).astype(np.int64)
+        order = np.lexsort((roots, -sizes, labels))  # par composante, la plus grande racine d'abord
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = labels[order][1:] != labels[order][:-1]
+        group = np.cumsum(first) - 1
+        winner = roots[order][first][group]
+
+        losers = ~first
+        self.parent[roots[order][losers]] = winner[losers]
+        self.size[roots[order][first]] = np.bincount(group, weights=sizes[order]).astype(np.int32)
+
+        touched = _unique_sorted(np.concatenate([fx, fy]))
+        self.parent[touched] = self._roots(touched)
+        return int(losers.sum())
+
+    def add_relations(self, xs_keys: Sequence[str], ys_keys: Sequence[str]) -> int:
+        """Lot de relations par clés ; celles dont une extrémité est inconnue sont ignorées."""
+        xs, ys = self.lookup(xs_keys), self.lookup(ys_keys)
+        known = (xs >= 0) & (ys >= 0)
+        return self.union_ids(xs[known], ys[known])
+
+    # --- Sortie ---
+
+    def compress(self, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> None:
+        """Compression complète, tranche par tranche : parent[i] devient la racine de i."""
+        for lo in range(0, self.n, chunk_rows):
+            hi = min(lo + chunk_rows, self.n)
+            self.parent[lo:hi] = self._roots(np.arange(lo, hi))
+
+    def write_partition(self, path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> None:
+        """
+        Écrit la partition en flux : une ligne 'élément<TAB>représentant' par élément, tranche par
+        tranche (aucune liste de listes en mémoire). Deux éléments sont dans le même groupe si et
+        seulement s'ils ont le même représentant.
+        """
+        self.compress(chunk_rows)
+        with open(path, 'w', encoding='utf-8') as f:
+            for lo in range(0, self.n, chunk_rows):
+                hi = min(lo + chunk_rows, self.n)
+                keys = np.char.decode(np.asarray(self.keys_by_id[lo:hi]), 'utf-8')
+                reps = np.char.decode(np.asarray(self.keys_by_id[np.asarray(self.parent[lo:hi])]), 'utf-8')
+                f.write(''.join(f"{k}\t{r}\n" for k, r in zip(keys.tolist(), reps.tolist())))
+
+    def flush(self) -> None:
+        for arr in (self.table_keys, self.table_ids, self.keys_by_id, self.parent, self.size):
+            arr.flush()
+
+
+def read_partition(path: str) -> List[List[str]]:
+    """Relit un fichier écrit par write_partition en liste de listes (pour les petites vérifications)."""
+    groups = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            elem, rep = line.rstrip('\n').split('\t')
+            groups.setdefault(rep, []).append(elem)
+    return list(groups.values())
+
+
+def _batches(items: Sequence, batch_size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+def partition_par_unions_disk(
+        elements: Iterable[Hashable],
+        relations: Iterable[Tuple[Hashable, Hashable]],
+        directory: str = '',
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        key_width: int = DEFAULT_KEY_WIDTH
+) -> List[List[Hashable]]:
+    """
+        Même interface que les fonctions du testeur (éléments texte), sur DiskUnionFind.
+        Les fichiers sont créés dans `directory` (un répertoire temporaire par défaut) ; la partition
+        passe par le fichier écrit en flux puis est relue.
+        """
+    elements = list(elements)
+    relations = list(relations)
+    with tempfile.TemporaryDirectory(dir=directory or None) as tmp:
+        uf = DiskUnionFind(tmp, len(elements), key_width)
+        for batch in _batches(elements, batch_size):
+            uf.add_elements(batch)
+        for batch in _batches(relations, batch_size):
+            pairs = np.asarray(batch)
+            uf.add_relations(pairs[:, 0], pairs[:, 1])
+        out = os.path.join(tmp, 'partition.tsv')
+        uf.write_partition(out)
+        return read_partition(out)
+
+
+# --- Démonstration / vérification ---
+
+def main():
+    elements, relations = generate_test_data(200_000, 100_000)
+    start_time = time.perf_counter()
+    result = partition_par_unions_disk(elements, relations, batch_size=25_000)
+    duration = time.perf_counter() - start_time
+    ok = compare_results(result, partition_par_unions_4(elements, relations))
+    status = "✅ identique à" if ok else "❌ différent de"
+    print(f"Disque (lots de 25000) : {duration:.4f}s, {len(result)} groupes ({status} partition_par_unions_4)")
+
+    # Passage à l'échelle : éléments générés par lots, jamais tous en mémoire sous forme de liste Python
+    n_elements, n_relations, batch_size = 5_000_000, 2_500_000, 1_000_000
+    rng = np.random.default_rng(random.randrange(2 ** 32))
+    with tempfile.TemporaryDirectory() as tmp:
+        uf = DiskUnionFind(tmp, n_elements)
+        start_time = time.perf_counter()
+        for lo in range(0, n_elements, batch_size):
+            uf.add_elements(np.char.add('e', np.arange(lo, min(lo + batch_size, n_elements)).astype('U12')))
+        t_intern = time.perf_counter()
+        merges = 0
+        for lo in range(0, n_relations, batch_size):
+            xs, ys = rng.integers(0, n_elements, size=(2, min(batch_size, n_relations - lo)))
+            merges += uf.union_ids(xs, ys)
+        t_union = time.perf_counter()
+        uf.write_partition(os.path.join(tmp, 'partition.tsv'))
+        t_write = time.perf_counter()
+        print(f"{n_elements} éléments : internement {t_intern - start_time:.2f}s, "
+              f"{n_relations} relations {t_union - t_intern:.2f}s ({merges} fusions), "
+              f"écriture {t_write - t_union:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Partition maintenue au fil de l'eau (IncrementalPartition) : des éléments et des relations arrivent par
+lots, et chaque requête (find, connected, component_size, members) répond sur l'état courant sans tout
+recalculer comme le font les fonctions partition_par_unions_* du testeur.
+
+snapshot() fige l'état courant en O(1) (PartitionSnapshot) : les lots suivants ne le modifient pas.
+main() vérifie le snapshot de mi-parcours et la partition finale contre partition_par_unions_4.
+"""
+import random
+import time
+from bisect import bisect_right
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from union_find_performance_tester import compare_results, generate_test_data, partition_par_unions_4
+
+
+class PartitionSnapshot:
+    """
+    Image figée d'une IncrementalPartition à une version donnée, créée en O(1) : rien n'est copié.
+    Elle lit les journaux horodatés de la partition vivante (liens d'union, dates d'ajout, tailles),
+    qui ne sont jamais réécrits : un lien posé après `version` est simplement ignoré. Les recherches
+    suivent la forêt des liens d'union, sans compression (l'union par rang borne sa hauteur en O(log n)).
+    """
+
+    def __init__(self, owner: 'IncrementalPartition', version: int, n_elements: int):
+        self.version = version
+        self._owner = owner
+        self._n_elements = n_elements
+
+    def __len__(self) -> int:
+        return self._n_elements
+
+    def __contains__(self, x: Hashable) -> bool:
+        stamp = self._owner._added.get(x)
+        return stamp is not None and stamp <= self.version
+
+    def find(self, x: Hashable) -> Hashable:
+        link, link_stamp, version = self._owner._link, self._owner._link_stamp, self.version
+        while x in link and link_stamp[x] <= version:
+            x = link[x]
+        return x
+
+    def connected(self, x: Hashable, y: Hashable) -> bool:
+        return x in self and y in self and self.find(x) == self.find(y)
+
+    def component_size(self, x: Hashable) -> int:
+        root = self.find(x)
+        history = self._owner._size_history.get(root)
+        if history is None:
+            return 1
+        versions, sizes = history
+        k = bisect_right(versions, self.version)
+        return sizes[k - 1] if k else 1
+
+    def groups(self) -> List[List[Hashable]]:
+        """Partition complète (même format que partition_par_unions_4)."""
+        groups: Dict[Hashable, List[Hashable]] = {}
+        for elem, stamp in self._owner._added.items():
+            if stamp > self.version:
+                break  # ordre d'insertion = ordre des versions
+            groups.setdefault(self.find(elem), []).append(elem)
+        return list(groups.values())
+
+
+class IncrementalPartition:
+    """
+    Partition maintenue au fil de l'eau, sur la logique Union-Find de partition_par_unions_4
+    (compression de chemin + union par rang), avec en plus la taille de chaque composante.
+
+    Politique identique aux fonctions du testeur : une relation dont une extrémité n'a pas été
+    ajoutée par add_element est ignorée.
+
+    Les listes de membres ne sont pas maintenues élément par élément : chaque racine garde une
+    liste de morceaux (les listes des composantes absorbées, concaténées par référence). members()
+    aplatit ces morceaux à la demande et met le résultat en cache.
+
+    Pour des snapshots en O(1), chaque modification est aussi journalisée avec sa version : date
+    d'ajout de chaque élément, lien racine absorbée -> racine gagnante (posé une fois, jamais compressé)
+    et historique des tailles de chaque racine gagnante. La compression de chemin ne touche que _parent.
+    """
+
+    def __init__(self, elements: Iterable[Hashable] = ()):
+        self._parent: Dict[Hashable, Hashable] = {}
+        self._rank: Dict[Hashable, int] = {}
+        self._size: Dict[Hashable, int] = {}  # n'a de sens que pour les racines
+        self._chunks: Dict[Hashable, List[List[Hashable]]] = {}  # racine -> morceaux (absent = singleton)
+        self._added: Dict[Hashable, int] = {}  # élément -> version de son ajout
+        self._link: Dict[Hashable, Hashable] = {}  # racine absorbée -> racine gagnante, au moment de l'union
+        self._link_stamp: Dict[Hashable, int] = {}  # racine absorbée -> version de l'union
+        self._size_history: Dict[Hashable, Tuple[List[int], List[int]]] = {}  # racine -> (versions, tailles)
+        self._num_components = 0
+        self._version = 0
+        self._snapshot: Optional[PartitionSnapshot] = None
+        for elem in elements:
+            self.add_element(elem)
+
+    def __len__(self) -> int:
+        return len(self._parent)
+
+    def __contains__(self, x: Hashable) -> bool:
+        return x in self._parent
+
+    @property
+    def num_components(self) -> int:
+        return self._num_components
+
+    @property
+    def version(self) -> int:
+        """Incrémentée à chaque modification effective (nouvel élément ou fusion)."""
+        return self._version
+
+    # --- Mises à jour ---
+
+    def add_element(self, x: Hashable) -> bool:
+        """Ajoute x comme singleton. Retourne False s'il était déjà présent."""
+        if x in self._parent:
+            return False
+        self._parent[x] = x
+        self._rank[x] = 0
+        self._size[x] = 1
+        self._num_components += 1
+        self._version += 1
+        self._added[x] = self._version
+        return True
+
+    def add_relation(self, x: Hashable, y: Hashable) -> bool:
+        """Fusionne les composantes de x et y. Retourne True si une fusion a eu lieu."""
+        if x not in self._parent or y not in self._parent:
+            return False
+        return self._union(self.find(x), self.find(y))
+
+    def add_relations(self, relations: Iterable[Tuple[Hashable, Hashable]]) -> int:
+        """
+        Ingestion par lot : même effet que add_relation sur chaque paire, mais dans une seule boucle
+        avec les dictionnaires en variables locales et un find itératif (réduction de moitié du chemin).
+        Retourne le nombre de fusions effectives.
+        """
+        parent = self._parent
+        merged = 0
+        for x, y in relations:
+            if x not in parent or y not in parent:
+                continue
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            while parent[y] != y:
+                parent[y] = parent[parent[y]]
+                y = parent[y]
+            if x != y:
+                self._union(x, y)
+                merged += 1
+        return merged
+
+    def _union(self, root_x: Hashable, root_y: Hashable) -> bool:
+        if root_x == root_y:
+            return False
+        # Union par rang: attacher le plus petit au plus grand
+        if self._rank[root_x] < self._rank[root_y]:
+            root_x, root_y = root_y, root_x
+        elif self._rank[root_x] == self._rank[root_y]:
+            self._rank[root_x] += 1
+        self._parent[root_y] = root_x
+        self._size[root_x] += self._size.pop(root_y)
+        del self._rank[root_y]
+
+        chunks_x = self._chunks.pop(root_x, None) or [[root_x]]
+        chunks_y = self._chunks.pop(root_y, None) or [[root_y]]
+        if len(chunks_x) < len(chunks_y):
+            chunks_x, chunks_y = chunks_y, chunks_x
+        chunks_x.extend(chunks_y)
+        self._chunks[root_x] = chunks_x
+
+        self._num_components -= 1
+        self._version += 1
+        self._link[root_y] = root_x
+        self._link_stamp[root_y] = self._version
+        versions, sizes = self._size_history.setdefault(root_x, ([], []))
+        versions.append(self._version)
+        sizes.append(self._size[root_x])
+        return True
+
+    # --- Requêtes ---
+
+    def find(self, x: Hashable) -> Hashable:
+        """Racine de x, avec compression de chemin (itérative)."""
+        parent = self._parent
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def connected(self, x: Hashable, y: Hashable) -> bool:
+        return x in self._parent and y in self._parent and self.find(x) == self.find(y)
+
+    def component_size(self, x: Hashable) -> int:
+        return self._size[self.find(x)]
+
+    def members(self, x: Hashable) -> List[Hashable]:
+        """Membres de la composante de x, matérialisés à la demande (puis gardés en un seul morceau)."""
+        root = self.find(x)
+        chunks = self._chunks.get(root)
+        if chunks is None:
+            return [root]
+        if len(chunks) > 1:
+            chunks[:] = [[elem for chunk in chunks for elem in chunk]]
+        return list(chunks[0])
+
+    def snapshot(self) -> PartitionSnapshot:
+        """Image figée de l'état courant, en O(1) ; réutilisée tant qu'aucune modification n'a eu lieu."""
+        if self._snapshot is None or self._snapshot.version != self._version:
+            self._snapshot = PartitionSnapshot(self, self._version, len(self._parent))
+        return self._snapshot
+
+    def groups(self) -> List[List[Hashable]]:
+        return self.snapshot().groups()
+
+
+# --- Démonstration / vérification ---
+
+def main():
+    n_elements, n_relations, batch_size = 200_000, 100_000, 10_000
+    elements, relations = generate_test_data(n_elements, n_relations)
+
+    partition = IncrementalPartition(elements)
+    checkpoint = len(relations) // 2
+    half: Optional[PartitionSnapshot] = None
+    half_count = 0  # relations ingérées au moment du snapshot (fin du lot qui franchit checkpoint)
+    start_time = time.perf_counter()
+    for start in range(0, len(relations), batch_size):
+        partition.add_relations(relations[start:start + batch_size])
+        if half is None and start + batch_size >= checkpoint:
+            half, half_count = partition.snapshot(), min(start + batch_size, len(relations))
+    duration = time.perf_counter() - start_time
+    print(f"Ingestion par lots de {batch_size} : {duration:.4f}s, {partition.num_components} composantes")
+
+    if half is None:  # aucune relation
+        half = partition.snapshot()
+    ok_half = compare_results(half.groups(), partition_par_unions_4(elements, relations[:half_count]))
+    ok_full = compare_results(partition.groups(), partition_par_unions_4(elements, relations))
+    print(f"Snapshot à mi-parcours identique à partition_par_unions_4 : {'✅' if ok_half else '❌'}")
+    print(f"Partition finale identique à partition_par_unions_4      : {'✅' if ok_full else '❌'}")
+
+    x = max(random.sample(elements, 1000), key=partition.component_size)
+    members = partition.members(x)
+    assert len(members) == partition.component_size(x) and all(partition.connected(x, m) for m in members)
+    print(f"Composante de {x!r} : {len(members)} membres")
+
+
+if __name__ == "__main__":
+    main()
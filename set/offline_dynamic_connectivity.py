@@ -0,0 +1,231 @@
+import random
+import time
+from bisect import bisect_right
+from typing import Dict, Hashable, Iterable, List, Sequence, Tuple
+
+from union_find_performance_tester import compare_results, generate_test_data, partition_par_unions_4
+
+# Événement de la chronologie : (instant, 'add' | 'remove', x, y)
+Event = Tuple[float, str, Hashable, Hashable]
+
+
+class RollbackUnionFind:
+    """
+    Union-Find annulable : union par taille, SANS compression de chemin (une compression
+    modifierait des noeuds hors de la pile d'annulation). Hauteur en O(log n), donc find en O(log n).
+    Chaque union effective empile la racine absorbée ; rollback(mark) dépile jusqu'à mark.
+    """
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.size = [1] * n
+        self.history: List[int] = []
+        self.num_components = n
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            x = parent[x]
+        return x
+
+    def union(self, x: int, y: int) -> bool:
+        rx, ry = self.find(x), self.find(y)
+        if rx == ry:
+            return False
+        if self.size[rx] < self.size[ry]:
+            rx, ry = ry, rx
+        self.parent[ry] = rx
+        self.size[rx] += self.size[ry]
+        self.history.append(ry)
+        self.num_components -= 1
+        return True
+
+    def mark(self) -> int:
+        return len(self.history)
+
+    def rollback(self, mark: int) -> None:
+        """Annule les unions effectuées depuis mark, dans l'ordre inverse."""
+        parent, size, history = self.parent, self.size, self.history
+        while len(history) > mark:
+            ry = history.pop()
+            rx = parent[ry]
+            size[rx] -= size[ry]
+            parent[ry] = ry
+            self.num_components += 1
+
+
+def _active_intervals(
+        index: Dict[Hashable, int],
+        events: Sequence[Event]
+) -> List[Tuple[int, int, int, int]]:
+    """
+    Intervalles de présence de chaque relation, en indices de "créneaux" : le créneau k est l'état
+    après les k premiers événements (créneau 0 = avant tout événement). Une relation ajoutée à
+    l'événement a et retirée à l'événement b est active sur les créneaux [a+1, b].
+    Les relations sont non orientées et comptées avec multiplicité (deux 'add' demandent deux 'remove').
+    Les relations dont une extrémité n'est pas dans `elements` sont ignorées, comme dans le testeur.
+    """
+    open_since: Dict[Tuple[int, int], List[int]] = {}
+    intervals = []
+    for k, (_, op, x, y) in enumerate(events):
+        if x not in index or y not in index:
+            continue
+        ix, iy = index[x], index[y]
+        key = (ix, iy) if ix <= iy else (iy, ix)
+        if op == 'add':
+            open_since.setdefault(key, []).append(k + 1)
+        elif op == 'remove':
+            starts = open_since.get(key)
+            if starts:  # un retrait sans ajout préalable est ignoré
+                intervals.append((starts.pop(), k, key[0], key[1]))
+        else:
+            raise ValueError(f"Opération inconnue : {op!r}")
+    last_slot = len(events)
+    for (ix, iy), starts in open_since.items():
+        intervals.extend((start, last_slot, ix, iy) for start in starts)
+    return intervals
+
+
+def offline_dynamic_connectivity(
+        elements: Iterable[Hashable],
+        events: Iterable[Event],
+        connectivity_queries: Iterable[Tuple[float, Hashable, Hashable]] = (),
+        partition_times: Iterable[float] = ()
+) -> Tuple[List[bool], Dict[float, List[List[Hashable]]]]:
+    """
+    Connectivité dynamique hors ligne (ajouts ET retraits de relations).
+
+    L'état à l'instant t est celui obtenu après tous les événements d'instant <= t.
+    Chaque relation est insérée dans les O(log m) noeuds d'un arbre de segments sur le temps qui
+    couvrent son intervalle de présence ; un parcours en profondeur applique les unions d'un noeud
+    en descendant et les annule (rollback) en remontant. Chaque feuille voit exactement les relations
+    actives à son créneau. Coût : O((n + m) log m log n) hors matérialisation des partitions.
+
+    Retourne (réponses aux requêtes de connectivité dans l'ordre, {instant: partition}).
+    """
+    elements = list(elements)
+    index = {elem: i for i, elem in enumerate(elements)}
+    events = sorted(events, key=lambda e: e[0])  # tri stable : l'ordre est conservé à instant égal
+    times = [e[0] for e in events]
+    connectivity_queries = list(connectivity_queries)
+    partition_times = list(partition_times)
+
+    # Requêtes rangées par créneau
+    n_slots = len(events) + 1
+    queries_at: Dict[int, List[int]] = {}
+    for q, (t, _, _) in enumerate(connectivity_queries):
+        queries_at.setdefault(bisect_right(times, t), []).append(q)
+    partitions_at: Dict[int, List[float]] = {}
+    for t in partition_times:
+        partitions_at.setdefault(bisect_right(times, t), []).append(t)
+
+    # Arbre de segments (tableau, taille puissance de 2) : chaque noeud porte une liste de relations
+    size = 1
+    while size < n_slots:
+        size *= 2
+    tree: List[List[Tuple[int, int]]] = [[] for _ in range(2 * size)]
+    for start, end, ix, iy in _active_intervals(index, events):
+        lo, hi = start + size, end + size + 1
+        while lo < hi:
+            if lo & 1:
+                tree[lo].append((ix, iy))
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                tree[hi].append((ix, iy))
+            lo >>= 1
+            hi >>= 1
+
+    uf = RollbackUnionFind(len(elements))
+    answers: List[bool] = [False] * len(connectivity_queries)
+    partitions: Dict[float, List[List[Hashable]]] = {}
+
+    def visit(node: int, lo: int, hi: int) -> None:
+        if lo >= n_slots:
+            return
+        mark = uf.mark()
+        for ix, iy in tree[node]:
+            uf.union(ix, iy)
+        if node >= size:
+            slot = lo
+            for q in queries_at.get(slot, ()):
+                _, x, y = connectivity_queries[q]
+                answers[q] = x in index and y in index and uf.find(index[x]) == uf.find(index[y])
+            for t in partitions_at.get(slot, ()):
+                groups: Dict[int, List[Hashable]] = {}
+                for i, elem in enumerate(elements):
+                    groups.setdefault(uf.find(i), []).append(elem)
+                partitions[t] = list(groups.values())
+        else:
+            mid = (lo + hi) // 2
+            visit(2 * node, lo, mid)
+            visit(2 * node + 1, mid, hi)
+        uf.rollback(mark)
+
+    visit(1, 0, size)
+    return answers, partitions
+
+
+# --- Démonstration / vérification ---
+
+def generate_timeline(
+        relations: List[Tuple[Hashable, Hashable]],
+        remove_probability: float = 0.3
+) -> List[Event]:
+    """Ajoute les relations une par une ; après chaque ajout, retire parfois une relation déjà présente."""
+    events: List[Event] = []
+    active: List[Tuple[Hashable, Hashable]] = []
+    t = 0
+    for x, y in relations:
+        events.append((t, 'add', x, y))
+        active.append((x, y))
+        t += 1
+        if active and random.random() < remove_probability:
+            k = random.randrange(len(active))
+            active[k], active[-1] = active[-1], active[k]
+            rx, ry = active.pop()
+            events.append((t, 'remove', ry, rx) if random.random() < 0.5 else (t, 'remove', rx, ry))
+            t += 1
+    return events
+
+
+def active_relations_at(events: List[Event], t: float) -> List[Tuple[Hashable, Hashable]]:
+    """Relations actives à l'instant t, recalculées naïvement depuis la chronologie."""
+    active: Dict[frozenset, List[Tuple[Hashable, Hashable]]] = {}
+    for time_, op, x, y in events:
+        if time_ > t:
+            break
+        key = frozenset((x, y))
+        if op == 'add':
+            active.setdefault(key, []).append((x, y))
+        elif active.get(key):
+            active[key].pop()
+    return [rel for rels in active.values() for rel in rels]
+
+
+def main():
+    elements, relations = generate_test_data(20_000, 20_000)
+    events = generate_timeline(relations)
+    horizon = events[-1][0]
+    sample_times = sorted(random.sample(range(horizon + 1), 8))
+    queries = [(t, random.choice(elements), random.choice(elements)) for t in sample_times for _ in range(50)]
+
+    start_time = time.perf_counter()
+    answers, partitions = offline_dynamic_connectivity(elements, events, queries, sample_times)
+    duration = time.perf_counter() - start_time
+    print(f"{len(events)} événements, {len(queries)} requêtes, {len(sample_times)} partitions : {duration:.4f}s")
+
+    all_ok = True
+    for t in sample_times:
+        expected = partition_par_unions_4(elements, active_relations_at(events, t))
+        root_of = {elem: i for i, group in enumerate(expected) for elem in group}
+        ok = compare_results(partitions[t], expected) and all(
+            answers[q] == (root_of[x] == root_of[y])
+            for q, (qt, x, y) in enumerate(queries) if qt == t)
+        all_ok &= ok
+        print(f"  t={t:>6} : {len(expected)} groupes {'✅' if ok else '❌'}")
+    print("✅ Identique à partition_par_unions_4 recalculé" if all_ok else "❌ Divergence détectée")
+
+
+if __name__ == "__main__":
+    main()
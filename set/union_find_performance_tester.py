@@ -6,6 +6,14 @@ import json
 from collections import defaultdict
 from typing import Iterable, Hashable, Tuple, List, Dict, Set, Any
 import collections
+import gc
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, repeat
+from multiprocessing import shared_memory
+
+import numpy as np
 
 
 # --- Fonctions à tester (TODO: Implémentez vos solutions ici) ---
@@ -314,6 +322,229 @@ def partition_par_unions_5(
     return groups
 
 
+# --- Moteurs sur identifiants entiers (tableaux au lieu de dictionnaires) ---
+
+def _relations_to_ids(
+        elements: List[Hashable],
+        relations: Iterable[Tuple[Hashable, Hashable]]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Traduit les relations en paires d'identifiants (position de l'élément dans `elements`).
+    Les relations dont une extrémité n'appartient pas à `elements` sont filtrées, comme dans
+    partition_par_unions_4.
+
+    Chemin rapide (tri + searchsorted, sans boucle Python) seulement si toutes les clés, éléments et
+    extrémités, sont du même type str ou du même type int : np.asarray convertirait sinon un mélange
+    vers un dtype commun (1 et '1' deviendraient égaux, un tuple ajouterait une dimension). Dans tous
+    les autres cas, les clés passent par un dictionnaire (même égalité que partition_par_unions_4).
+    """
+    relations = relations if isinstance(relations, (list, np.ndarray)) else list(relations)
+    if len(relations) == 0 or not elements:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+
+    key_types = set(map(type, elements))
+    if isinstance(relations, np.ndarray):
+        key_types.add(str if relations.dtype.kind == 'U' else int if relations.dtype.kind in 'iu' else object)
+    else:
+        key_types.update(map(type, chain.from_iterable(relations)))
+    if key_types == {str} or key_types == {int}:
+        keys, rel_arr = np.asarray(elements), np.asarray(relations)
+        if keys.dtype.kind in 'iuU' and rel_arr.dtype.kind in 'iuU' and rel_arr.ndim == 2:
+            return _relations_to_ids_sorted(keys, rel_arr)
+
+    index = {elem: i for i, elem in enumerate(elements)}
+    pairs = [(index[x], index[y]) for x, y in relations if x in index and y in index]
+    if not pairs:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+    ids = np.array(pairs, dtype=np.int32)
+    return ids[:, 0], ids[:, 1]
+
+
+def _relations_to_ids_sorted(keys: np.ndarray, relations: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Recherche vectorisée de _relations_to_ids : clés et relations de même type (str ou int)."""
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    def lookup(column: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        pos = np.searchsorted(sorted_keys, column)
+        pos[pos == len(sorted_keys)] = 0
+        return order[pos], sorted_keys[pos] == column
+
+    xs, known_x = lookup(relations[:, 0])
+    ys, known_y = lookup(relations[:, 1])
+    valid = known_x & known_y
+    return xs[valid].astype(np.int32), ys[valid].astype(np.int32)
+
+
+def _groups_from_labels(elements: List[Hashable], labels: np.ndarray) -> List[List[Hashable]]:
+    """
+    Regroupe les éléments par étiquette (racine) : un tri des étiquettes puis découpage en tranches.
+    Le ramasse-miettes cyclique est suspendu pendant la création des listes : avec des millions de
+    petits groupes, ses passes déclenchées par les allocations coûtent plus que le regroupement.
+    """
+    order = np.argsort(labels, kind='stable')
+    bounds = (np.flatnonzero(np.diff(labels[order])) + 1).tolist()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        ordered = [elements[i] for i in order.tolist()]
+        return [ordered[lo:hi] for lo, hi in zip([0] + bounds, bounds + [len(ordered)])] if ordered else []
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _compress_all(parent: np.ndarray) -> np.ndarray:
+    """Saut de pointeurs jusqu'au point fixe : chaque case contient alors sa racine."""
+    while True:
+        grand = parent[parent]
+        if np.array_equal(grand, parent):
+            return parent
+        parent = grand
+
+
+def partition_par_unions_6(
+        elements: Iterable[Hashable],
+        relations: Iterable[Tuple[Hashable, Hashable]]
+) -> List[List[Hashable]]:
+    """
+        Union-Find sur identifiants entiers contigus.
+        - Les éléments sont internés une fois (position dans la liste), les relations sont
+          traduites en paires d'identifiants en bloc avec NumPy (relations hors domaine filtrées).
+        - parent/size sont des array('i') (4 octets par élément au lieu d'entrées de dict).
+        - find itératif avec réduction de moitié du chemin (path halving), union par taille.
+        Même partition que partition_par_unions_4.
+        """
+    elements = list(elements)
+    xs, ys = _relations_to_ids(elements, relations)
+
+    n = len(elements)
+    parent = array('i', range(n))
+    size = array('i', [1]) * n
+
+    for x, y in zip(xs.tolist(), ys.tolist()):
+        # Path halving : chaque noeud visité pointe vers son grand-parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        while parent[y] != y:
+            parent[y] = parent[parent[y]]
+            y = parent[y]
+        if x == y:
+            continue
+        if size[x] < size[y]:
+            x, y = y, x
+        parent[y] = x
+        size[x] += size[y]
+
+    roots = _compress_all(np.frombuffer(parent, dtype=np.int32).copy())
+    return _groups_from_labels(elements, roots)
+
+
+def connected_labels(n: int, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+    """
+    Composantes connexes par passes de tableaux (style Shiloach–Vishkin), sans boucle par arête.
+    Invariant : labels[i] <= i et labels est une forêt dont les racines sont les étiquettes.
+    À chaque tour :
+      - accrochage : pour chaque arête entre deux racines différentes, la plus grande racine
+        est rattachée à la plus petite (minimum.at résout les conflits) ;
+      - saut de pointeurs jusqu'au point fixe (chaque élément pointe sur sa racine) ;
+      - les arêtes devenues internes à une composante sont retirées.
+    Retourne pour chaque élément l'identifiant (le plus petit) de sa composante.
+    """
+    labels = np.arange(n, dtype=np.int32)
+    while len(xs):
+        lx, ly = labels[xs], labels[ys]
+        cross = lx != ly
+        if not cross.all():
+            xs, ys, lx, ly = xs[cross], ys[cross], lx[cross], ly[cross]
+            if not len(xs):
+                break
+        np.minimum.at(labels, np.maximum(lx, ly), np.minimum(lx, ly))
+        labels = _compress_all(labels)
+    return labels
+
+
+def partition_par_unions_7(
+        elements: Iterable[Hashable],
+        relations: Iterable[Tuple[Hashable, Hashable]]
+) -> List[List[Hashable]]:
+    """
+        Composantes connexes entièrement vectorisées (NumPy) sur les tableaux d'arêtes :
+        propagation d'étiquettes / saut de pointeurs jusqu'à convergence (connected_labels),
+        puis regroupement par étiquette avec argsort. Aucune boucle Python par relation.
+        """
+    elements = list(elements)
+    xs, ys = _relations_to_ids(elements, relations)
+    return _groups_from_labels(elements, connected_labels(len(elements), xs, ys))
+
+
+# En dessous de ce nombre de relations valides, démarrer des processus coûte plus que le calcul
+PARALLEL_MIN_RELATIONS = 200_000
+
+
+def spanning_forest(xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Forêt couvrante compacte d'un ensemble d'arêtes : une arête (noeud, racine) par noeud non racine.
+    Même connectivité que (xs, ys) avec au plus (noeuds touchés - composantes) arêtes. Les noeuds sont
+    renumérotés localement (np.unique) pour que le travail soit proportionnel au fragment, pas à n.
+    """
+    touched, local = np.unique(np.concatenate([xs, ys]), return_inverse=True)
+    local = local.astype(np.int32)
+    labels = connected_labels(len(touched), local[:len(xs)], local[len(xs):])
+    moved = np.flatnonzero(labels != np.arange(len(touched)))
+    return touched[moved].astype(np.int32), touched[labels[moved]].astype(np.int32)
+
+
+def _shard_forest(shm_name: str, n_relations: int, lo: int, hi: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Travail d'un processus : lit son fragment [lo, hi) dans la mémoire partagée et renvoie sa forêt."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        ids = np.ndarray((2, n_relations), dtype=np.int32, buffer=shm.buf)
+        xs, ys = ids[0, lo:hi].copy(), ids[1, lo:hi].copy()
+        del ids  # plus aucune vue sur le tampon : close() est possible
+    finally:
+        shm.close()
+    return spanning_forest(xs, ys)
+
+
+def partition_par_unions_8(
+        elements: Iterable[Hashable],
+        relations: Iterable[Tuple[Hashable, Hashable]],
+        processes: int = 0
+) -> List[List[Hashable]]:
+    """
+        Variante multi-processus :
+        - les paires d'identifiants sont copiées une fois en mémoire partagée (SharedMemory) ;
+        - les relations sont découpées en P fragments, chaque processus calcule la forêt couvrante
+          locale de son fragment (liste compacte d'arêtes d'union) ;
+        - les forêts partielles sont fusionnées par une passe finale de composantes connexes.
+        Même partition que la version série. processes=0 : un processus par coeur.
+        """
+    elements = list(elements)
+    xs, ys = _relations_to_ids(elements, relations)
+    processes = processes or os.cpu_count() or 1
+    n_relations = len(xs)
+
+    if processes > 1 and n_relations >= PARALLEL_MIN_RELATIONS:
+        shm = shared_memory.SharedMemory(create=True, size=2 * n_relations * 4)
+        try:
+            ids = np.ndarray((2, n_relations), dtype=np.int32, buffer=shm.buf)
+            ids[0], ids[1] = xs, ys
+            del ids
+            bounds = np.linspace(0, n_relations, processes + 1).astype(int).tolist()
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                forests = list(pool.map(_shard_forest, repeat(shm.name), repeat(n_relations),
+                                        bounds[:-1], bounds[1:]))
+        finally:
+            shm.close()
+            shm.unlink()
+        xs = np.concatenate([fx for fx, _ in forests])
+        ys = np.concatenate([fy for _, fy in forests])
+
+    return _groups_from_labels(elements, connected_labels(len(elements), xs, ys))
+
+
 # --- Fonctions utilitaires pour la génération de données et la comparaison ---
 
 def generate_random_chars(length: int = 4) -> str:
@@ -321,39 +552,95 @@ def generate_random_chars(length: int = 4) -> str:
     return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
 
 
-def generate_test_data(n_elements: int, n_relations: int) -> Tuple[List[str], List[Tuple[str, str]]]:
+_ALPHABET = string.ascii_letters + string.digits
+DATA_CODE_LENGTH = 4
+
+
+def _random_codes(rng: np.random.Generator, size: int) -> np.ndarray:
+    """Tire `size` codes entiers, chacun représentant une chaîne de DATA_CODE_LENGTH caractères de _ALPHABET."""
+    return rng.integers(0, len(_ALPHABET) ** DATA_CODE_LENGTH, size=size, dtype=np.int64)
+
+
+def _encode_codes(codes: np.ndarray) -> np.ndarray:
+    """Codes entiers -> chaînes à largeur fixe, en bloc (chiffres en base len(_ALPHABET) -> points de code)."""
+    base = len(_ALPHABET)
+    digits = codes[:, None] // base ** np.arange(DATA_CODE_LENGTH - 1, -1, -1) % base
+    alphabet = np.array([ord(c) for c in _ALPHABET], dtype=np.uint32)
+    return np.ascontiguousarray(alphabet[digits]).view(f'<U{DATA_CODE_LENGTH}').ravel()
+
+
+def _unique_sorted(values: np.ndarray) -> np.ndarray:
+    """Valeurs distinctes triées, par tri + masque (le np.unique par défaut de NumPy 2 passe par une table
+    de hachage, bien plus lente ici sur des dizaines de millions d'entiers)."""
+    values = np.sort(values)
+    keep = np.ones(len(values), dtype=bool)
+    keep[1:] = values[1:] != values[:-1]
+    return values[keep]
+
+
+def generate_test_data(
+        n_elements: int,
+        n_relations: int,
+        seed: int = None,
+        cache_dir: str = None
+) -> Tuple[List[str], List[Tuple[str, str]]]:
     """
     Génère des éléments et des relations de test selon les spécifications.
     Les éléments générés sont garantis d'être uniques.
-    """
-    print(f"Génération des données : {n_elements} éléments, {n_relations} relations.")
 
-    # Utiliser un set pour garantir l'unicité des éléments
-    unique_elements = set()
-    while len(unique_elements) < n_elements:
-        unique_elements.add(generate_random_chars())
-    elements = list(unique_elements)
+    Version vectorisée (NumPy) : les éléments sont tirés comme codes entiers, rendus uniques par
+    rejet (dédoublonnage trié puis nouveaux tirages pour les manquants) et convertis en chaînes en bloc.
+    Même mélange qu'avant : n_relations // 2 relations valides entre deux éléments distincts,
+    le reste entre deux chaînes aléatoires, le tout mélangé.
 
-    relations = []
+    seed : rend le jeu reproductible (sinon tiré depuis le module random).
+    cache_dir : avec une graine, le jeu est gardé en .npz et relu aux exécutions suivantes.
+    """
+    cache_path = None
+    if cache_dir and seed is not None:
+        cache_path = os.path.join(cache_dir, f"uf_data_{n_elements}_{n_relations}_{seed}.npz")
+        if os.path.exists(cache_path):
+            print(f"Chargement des données : {n_elements} éléments, {n_relations} relations ({cache_path}).")
+            with np.load(cache_path) as data:
+                xs, ys = data['rel_x'].tolist(), data['rel_y'].tolist()
+                return data['elements'].tolist(), list(zip(xs, ys))
+
+    print(f"Génération des données : {n_elements} éléments, {n_relations} relations.")
+    if n_elements > len(_ALPHABET) ** DATA_CODE_LENGTH:
+        raise ValueError(f"Impossible de générer {n_elements} éléments uniques de {DATA_CODE_LENGTH} caractères")
+    rng = np.random.default_rng(seed if seed is not None else random.getrandbits(64))
+
+    # Éléments uniques : rejet des doublons, puis ordre aléatoire (le dédoublonnage trie)
+    # (chaque nouveau tirage est agrandi selon la probabilité de tomber sur un code libre)
+    space = len(_ALPHABET) ** DATA_CODE_LENGTH
+    codes = _unique_sorted(_random_codes(rng, n_elements))
+    while len(codes) < n_elements:
+        missing = n_elements - len(codes)
+        draw = int(missing * 1.1 * space / (space - len(codes))) + 16
+        codes = _unique_sorted(np.concatenate([codes, _random_codes(rng, draw)]))
+    codes = rng.permutation(codes[rng.choice(len(codes), size=n_elements, replace=False)]
+                            if len(codes) > n_elements else codes)
+    elements = _encode_codes(codes)
 
     n_valid_relations = n_relations // 2
     if n_elements < 2:
         n_valid_relations = 0
 
-    # Créer les relations valides à partir des éléments uniques
-    for _ in range(n_valid_relations):
-        x, y = random.sample(elements, 2)
-        relations.append((x, y))
+    # Relations valides : deux positions distinctes (équivalent de random.sample(elements, 2))
+    first = rng.integers(0, max(n_elements, 1), size=n_valid_relations)
+    second = rng.integers(0, max(n_elements - 1, 1), size=n_valid_relations)
+    second += second >= first
 
-    # Créer les relations aléatoires
+    # Relations aléatoires, puis mélange de l'ensemble
     n_random_relations = n_relations - n_valid_relations
-    for _ in range(n_random_relations):
-        x = generate_random_chars()
-        y = generate_random_chars()
-        relations.append((x, y))
+    order = rng.permutation(n_relations)
+    rel_x = np.concatenate([elements[first], _encode_codes(_random_codes(rng, n_random_relations))])[order]
+    rel_y = np.concatenate([elements[second], _encode_codes(_random_codes(rng, n_random_relations))])[order]
 
-    random.shuffle(relations)
-    return elements, relations
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez(cache_path, elements=elements, rel_x=rel_x, rel_y=rel_y)
+    return elements.tolist(), list(zip(rel_x.tolist(), rel_y.tolist()))
 
 
 def compare_results(result1: List[List[Hashable]], result2: List[List[Hashable]]) -> bool:
@@ -372,10 +659,13 @@ def compare_results(result1: List[List[Hashable]], result2: List[List[Hashable]]
 def run_tests(
         implementations: Dict[str, callable],
         n_elements_list: List[int],
-        n_relations_factors: List[float]
+        n_relations_factors: List[float],
+        seed: int = None,
+        cache_dir: str = None
 ) -> None:
     """
     Exécute les tests de performance et de validité.
+    seed / cache_dir : transmis à generate_test_data (jeux reproductibles et mis en cache).
     """
     print("🚀 Début des tests de performance et de validité.")
     print("-" * 50)
@@ -388,7 +678,7 @@ def run_tests(
             else:
                 n_relations = max(1000, int(n_elements * factor)) if n_elements > 0 else 1000
 
-            elements, relations = generate_test_data(n_elements, n_relations)
+            elements, relations = generate_test_data(n_elements, n_relations, seed, cache_dir)
 
             print(f"\n🧪 Test {i + 1}.{j + 1} : {n_elements} éléments, {n_relations} relations")
 
@@ -633,10 +923,13 @@ def run_tests_with_detailed_analysis(
         implementations: Dict[str, callable],
         n_elements_list: List[int],
         n_relations_factors: List[float],
-        detailed_analysis_frequency: int = 5  # Analyse détaillée tous les N tests
+        detailed_analysis_frequency: int = 5,  # Analyse détaillée tous les N tests
+        seed: int = None,
+        cache_dir: str = None
 ) -> None:
     """
     Version améliorée de run_tests avec analyse détaillée périodique.
+    seed / cache_dir : transmis à generate_test_data (jeux reproductibles et mis en cache).
     """
     print("🚀 Début des tests de performance et de validité AVEC ANALYSE DÉTAILLÉE.")
     print("-" * 70)
@@ -653,7 +946,7 @@ def run_tests_with_detailed_analysis(
             else:
                 n_relations = max(1000, int(n_elements * factor)) if n_elements > 0 else 1000
 
-            elements, relations = generate_test_data(n_elements, n_relations)
+            elements, relations = generate_test_data(n_elements, n_relations, seed, cache_dir)
 
             print(f"\n🧪 Test {i + 1}.{j + 1} : {n_elements} éléments, {n_relations} relations")
 
@@ -707,10 +1000,13 @@ def run_tests_with_detailed_analysis(
         implementations: Dict[str, callable],
         n_elements_list: List[int],
         n_relations_factors: List[float],
-        detailed_analysis_frequency: int = 5  # Analyse détaillée tous les N tests
+        detailed_analysis_frequency: int = 5,  # Analyse détaillée tous les N tests
+        seed: int = None,
+        cache_dir: str = None
 ) -> None:
     """
     Version améliorée de run_tests avec analyse détaillée périodique.
+    seed / cache_dir : transmis à generate_test_data (jeux reproductibles et mis en cache).
     """
     print("🚀 Début des tests de performance et de validité AVEC ANALYSE DÉTAILLÉE.")
     print("-" * 70)
@@ -727,7 +1023,7 @@ def run_tests_with_detailed_analysis(
             else:
                 n_relations = max(1000, int(n_elements * factor)) if n_elements > 0 else 1000
 
-            elements, relations = generate_test_data(n_elements, n_relations)
+            elements, relations = generate_test_data(n_elements, n_relations, seed, cache_dir)
 
             print(f"\n🧪 Test {i + 1}.{j + 1} : {n_elements} éléments, {n_relations} relations")
 
@@ -780,6 +1076,8 @@ def run_tests_with_detailed_analysis(
 if __name__ == "__main__":
     n_elements_list = [5_000, 25_000, 125_000, 750_000, 1_500_000, 2_500_000, 10_500_000]
     n_relations_factors = [1000, 1 / 20, 1 / 10, 1 / 5, 1 / 2]
+    data_seed = 42  # jeux identiques d'une exécution à l'autre, relus depuis le cache .npz
+    data_cache_dir = ".uf_data_cache"
 
     implementations = {
         "naïve": partition_par_unions_naive,
@@ -788,12 +1086,16 @@ if __name__ == "__main__":
         "impl3": partition_par_unions_3,
         "impl4": partition_par_unions_4,
         "impl5": partition_par_unions_5,
+        "impl6": partition_par_unions_6,
+        "impl7": partition_par_unions_7,
+        "impl8": partition_par_unions_8,
     }
 
     elements, relations = generate_test_data(5000, 1000)
     run_single_test_with_analysis(elements, relations, implementations)
 
     # Ou utiliser la version modifiée des tests avec analyse périodique
-    run_tests_with_detailed_analysis(implementations, n_elements_list, n_relations_factors)
+    run_tests_with_detailed_analysis(implementations, n_elements_list, n_relations_factors,
+                                     seed=data_seed, cache_dir=data_cache_dir)
 
 #    run_tests(implementations, n_elements_list, n_relations_factors)